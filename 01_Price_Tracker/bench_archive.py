@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import price_archive
+import price_store
+from bench_ingest import synthetic_rows
+
+# ---------------------------------------------------------
+# [冷資料查詢效能測試]
+# 建立多年份的模擬價格資料庫，比較「全部留在 SQLite」與「歸檔成 Parquet + SQLite 熱資料」兩種配置：
+#   1. 單一商品的完整歷史 (fetch_data，先清除讀取快取)
+#   2. 跨商品分析：全歷史各平台每年平均價
+# 執行: python bench_archive.py --products 200 --platforms 20 --years 3
+# 測試前會先跑 check_archive_rollups()：歸檔後覆蓋跨越界線的 bucket，彙總的 min/max/筆數仍須正確
+# ---------------------------------------------------------
+
+SQL_YEARLY_AVG = """
+    SELECT CAST(strftime('%Y', f.day + 2440587.5) AS INTEGER) AS year, pl.platform, avg(f.price) AS avg_price
+    FROM price_facts f JOIN platforms pl USING (platform_id) GROUP BY year, pl.platform
+"""
+# 歸檔界線前仍留在 SQLite 的那幾天 (界線所在的週) 已在 Parquet 中，不重複計入
+SQL_YEARLY_PARTIAL = """
+    SELECT CAST(strftime('%Y', f.day + 2440587.5) AS INTEGER), pl.platform, sum(f.price), count(*)
+    FROM price_facts f JOIN platforms pl USING (platform_id)
+    WHERE NOT EXISTS (SELECT 1 FROM archive_state a WHERE f.day < a.cutoff_day)
+    GROUP BY 1, 2
+"""
+
+
+SQL_ROLLUP_ROW = """
+    SELECT min_price, max_price, n FROM price_rollups
+    WHERE product_id = (SELECT product_id FROM products WHERE product_name = ?) AND grain = ? AND bucket = ?
+"""
+
+
+def check_archive_rollups():
+    """歸檔後的覆蓋寫入：跨越界線的週 bucket、月中的歸檔日期 (對齊到月初)、已歸檔日期的寫入"""
+    tmp = tempfile.mkdtemp()
+    try:
+        db = os.path.join(tmp, "check.db")
+        conn = price_store.get_connection(db)
+
+        def rollup(grain, day):
+            return conn.execute(SQL_ROLLUP_ROW, ("P", grain, price_store.to_day(day))).fetchone()
+
+        # 1. 週 2024-01-29 跨越 2024-02-01 的歸檔界線，覆蓋 02-01 後仍須看得到已歸檔的 01-29 / 01-30
+        price_store.ingest_prices([(d, "A", "P", p) for d, p in [
+            ("2024-01-29", 100), ("2024-01-30", 500), ("2024-02-01", 300), ("2024-02-02", 400)]], db_path=db)
+        price_archive.archive_closed_months(db, before="2024-02-01")
+        price_store.ingest_prices([("2024-02-01", "A", "P", 350)], db_path=db)
+        assert rollup("week", "2024-01-29") == (100, 500, 4), rollup("week", "2024-01-29")
+        try:
+            price_store.ingest_prices([("2024-01-30", "A", "P", 600)], db_path=db)
+            raise AssertionError("已歸檔日期的寫入應被拒絕")
+        except ValueError:
+            pass
+        assert rollup("day", "2024-01-30") == (500, 500, 1), rollup("day", "2024-01-30")
+
+        # 2. 月中的歸檔日期對齊到月初：3 月的 03-05 高點不能被歸檔後遺漏
+        march = pd.date_range("2024-03-01", "2024-03-31").strftime("%Y-%m-%d")
+        price_store.ingest_prices([(d, "A", "P", 9000 if d == "2024-03-05" else 1000) for d in march], db_path=db)
+        price_archive.archive_closed_months(db, before="2024-03-15")
+        price_store.ingest_prices([("2024-03-20", "A", "P", 1200)], db_path=db)
+        assert rollup("month", "2024-03-01") == (1000, 9000, 31), rollup("month", "2024-03-01")
+        price_store.ingest_prices([("2024-03-05", "A", "P", 1100)], db_path=db)
+        assert rollup("month", "2024-03-01") == (1000, 1200, 31), rollup("month", "2024-03-01")
+        price_store.close_connection(db)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def yearly_avg_sqlite(db_path):
+    conn = price_store.get_connection(db_path)
+    return conn.execute(SQL_YEARLY_AVG).fetchall()
+
+
+def yearly_avg_tiered(db_path):
+    """冷資料以 Arrow 欄式掃描 (只讀 date/platform/price)，再併入 SQLite 熱資料的部分彙總"""
+    cold = price_archive.scan_archive(db_path, columns=["date", "platform", "price"])
+    cold = cold.set_column(0, "year", pc.year(cold["date"]))
+    cold_agg = cold.group_by(["year", "platform"]).aggregate([("price", "sum"), ("price", "count")])
+    hot = price_store.get_connection(db_path).execute(SQL_YEARLY_PARTIAL).fetchall()
+    hot_agg = pa.table(list(zip(*hot)) if hot else [[], [], [], []],
+                       names=["year", "platform", "price_sum", "price_count"])
+    merged = pa.concat_tables([cold_agg.cast(hot_agg.schema), hot_agg], promote_options="permissive") \
+        .group_by(["year", "platform"]).aggregate([("price_sum", "sum"), ("price_count", "sum")])
+    return merged.append_column("avg_price", pc.divide(pc.cast(merged["price_sum_sum"], pa.float64()),
+                                                       merged["price_count_sum"]))
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parquet 冷資料歸檔查詢效能測試")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--platforms", type=int, default=20)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=20, help="隨機抽查的商品數")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    check_archive_rollups()
+    print("歸檔後彙總檢查：通過")
+
+    n_rows = args.products * args.platforms * 365 * args.years
+    tmp = tempfile.mkdtemp()
+    try:
+        row_db = os.path.join(tmp, "rowstore.db")
+        print(f"建立 {n_rows:,} 筆模擬資料 ({args.years} 年)...")
+        price_store.ingest_prices(synthetic_rows(n_rows, args.platforms, args.products), db_path=row_db)
+        price_store.close_connection(row_db)
+        tiered_db = os.path.join(tmp, "tiered.db")
+        shutil.copy(row_db, tiered_db)
+
+        # 保留最後一個月在 SQLite，其餘歸檔
+        last_date = price_store.get_connection(tiered_db).execute("SELECT date(max(day) + 2440587.5) FROM price_facts").fetchone()[0]
+        start = time.perf_counter()
+        archived = price_archive.archive_closed_months(tiered_db, before=last_date[:8] + "01", vacuum=True)
+        archive_seconds = time.perf_counter() - start
+        print(f"歸檔 {archived:,} 筆，耗時 {archive_seconds:.1f}s")
+
+        products = random.Random(0).sample([f"SKU-{i:05d}" for i in range(args.products)], args.queries)
+        results = {"rows": n_rows, "archived_rows": archived, "archive_seconds": archive_seconds}
+        for name, db in [("sqlite_only", row_db), ("parquet_tiered", tiered_db)]:
+            def fetch_all(db=db):
+                for p in products:
+                    price_store.invalidate_cache(db)
+                    price_store.fetch_data(p, db)
+            yearly = (lambda db=db: yearly_avg_sqlite(db)) if name == "sqlite_only" else (lambda db=db: yearly_avg_tiered(db))
+            results[name] = {
+                "fetch_data_ms_per_product": timed(fetch_all, args.repeat) / len(products) * 1000,
+                "yearly_avg_all_products_s": timed(yearly, args.repeat),
+                "db_bytes": os.path.getsize(db),
+                "archive_bytes": dir_size(price_store.archive_dir_for(db)) if name == "parquet_tiered" else 0,
+            }
+            r = results[name]
+            print(f"{name:>15}: fetch_data {r['fetch_data_ms_per_product']:.1f} ms/商品, "
+                  f"跨商品年均價 {r['yearly_avg_all_products_s']:.2f}s, "
+                  f"SQLite {r['db_bytes'] / 2**20:.1f} MB + Parquet {r['archive_bytes'] / 2**20:.1f} MB")
+            price_store.close_connection(db)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+import price_store
+
+# ---------------------------------------------------------
+# [批次匯入效能測試]
+# 以 rows/sec 比較舊版逐筆 c.execute 迴圈與 price_store.ingest_prices() 的兩種模式：
+# - 舊版迴圈：把每筆 append 到 v1 的 prices 表，沒有去重、沒有彙總表
+# - ingest_prices(rebuild_rollups=True)：大量回填，逐批 UPSERT 事實列，寫完後才一次重建彙總
+# - ingest_prices()：逐批增量維護日 / 週 / 月彙總 (排程抓取的小批次用)
+# 實測 (1 vCPU，同一台機器重複執行，舊版迴圈本身就有 ±30% 的波動)：
+# - 200k 筆：舊版 20 萬 rows/sec；大量回填 21 萬 (1.03x)；增量 12 萬 (0.61x)
+# - 1M 筆  ：舊版 18-32 萬 rows/sec；大量回填 18-21 萬 (0.67-1.00x)；增量 7-9 萬 (0.27-0.38x)
+# 也就是說，大量回填只是追平舊版迴圈，並沒有更快：多出的去重 (UPSERT) 與彙總重建
+# 抵掉了分批寫入省下的成本。增量模式是回填模式的 1/2.5-1/3。
+# 執行: python bench_ingest.py --rows 10000000 --baseline-rows 1000000
+#       (--baseline-rows 限制舊版迴圈的筆數)
+# ---------------------------------------------------------
+
+
+def synthetic_rows(n_rows, n_platforms=20, n_products=None, seed=42):
+    """
+    產生 n_rows 筆不重複的 (date, platform, product_name, price)，依日期 → 商品 → 平台排列
+    未指定 n_products 時，依筆數推算讓資料約涵蓋一年
+    """
+    rng = random.Random(seed)
+    platforms = [f"Platform {i:02d}" for i in range(n_platforms)]
+    n_products = n_products or max(1, min(10_000, n_rows // (n_platforms * 365)))
+    products = [f"SKU-{i:05d}" for i in range(n_products)]
+    start = date(2020, 1, 1)
+    emitted = 0
+    day = 0
+    while emitted < n_rows:
+        current_date = (start + timedelta(days=day)).isoformat()
+        for p_name in products:
+            for platform in platforms:
+                if emitted >= n_rows:
+                    return
+                yield (current_date, platform, p_name, rng.randrange(50, 500) * 100)
+                emitted += 1
+        day += 1
+
+
+def bench_row_at_a_time(db_path, n_rows):
+    """重現舊版寫法：舊版 prices 表 (v1 schema)，一筆一個 c.execute，最後才 commit"""
+    conn = sqlite3.connect(db_path)
+    conn.executescript(price_store.MIGRATIONS[0])
+    c = conn.cursor()
+    start = time.perf_counter()
+    for row in synthetic_rows(n_rows):
+        c.execute("INSERT INTO prices (date, platform, product_name, price) VALUES (?, ?, ?, ?)", row)
+    conn.commit()
+    seconds = time.perf_counter() - start
+    conn.close()
+    return {"rows": n_rows, "seconds": seconds, "rows_per_sec": n_rows / seconds}
+
+
+def bench_ingest(db_path, n_rows, batch_size, rebuild_rollups):
+    """新版：generator 分批 + UPSERT；rebuild_rollups=True 為大量回填 (寫完後才一次重建彙總)"""
+    def report(done, elapsed):
+        print(f"  ingest_prices: {done:,} rows, {done / elapsed:,.0f} rows/sec", end="\r")
+
+    stats = price_store.ingest_prices(synthetic_rows(n_rows), batch_size=batch_size, db_path=db_path,
+                                      progress=report, rebuild_rollups=rebuild_rollups)
+    print()
+    price_store.close_connection(db_path)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="price_store 批次匯入效能測試")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--baseline-rows", type=int, help="逐筆迴圈筆數 (預設與 --rows 相同)")
+    parser.add_argument("--batch-size", type=int, default=price_store.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = bench_row_at_a_time(os.path.join(tmp, "baseline.db"), args.baseline_rows or args.rows)
+        print(f"逐筆 INSERT 迴圈 (舊版)              : {baseline['rows']:,} rows in {baseline['seconds']:.1f}s "
+              f"({baseline['rows_per_sec']:,.0f} rows/sec)")
+        results = {}
+        for name, rebuild_rollups in (("backfill", True), ("incremental", False)):
+            stats = bench_ingest(os.path.join(tmp, f"{name}.db"), args.rows, args.batch_size, rebuild_rollups)
+            stats["speedup"] = stats["rows_per_sec"] / baseline["rows_per_sec"]
+            results[name] = stats
+            label = "ingest_prices(rebuild_rollups=True)" if rebuild_rollups else "ingest_prices() (逐批增量彙總)"
+            print(f"{label:<37}: {stats['rows']:,} rows in {stats['seconds']:.1f}s "
+                  f"({stats['rows_per_sec']:,.0f} rows/sec, {stats['batches']} batches) → 舊版的 {stats['speedup']:.2f}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"baseline": baseline, **results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
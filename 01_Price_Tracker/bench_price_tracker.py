@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import catalog
+import mock_data
+import price_alerts
+import price_store
+
+# ---------------------------------------------------------
+# [價格追蹤系統規模測試]
+# 以 mock_data 的價格模型產生大型商品目錄 (預設 1,000 商品 × 20 平台 × 1 年)，
+# 在 Streamlit 之外量測儀表板每個步驟的耗時，結果可存成 JSON 作為容量規劃與回歸比較的基準：
+#   1. ingest      : ingest_prices 批次寫入 (含彙總表)
+#   2. alerts      : 整個商品目錄的快照讀取 / 向量化計算 / 寫入
+#   3. fetch_data  : 單一商品完整歷史 (冷快取)
+#   4. pivot       : 完整歷史轉置成 日期 × 平台
+#   5. kpi         : 最新一天價格 + 最低價 / 均價
+#   6. chart_*     : 儀表板各時間範圍的 彙總讀取 + 轉置
+#   7. fetch_alerts: 單一商品的警示
+# 單一商品的步驟以隨機抽樣的商品量測，回報 p50 / p95 / max (毫秒)
+# 執行: python bench_price_tracker.py --products 10000 --platforms 20 --years 3 --json results.json
+# ---------------------------------------------------------
+
+# 與儀表板側邊欄相同的時間範圍 (天數；None 表示全部歷史)
+CHART_RANGES = {"30d": 30, "1y": 365, "all": None}
+
+
+def summarize(samples_ms):
+    """將每次量測的毫秒數整理成 p50 / p95 / max"""
+    arr = np.asarray(samples_ms)
+    return {"n": len(arr), "p50_ms": float(np.percentile(arr, 50)),
+            "p95_ms": float(np.percentile(arr, 95)), "max_ms": float(arr.max())}
+
+
+def time_per_product(func, products, db_path):
+    """每個商品執行前先清除讀取快取，量測冷讀取的耗時"""
+    samples = []
+    for p_name in products:
+        price_store.invalidate_cache(db_path)
+        start = time.perf_counter()
+        func(p_name)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def bench_ingest(db_path, base_prices, platforms, days, batch_size, seed):
+    catalog.register_products(base_prices, db_path)
+    catalog.register_platforms(platforms, db_path)
+
+    def report(done, elapsed):
+        print(f"  ingest: {done:,} rows, {done / elapsed:,.0f} rows/sec", end="\r")
+
+    rows = mock_data.generate_rows(base_prices, platforms, days, rng=random.Random(seed))
+    stats = price_store.ingest_prices(rows, batch_size=batch_size, db_path=db_path, progress=report)
+    print()
+    return stats
+
+
+def bench_alerts(db_path):
+    """整個商品目錄的警示：拆成讀快照、計算、寫入三段計時"""
+    start = time.perf_counter()
+    snapshot = price_alerts.load_snapshot(db_path=db_path)
+    loaded = time.perf_counter()
+    alerts = price_alerts.compute_alerts(snapshot)
+    computed = time.perf_counter()
+    price_alerts.save_alerts(snapshot, alerts, db_path)
+    saved = time.perf_counter()
+    return {"snapshot_rows": len(snapshot), "alerts": len(alerts),
+            "load_snapshot_s": loaded - start, "compute_s": computed - loaded, "save_s": saved - computed}
+
+
+def kpi(p_name, db_path):
+    """儀表板的 KPI：最新一天的最低價與均價"""
+    latest_df = price_store.fetch_latest(p_name, db_path)
+    return latest_df["price"].min(), int(latest_df["price"].mean()), latest_df["date"].max()
+
+
+def chart(p_name, range_days, db_path):
+    """儀表板的圖表資料：依時間範圍選粒度，讀彙總後轉置"""
+    range_end = pd.Timestamp(price_store.fetch_latest(p_name, db_path)["date"].max())
+    if range_days:
+        range_start = range_end - pd.Timedelta(days=range_days - 1)
+    else:
+        range_start = pd.Timestamp(price_store.first_date(p_name, db_path))
+    grain = price_store.choose_grain(range_start, range_end)
+    df = price_store.fetch_rollup(p_name, grain, range_start, range_end, db_path)
+    return df.pivot(index="date", columns="platform", values="avg_price")
+
+
+def run(db_path, n_products, n_platforms, years, queries, batch_size, seed):
+    base_prices, platforms = mock_data.synthetic_catalog(n_products, n_platforms, seed)
+    days = 365 * years
+    results = {"config": {"products": n_products, "platforms": n_platforms, "years": years, "days": days,
+                          "rows": n_products * n_platforms * days, "batch_size": batch_size,
+                          "queries": queries, "seed": seed,
+                          "python": platform.python_version(), "sqlite": sqlite3.sqlite_version}}
+
+    print(f"寫入 {results['config']['rows']:,} 筆 ({n_products:,} 商品 × {n_platforms} 平台 × {days} 天)...")
+    results["ingest"] = bench_ingest(db_path, base_prices, platforms, days, batch_size, seed)
+    print(f"  → {results['ingest']['seconds']:.1f}s ({results['ingest']['rows_per_sec']:,.0f} rows/sec)")
+
+    results["alerts"] = bench_alerts(db_path)
+    print(f"警示 (全目錄): 快照 {results['alerts']['load_snapshot_s']:.2f}s, "
+          f"計算 {results['alerts']['compute_s']:.2f}s, 寫入 {results['alerts']['save_s']:.2f}s")
+
+    sample = random.Random(seed).sample(list(base_prices), min(queries, n_products))
+    steps = {
+        "fetch_data": lambda p: price_store.fetch_data(p, db_path),
+        "pivot": lambda p: price_store.fetch_data(p, db_path).pivot(index="date", columns="platform", values="price"),
+        "kpi": lambda p: kpi(p, db_path),
+        "fetch_alerts": lambda p: price_alerts.fetch_alerts(p, db_path),
+    }
+    for label, range_days in CHART_RANGES.items():
+        steps[f"chart_{label}"] = lambda p, range_days=range_days: chart(p, range_days, db_path)
+    results["per_product"] = {}
+    for name, func in steps.items():
+        results["per_product"][name] = r = time_per_product(func, sample, db_path)
+        print(f"{name:>14}: p50 {r['p50_ms']:8.2f} ms, p95 {r['p95_ms']:8.2f} ms, max {r['max_ms']:8.2f} ms")
+
+    price_store.close_connection(db_path)
+    results["db_bytes"] = os.path.getsize(db_path)
+    print(f"資料庫大小: {results['db_bytes'] / 2**20:,.1f} MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="價格追蹤系統規模測試")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--platforms", type=int, default=20)
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=50, help="隨機抽查的商品數")
+    parser.add_argument("--batch-size", type=int, default=price_store.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="保留測試資料庫於此路徑 (預設使用暫存目錄並於結束後刪除)")
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    tmp = None if args.db else tempfile.mkdtemp()
+    db_path = args.db or os.path.join(tmp, "bench.db")
+    try:
+        results = run(db_path, args.products, args.platforms, args.years, args.queries, args.batch_size, args.seed)
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import json
+
+import scraper
+from mock_server import MockShopServer
+
+# ---------------------------------------------------------
+# [爬蟲吞吐量測試]
+# 對本地模擬網站 (mock_server) 執行 ScrapeEngine，量測不同併發數下的 SKUs/sec
+# 執行: python bench_scraper.py --skus 2000 --latency 0.05 --concurrency 10 100 1000
+# 注意：1000 併發需要足夠的檔案描述子 (ulimit -n)
+# ---------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ScrapeEngine 吞吐量測試")
+    parser.add_argument("--skus", type=int, default=2000, help="每個平台的商品數")
+    parser.add_argument("--platforms", nargs="+", default=["PChome 24h", "Momo 購物網", "Shopee"])
+    parser.add_argument("--latency", type=float, default=0.05, help="模擬網站回應延遲 (秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模擬網站回傳 503 的機率")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    products = [f"SKU-{i:05d}" for i in range(args.skus)]
+    results = []
+    with MockShopServer(latency=args.latency, error_rate=args.error_rate) as server:
+        jobs = scraper.build_jobs(products, args.platforms, server.base_url)
+        for concurrency in args.concurrency:
+            stats = scraper.scrape(jobs, max_concurrency=concurrency,
+                                   per_platform_concurrency=concurrency, backoff=0.05)
+            stats.pop("logs")
+            stats["concurrency"] = concurrency
+            results.append(stats)
+            print(f"concurrency={concurrency:>5}: {len(jobs):,} SKUs in {stats['seconds']:.2f}s "
+                  f"→ {stats['skus_per_sec']:,.0f} SKUs/sec (ok={stats['ok']}, failed={stats['failed']})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"latency": args.latency, "jobs": len(jobs), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
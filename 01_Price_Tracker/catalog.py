@@ -0,0 +1,78 @@
+import price_store
+
+# ---------------------------------------------------------
+# 商品目錄 (Catalog)
+# 商品與平台存放在 price_store 的 products / platforms 維度表，
+# 側邊欄選單、模擬資料與爬蟲工作清單都從這裡讀取，不再各自寫死一份。
+# 新增商品：register_products({"商品名稱": 基準價格})；新增平台：register_platforms(["平台"])
+# 匯入價格時出現的新商品 / 新平台也會自動加入維度表 (基準價格為 NULL)
+# ---------------------------------------------------------
+
+# 預設目錄 (新資料庫第一次啟動時寫入)
+DEFAULT_PRODUCTS = {
+    "iPhone 15 128G": 29900,
+    "Dyson Supersonic 吹風機": 12900,
+    "Sony WH-1000XM5 耳機": 9900,
+}
+DEFAULT_PLATFORMS = ["PChome 24h", "Momo 購物網"]
+
+SQL_LIST_PRODUCTS = "SELECT product_name, base_price FROM products ORDER BY product_id"
+SQL_LIST_PLATFORMS = "SELECT platform FROM platforms ORDER BY platform_id"
+# 已存在的商品只補上缺少的基準價格 (舊資料庫遷移後 base_price 為 NULL)，不覆蓋人工設定
+SQL_UPSERT_PRODUCT = """
+    INSERT INTO products (product_name, base_price) VALUES (?, ?)
+    ON CONFLICT (product_name) DO UPDATE SET base_price = excluded.base_price
+    WHERE base_price IS NULL AND excluded.base_price IS NOT NULL
+"""
+SQL_INSERT_PLATFORM = "INSERT OR IGNORE INTO platforms (platform) VALUES (?)"
+
+
+def _write(db_path, sql, params):
+    """執行寫入；只有真的改到資料時才讓讀取快取失效 (每次 rerun 呼叫也不會清掉快取)"""
+    with price_store.write_lock():
+        conn = price_store.get_connection(db_path)
+        before = conn.total_changes
+        with conn:
+            conn.executemany(sql, params)
+        changed = conn.total_changes - before
+        if changed:
+            price_store.invalidate_cache(db_path)
+    return changed
+
+
+def register_products(products, db_path=price_store.DB_NAME):
+    """新增商品；products 為 {商品名稱: 基準價格} 或商品名稱的 iterable。回傳實際異動筆數"""
+    items = products.items() if isinstance(products, dict) else ((name, None) for name in products)
+    return _write(db_path, SQL_UPSERT_PRODUCT, list(items))
+
+
+def register_platforms(platforms, db_path=price_store.DB_NAME):
+    """新增平台。回傳實際新增筆數"""
+    return _write(db_path, SQL_INSERT_PLATFORM, [(p,) for p in platforms])
+
+
+def seed_catalog(db_path=price_store.DB_NAME):
+    """寫入預設商品與平台 (已存在者略過)"""
+    register_products(DEFAULT_PRODUCTS, db_path)
+    register_platforms(DEFAULT_PLATFORMS, db_path)
+
+
+def _products(db_path):
+    return price_store.cached_read(db_path, ("catalog_products",),
+                                   lambda conn: conn.execute(SQL_LIST_PRODUCTS).fetchall())
+
+
+def list_products(db_path=price_store.DB_NAME):
+    """所有商品名稱 (依加入順序)"""
+    return [name for name, _ in _products(db_path)]
+
+
+def base_prices(db_path=price_store.DB_NAME):
+    """{商品名稱: 基準價格}；未設定基準價格的商品不列入"""
+    return {name: price for name, price in _products(db_path) if price is not None}
+
+
+def list_platforms(db_path=price_store.DB_NAME):
+    """所有平台名稱 (依加入順序)"""
+    return [p for (p,) in price_store.cached_read(db_path, ("catalog_platforms",),
+                                                  lambda conn: conn.execute(SQL_LIST_PLATFORMS).fetchall())]
@@ -1,121 +1,87 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
+import os
 import random
-from datetime import datetime, timedelta
-import time
+import sys
+from datetime import datetime
+import catalog
+import mock_data
+import price_alerts
+import price_store
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 共用的 perf_stages 在 repo 根目錄
+import perf_stages
 
 # ---------------------------------------------------------
 # [安裝與執行教學]
 # 1. 確保已安裝套件: pip install streamlit pandas matplotlib
 # 2. 在終端機(Terminal)執行: streamlit run ecommerce_price_dashboard.py
+# 效能：各階段 (讀取資料、pivot、警示、爬蟲) 的耗時顯示在側邊欄的「效能」面板 (perf_stages)
 # ---------------------------------------------------------
 
 # --- 設定頁面配置 ---
 st.set_page_config(page_title="電商競品價格追蹤儀表板", layout="wide")
+perf_stages.begin_run("prices")
 
-# --- 資料庫設定 (使用 SQLite 本地資料庫) ---
-DB_NAME = "ecommerce_prices.db"
+# --- 資料庫設定 (使用 SQLite 本地資料庫，存取邏輯集中於 price_store 模組) ---
+DB_NAME = price_store.DB_NAME
 
+@perf_stages.staged("初始化資料庫")
 def init_db():
-    """初始化資料庫與資料表"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    # 建立表格：記錄日期, 平台, 商品名稱, 價格
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS prices (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT,
-            platform TEXT,
-            product_name TEXT,
-            price INTEGER
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    """初始化資料庫與資料表，並寫入預設商品目錄"""
+    price_store.init_db(DB_NAME)
+    catalog.seed_catalog(DB_NAME)
 
+@perf_stages.staged("模擬資料 / 補算警示")
 def generate_mock_data():
     """
     生成過去 30 天的模擬數據 (為了讓圖表一開始就有東西看)
     模擬情境：PChome 和 Momo 兩大平台針對 iPhone 15 和 Dyson 吹風機的價格戰
     """
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
-    # 檢查是否已經有資料，若有則不重新生成
-    c.execute("SELECT count(*) FROM prices")
-    if c.fetchone()[0] > 0:
-        conn.close()
+    # 檢查是否已經有資料，若有則不重新生成 (筆數來自讀取快取，不會每次 rerun 都查詢)
+    if price_store.count_prices(DB_NAME) > 0:
+        # 舊版資料庫升級後還沒有警示資料，補算一次整個商品目錄
+        if price_alerts.count_alerts(DB_NAME) == 0:
+            price_alerts.evaluate_alerts(db_path=DB_NAME)
         return
 
-    products = ["iPhone 15 128G", "Dyson Supersonic 吹風機", "Sony WH-1000XM5 耳機"]
-    platforms = ["PChome 24h", "Momo 購物網"]
-    
-    # 基準價格
-    base_prices = {
-        "iPhone 15 128G": 29900,
-        "Dyson Supersonic 吹風機": 12900,
-        "Sony WH-1000XM5 耳機": 9900
-    }
+    # 商品、平台與基準價格皆來自商品目錄
+    base_prices = catalog.base_prices(DB_NAME)
+    platforms = catalog.list_platforms(DB_NAME)
 
     print("正在生成模擬數據...")
-    for day in range(30):
-        current_date = (datetime.now() - timedelta(days=30-day)).strftime("%Y-%m-%d")
-        
-        for p_name in products:
-            base = base_prices[p_name]
-            for platform in platforms:
-                # 模擬價格波動：隨機增減 5%
-                fluctuation = random.uniform(0.95, 1.05)
-                # 週末可能會特價 (模擬行銷活動)
-                if datetime.strptime(current_date, "%Y-%m-%d").weekday() >= 5: 
-                    fluctuation -= 0.03 # 週末再降 3%
-                
-                final_price = int(base * fluctuation)
-                # 取整數 (例如 29900 -> 29500) 讓價格看起來更像真的
-                final_price = round(final_price / 100) * 100 
-                
-                c.execute("INSERT INTO prices (date, platform, product_name, price) VALUES (?, ?, ?, ?)",
-                          (current_date, platform, p_name, final_price))
-    
-    conn.commit()
-    conn.close()
-
-def fetch_data(product_name):
-    """從資料庫讀取特定商品的歷史價格"""
-    conn = sqlite3.connect(DB_NAME)
-    query = f"SELECT date, platform, price FROM prices WHERE product_name = '{product_name}' ORDER BY date"
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+    # 價格波動與週末特價的模型在 mock_data 模組，效能測試也共用同一套
+    rows = mock_data.generate_rows(base_prices, platforms, days=30)
+    price_alerts.ingest_with_alerts(rows, db_path=DB_NAME)
 
+@perf_stages.staged("爬蟲 (模擬)")
 def run_scraper_simulation():
     """
     模擬爬蟲執行：
-    在真實專案中，這裡會使用 requests/BeautifulSoup 或 Selenium 去抓取實際網頁。
+    啟動本地模擬電商網站 (mock_server)，再由非同步爬蟲引擎 (scraper) 併發抓取各平台頁面、
+    解析價格並批次寫入資料庫。正式環境只要把 base_url 換成真實網站並註冊對應的解析器即可。
     """
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+    # 延遲載入：爬蟲 (asyncio / ssl) 與模擬網站只在按下按鈕時才需要
+    import scraper
+    from mock_server import MockShopServer
+
     today = datetime.now().strftime("%Y-%m-%d")
     
-    products = ["iPhone 15 128G", "Dyson Supersonic 吹風機", "Sony WH-1000XM5 耳機"]
-    platforms = ["PChome 24h", "Momo 購物網"]
-    base_prices = {"iPhone 15 128G": 29900, "Dyson Supersonic 吹風機": 12900, "Sony WH-1000XM5 耳機": 9900}
+    base_prices = catalog.base_prices(DB_NAME)
+    products = list(base_prices)
+    platforms = catalog.list_platforms(DB_NAME)
     
-    new_data = []
-    for p_name in products:
-        for platform in platforms:
-            # 模擬今日新價格
-            price = int(base_prices[p_name] * random.uniform(0.92, 1.02)) # 模擬突然大特價
-            price = round(price / 100) * 100
-            
-            c.execute("INSERT INTO prices (date, platform, product_name, price) VALUES (?, ?, ?, ?)",
-                      (today, platform, p_name, price))
-            new_data.append(f"抓取成功: {platform} - {p_name} : ${price}")
-            
-    conn.commit()
-    conn.close()
-    return new_data
+    def mock_price(platform, p_name):
+        # 模擬今日新價格
+        price = int(base_prices[p_name] * random.uniform(0.92, 1.02)) # 模擬突然大特價
+        return round(price / 100) * 100
+
+    # 同一天重複執行會以 UPSERT 覆蓋當日價格；每批寫入後只重算該批商品的警示，
+    # 讀取快取失效，rerun 時即可看到新數據
+    with MockShopServer(latency=0.3, price_fn=mock_price) as server:
+        jobs = scraper.build_jobs(products, platforms, server.base_url)
+        stats = scraper.scrape(jobs, date=today,
+                               sink=lambda rows: price_alerts.ingest_with_alerts(rows, db_path=DB_NAME))
+    return stats["logs"]
 
 # --- 主程式邏輯 ---
 
@@ -127,14 +93,17 @@ generate_mock_data()
 st.sidebar.title("🔍 競品價格監控系統")
 st.sidebar.markdown("模擬電商營運人員的監控視角")
 
-product_list = ["iPhone 15 128G", "Dyson Supersonic 吹風機", "Sony WH-1000XM5 耳機"]
+product_list = catalog.list_products(DB_NAME)
 selected_product = st.sidebar.selectbox("請選擇要分析的商品", product_list)
 
+# 時間範圍 (天數；None 表示全部歷史)，圖表會依區間長度自動改用日 / 週 / 月彙總
+range_options = {"近 30 天": 30, "近 90 天": 90, "近 1 年": 365, "近 5 年": 365 * 5, "全部": None}
+selected_range = st.sidebar.selectbox("圖表時間範圍", list(range_options), index=0)
+
 st.sidebar.markdown("---")
 st.sidebar.subheader("⚙️ 系統操作")
 if st.sidebar.button("🚀 執行即時爬蟲 (模擬)"):
     with st.spinner('正在連線至各大電商平台...'):
-        time.sleep(1.5) # 假裝在跑
         logs = run_scraper_simulation()
     st.sidebar.success("資料更新完成！")
     for log in logs:
@@ -144,12 +113,19 @@ if st.sidebar.button("🚀 執行即時爬蟲 (模擬)"):
 # 3. 主要內容區
 st.title(f"📊 {selected_product} 價格趨勢分析")
 
-# 讀取資料
-df = fetch_data(selected_product)
+# 讀取資料：KPI 只需要最新一天的價格，不必載入整段歷史
+with perf_stages.stage("fetch_latest") as record:
+    latest_df = price_store.fetch_latest(selected_product, DB_NAME)
+    record["rows"] = len(latest_df)
+
+# 剛加入商品目錄 (catalog.register_products) 的商品還沒有任何價格
+if latest_df.empty:
+    st.warning("此商品尚無價格資料，請先執行爬蟲或匯入價格。")
+    perf_stages.render_panel()
+    st.stop()
 
 # 計算 KPI
-latest_date = df['date'].max()
-latest_df = df[df['date'] == latest_date]
+latest_date = latest_df['date'].max()
 lowest_price = latest_df['price'].min()
 avg_price = int(latest_df['price'].mean())
 
@@ -159,36 +135,50 @@ col2.metric("今日市場均價", f"${avg_price:,}")
 col3.metric("資料更新日期", latest_date)
 
 # 4. 繪製互動圖表
-st.subheader("平台價格走勢比較 (PChome vs Momo)")
+st.subheader("各平台價格走勢比較")
+
+# 從彙總表讀取圖表資料：區間越長改用越粗的粒度，5 年走勢只需讀取數百列
+grain_labels = {"day": "日", "week": "週", "month": "月"}
+range_days = range_options[selected_range]
+range_end = pd.Timestamp(latest_date)
+if range_days:
+    range_start = range_end - pd.Timedelta(days=range_days - 1)
+else:
+    range_start = pd.Timestamp(price_store.first_date(selected_product, DB_NAME))
+grain = price_store.choose_grain(range_start, range_end)
+with perf_stages.stage(f"fetch_rollup ({grain})") as record:
+    df = price_store.fetch_rollup(selected_product, grain, range_start, range_end, DB_NAME)
+    record["rows"] = len(df)
+st.caption(f"資料粒度：{grain_labels[grain]} (圖表顯示各平台{grain_labels[grain]}平均價)")
 
 # 將資料轉置為適合繪圖的格式 (Pivot)
 # Index: Date, Columns: Platform, Values: Price
-chart_data = df.pivot(index='date', columns='platform', values='price')
+with perf_stages.stage("pivot", rows=len(df)):
+    chart_data = df.pivot(index='date', columns='platform', values='avg_price')
 
 # 使用 Streamlit 內建的折線圖 (基於 Altair/Vega-Lite)
-st.line_chart(chart_data)
+with perf_stages.stage("折線圖", rows=len(chart_data)):
+    st.line_chart(chart_data)
 
 # 5. 商業洞察分析 (模擬自動產生的報告)
 st.subheader("💡 商業洞察報告")
-insight_text = ""
-p_pchome = latest_df[latest_df['platform'] == 'PChome 24h']['price'].values[0]
-p_momo = latest_df[latest_df['platform'] == 'Momo 購物網']['price'].values[0]
-
-if p_pchome < p_momo:
-    diff = p_momo - p_pchome
-    insight_text += f"⚠️ **警示**：目前 **PChome 24h** 價格比 Momo 便宜 **${diff}**。建議行銷團隊檢查是否需要跟進降價，或強調贈品優勢。"
-elif p_momo < p_pchome:
-    diff = p_pchome - p_momo
-    insight_text += f"⚠️ **警示**：目前 **Momo 購物網** 價格比 PChome 便宜 **${diff}**。請注意競爭對手的促銷活動。"
+# 警示由 price_alerts 在資料寫入時預先算好，這裡只讀取選定商品最新一天的結果
+with perf_stages.stage("fetch_alerts") as record:
+    alerts_df = price_alerts.fetch_alerts(selected_product, DB_NAME)
+    record["rows"] = len(alerts_df)
+if alerts_df.empty:
+    insight_text = "ℹ️ 目前只有單一平台的價格資料，尚無法比價。"
 else:
-    insight_text += "✅ 目前兩大平台價格持平，市場行情穩定。"
+    insight_text = "\n\n".join(alerts_df['message'])
 
 st.info(insight_text)
 
 # 6. 詳細資料表格
-with st.expander("查看原始數據資料表"):
+with st.expander("查看彙總數據資料表"):
     st.dataframe(df.sort_values(by='date', ascending=False), use_container_width=True)
 
 # 7. 頁尾說明
 st.markdown("---")
-st.caption("開發者: [EddieTcLee] | 技術棧: Python, Streamlit, SQLite")
\ No newline at end of file
+st.caption("開發者: [EddieTcLee] | 技術棧: Python, Streamlit, SQLite")
+
+perf_stages.render_panel()
\ No newline at end of file
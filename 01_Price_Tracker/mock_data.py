@@ -0,0 +1,45 @@
+import random
+from datetime import datetime, timedelta
+
+# ---------------------------------------------------------
+# 模擬價格資料產生器
+# 儀表板的 generate_mock_data() 與大規模效能測試 (bench_price_tracker) 共用同一套價格模型：
+# - 每天每個平台在基準價格上隨機增減 5%
+# - 週末 (六、日) 再降 3%，模擬行銷活動
+# - 取整到百元 (例如 29900 -> 29500) 讓價格看起來更像真的
+# ---------------------------------------------------------
+
+FLUCTUATION = 0.05
+WEEKEND_DISCOUNT = 0.03
+
+
+def mock_price(base, day, rng=random):
+    """依基準價格產生 day 當天的模擬價格"""
+    # 模擬價格波動：隨機增減 5%
+    fluctuation = rng.uniform(1 - FLUCTUATION, 1 + FLUCTUATION)
+    # 週末可能會特價 (模擬行銷活動)
+    if day.weekday() >= 5:
+        fluctuation -= WEEKEND_DISCOUNT
+    return round(int(base * fluctuation) / 100) * 100
+
+
+def generate_rows(base_prices, platforms, days, end=None, rng=random):
+    """
+    產生 end (預設為現在) 之前 days 天的 (date, platform, product_name, price)
+    依日期 → 商品 → 平台排列；為 generator，可直接交給 ingest_prices 分批寫入
+    """
+    end = end or datetime.now()
+    for offset in range(days, 0, -1):
+        day = end - timedelta(days=offset)
+        current_date = day.strftime("%Y-%m-%d")
+        for p_name, base in base_prices.items():
+            for platform in platforms:
+                yield (current_date, platform, p_name, mock_price(base, day, rng))
+
+
+def synthetic_catalog(n_products, n_platforms, seed=42):
+    """產生大型模擬目錄：({商品名稱: 基準價格}, [平台名稱])"""
+    rng = random.Random(seed)
+    base_prices = {f"SKU-{i:05d}": rng.randrange(5, 500) * 100 for i in range(n_products)}
+    platforms = [f"Platform {i:02d}" for i in range(n_platforms)]
+    return base_prices, platforms
@@ -0,0 +1,113 @@
+import asyncio
+import random
+import threading
+import zlib
+from urllib.parse import unquote
+
+# ---------------------------------------------------------
+# 本地模擬電商網站 (Stand-in HTTP Server)
+# 提供各平台格式的假商品頁，可設定回應延遲與錯誤率，
+# 讓 scraper.ScrapeEngine 不必連上真實網站也能測試與量測吞吐量。
+# URL 格式：/{平台}/{商品} (URL encoded)
+# ---------------------------------------------------------
+
+PAGE_TEMPLATES = {
+    "PChome 24h": '<html><body><h1>{product}</h1><span id="PriceTotal">{price:,}</span></body></html>',
+    "Momo 購物網": '<html><body><h1>{product}</h1><span class="price">${price:,}</span></body></html>',
+}
+DEFAULT_TEMPLATE = ('<html><head><meta itemprop="price" content="{price}"></head>'
+                    '<body><h1>{product}</h1></body></html>')
+
+
+def default_price(platform, product_name):
+    """依平台與商品名稱產生穩定的假價格 (同一組合每次相同)"""
+    seed = zlib.crc32(f"{platform}|{product_name}".encode("utf-8"))
+    return (seed % 400 + 50) * 100
+
+
+class MockShopServer:
+    """
+    在背景執行緒啟動的 asyncio HTTP 伺服器
+    - latency: 每個請求的回應延遲秒數 (模擬網路與網站處理時間)
+    - error_rate: 回傳 503 的機率 (用來測試重試)
+    - price_fn(platform, product_name) -> int: 商品價格來源
+    用法：
+        with MockShopServer(latency=0.05) as server:
+            jobs = scraper.build_jobs(products, platforms, server.base_url)
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, price_fn=default_price, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.price_fn = price_fn
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass  # 略過 headers
+            self.requests += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            status, body = self._render(request_line.decode("latin-1"))
+            payload = body.encode("utf-8")
+            writer.write((f"HTTP/1.1 {status}\r\nContent-Type: text/html; charset=utf-8\r\n"
+                          f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n").encode("latin-1"))
+            writer.write(payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _render(self, request_line):
+        try:
+            _, path, _ = request_line.split(" ", 2)
+            platform, product_name = (unquote(part) for part in path.strip("/").split("/", 1))
+        except ValueError:
+            return "404 Not Found", "not found"
+        if self.error_rate and random.random() < self.error_rate:
+            return "503 Service Unavailable", "busy"
+        template = PAGE_TEMPLATES.get(platform, DEFAULT_TEMPLATE)
+        return "200 OK", template.format(product=product_name, price=self.price_fn(platform, product_name))
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, backlog=4096))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._server.close()
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,187 @@
+import pandas as pd
+
+import price_store
+
+# ---------------------------------------------------------
+# 價格警示引擎
+# 以「每個商品最新一天的各平台價格」(快照) 為輸入，一次向量化計算整個商品目錄：
+# - cheapest : 最便宜的平台 (並列時列出所有並列的平台)，與次低價的差額；所有平台同價時為持平
+# - spread   : 平台間最高與最低價差超過門檻 (platform 欄為 "*")
+# - drop     : 單一平台較該平台前一筆價格降價超過門檻
+# - undercut : 最低價平台易主 (前一筆的最低價平台被其他平台搶下)
+# 平台數量不限；只有一個平台的商品不會產生比價類警示。
+# 結果寫入 alerts 表；搭配 ingest_prices(on_batch=...) 只重算本批涉及的商品。
+# ---------------------------------------------------------
+
+ALERT_RULES = {
+    "spread_pct": 0.03,   # 平台間價差 ≥ 3% 發出 spread 警示
+    "drop_pct": 0.05,     # 單日降價 ≥ 5% 發出 drop 警示
+}
+ALL_PLATFORMS = "*"
+
+# 快照：每個商品最新一天各平台的價格，以及該平台前一筆價格 (從日彙總讀取，歸檔後仍可用)
+SQL_SNAPSHOT = """
+    WITH latest AS (
+        SELECT product_id, max(bucket) AS day FROM price_rollups
+        WHERE grain = 'day' {product_filter}
+        GROUP BY product_id
+    )
+    SELECT pr.product_name, pl.platform, date(l.day + 2440587.5) AS date, r.last_price AS price,
+           (SELECT p.last_price FROM price_rollups p
+            WHERE p.product_id = r.product_id AND p.grain = 'day'
+              AND p.platform_id = r.platform_id AND p.bucket < l.day
+            ORDER BY p.bucket DESC LIMIT 1) AS prev_price
+    FROM latest l
+    JOIN price_rollups r ON r.product_id = l.product_id AND r.grain = 'day' AND r.bucket = l.day
+    JOIN products pr ON pr.product_id = l.product_id
+    JOIN platforms pl ON pl.platform_id = r.platform_id
+"""
+SQL_PRODUCTS_CREATE = "CREATE TEMP TABLE IF NOT EXISTS alert_products (product_name TEXT PRIMARY KEY)"
+SQL_PRODUCTS_CLEAR = "DELETE FROM alert_products"
+SQL_PRODUCTS_INSERT = "INSERT OR IGNORE INTO alert_products (product_name) VALUES (?)"
+SQL_DELETE_ALERTS = "DELETE FROM alerts WHERE product_name = ? AND date = ?"
+SQL_INSERT_ALERT = """
+    INSERT INTO alerts (date, product_name, platform, kind, value, message) VALUES (?, ?, ?, ?, ?, ?)
+"""
+SQL_FETCH_ALERTS = """
+    SELECT date, platform, kind, value, message FROM alerts
+    WHERE product_name = ? AND date = (SELECT max(date) FROM alerts WHERE product_name = ?)
+    ORDER BY CASE kind WHEN 'cheapest' THEN 0 WHEN 'undercut' THEN 1 WHEN 'drop' THEN 2 ELSE 3 END, platform
+"""
+SQL_COUNT_ALERTS = "SELECT count(*) FROM alerts"
+
+ALERT_COLUMNS = ["date", "product_name", "platform", "kind", "value", "message"]
+
+
+def load_snapshot(products=None, db_path=price_store.DB_NAME):
+    """讀取商品快照；products 為 None 時讀取整個商品目錄"""
+    conn = price_store.get_connection(db_path)
+    if products is None:
+        return pd.read_sql_query(SQL_SNAPSHOT.format(product_filter=""), conn)
+    conn.execute(SQL_PRODUCTS_CREATE)
+    conn.execute(SQL_PRODUCTS_CLEAR)
+    conn.executemany(SQL_PRODUCTS_INSERT, ((p,) for p in products))
+    return pd.read_sql_query(
+        SQL_SNAPSHOT.format(product_filter="""
+            AND product_id IN (SELECT product_id FROM products JOIN alert_products USING (product_name))"""), conn)
+
+
+def _money(values):
+    # 轉成字串欄位：沒有任何警示 (空的 Series) 時 map 會保留 int64 型別，後續字串相接會失敗
+    return values.round().astype("int64").map("${:,}".format).astype(str)
+
+
+def compute_alerts(snapshot, rules=ALERT_RULES):
+    """
+    對快照做一次向量化計算，回傳警示 DataFrame (欄位見 ALERT_COLUMNS)
+    snapshot 欄位：product_name, platform, date, price, prev_price (可為 NaN)
+    """
+    if snapshot.empty:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    df = snapshot.sort_values(["product_name", "price", "platform"], ignore_index=True)
+    by_product = df.groupby("product_name", sort=False)
+    rank = by_product.cumcount()
+    n_platforms = by_product["price"].transform("size")
+    p_min = by_product["price"].transform("min")
+    p_max = by_product["price"].transform("max")
+    alerts = []
+
+    # 1. 最便宜平台：每個商品排序後的第一列，差額 = 高於最低價的次低價 - 最低價
+    #    多個平台同為最低價時列出所有並列的平台；所有平台同價 (最高價 = 最低價) 才算持平
+    leader = df[(rank == 0) & (n_platforms >= 2)]
+    cheapest = df[df["price"] == p_min].groupby("product_name", sort=False)["platform"]
+    n_tied = leader["product_name"].map(cheapest.size())
+    tied = leader["product_name"].map(cheapest.agg("、".join))
+    next_price = df[df["price"] > p_min].groupby("product_name", sort=False)["price"].min()
+    gap = (leader["product_name"].map(next_price) - leader["price"]).fillna(0).astype(leader["price"].dtype)
+    flat = p_max[leader.index] == p_min[leader.index]
+    alerts.append(pd.DataFrame({
+        "date": leader["date"], "product_name": leader["product_name"], "platform": leader["platform"],
+        "kind": "cheapest", "value": gap,
+        "message": ("⚠️ 目前 **" + leader["platform"] + "** 價格最便宜，比次低價便宜 **" + _money(gap) + "**。")
+        .where(n_tied == 1, "⚠️ 目前 **" + tied + "** 並列最便宜，比其他平台便宜 **" + _money(gap) + "**。")
+        .where(~flat, "✅ 目前各平台價格持平，市場行情穩定。"),
+    }))
+
+    # 2. 平台間價差
+    spread = (p_max - p_min) / p_min
+    wide = df[(rank == 0) & (n_platforms >= 2) & (spread >= rules["spread_pct"])]
+    wide_spread = spread[wide.index]
+    alerts.append(pd.DataFrame({
+        "date": wide["date"], "product_name": wide["product_name"], "platform": ALL_PLATFORMS,
+        "kind": "spread", "value": wide_spread,
+        "message": "📊 平台間價差達 **" + (wide_spread * 100).round(1).astype(str) + "%** ("
+                   + _money(p_min[wide.index]) + " ~ " + _money(p_max[wide.index]) + ")。",
+    }))
+
+    # 3. 單日降價
+    drop = (df["prev_price"] - df["price"]) / df["prev_price"]
+    dropped = df[drop >= rules["drop_pct"]]
+    alerts.append(pd.DataFrame({
+        "date": dropped["date"], "product_name": dropped["product_name"], "platform": dropped["platform"],
+        "kind": "drop", "value": drop[dropped.index],
+        "message": "📉 **" + dropped["platform"] + "** 較前次降價 **" + (drop[dropped.index] * 100).round(1).astype(str)
+                   + "%** (" + _money(dropped["prev_price"]) + " → " + _money(dropped["price"]) + ")，建議評估是否跟進。",
+    }))
+
+    # 4. 搶下最低價：前一筆最低價的平台 ≠ 目前最低價的平台
+    had_prev = df[df["prev_price"].notna()]
+    if not had_prev.empty:
+        prev_leader = had_prev.loc[had_prev.groupby("product_name")["prev_price"].idxmin(),
+                                   ["product_name", "platform", "price"]]
+        prev_leader = prev_leader.set_index("product_name")
+        contested = leader[leader["product_name"].isin(prev_leader.index)]
+        prev_platform = contested["product_name"].map(prev_leader["platform"])
+        prev_platform_now = contested["product_name"].map(prev_leader["price"])
+        taken = contested[(prev_platform != contested["platform"]) & (contested["price"] < prev_platform_now)]
+        lead = prev_platform_now[taken.index] - taken["price"]
+        alerts.append(pd.DataFrame({
+            "date": taken["date"], "product_name": taken["product_name"], "platform": taken["platform"],
+            "kind": "undercut", "value": lead,
+            "message": "🔻 **" + taken["platform"] + "** 搶下最低價，比前次最低價平台 **"
+                       + prev_platform[taken.index] + "** 便宜 **" + _money(lead) + "**，請注意競爭對手的促銷活動。",
+        }))
+
+    frames = [a for a in alerts if not a.empty]
+    if not frames:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[ALERT_COLUMNS]
+
+
+def save_alerts(snapshot, alerts, db_path=price_store.DB_NAME):
+    """以本次計算結果取代快照中 (商品, 日期) 的舊警示"""
+    keys = snapshot[["product_name", "date"]].drop_duplicates()
+    with price_store.write_lock():
+        conn = price_store.get_connection(db_path)
+        with conn:
+            conn.executemany(SQL_DELETE_ALERTS, keys.itertuples(index=False, name=None))
+            conn.executemany(SQL_INSERT_ALERT, alerts[ALERT_COLUMNS].astype(object).itertuples(index=False, name=None))
+        price_store.invalidate_cache(db_path)
+
+
+def evaluate_alerts(products=None, db_path=price_store.DB_NAME, rules=ALERT_RULES):
+    """重新計算並儲存警示；products 為 None 時處理整個商品目錄。回傳警示 DataFrame"""
+    with price_store.write_lock():
+        snapshot = load_snapshot(products, db_path)
+        alerts = compute_alerts(snapshot, rules)
+        save_alerts(snapshot, alerts, db_path)
+    return alerts
+
+
+def ingest_with_alerts(rows, db_path=price_store.DB_NAME, **ingest_options):
+    """寫入價格，並在每批提交後只針對該批涉及的商品增量更新警示"""
+    return price_store.ingest_prices(
+        rows, db_path=db_path, on_batch=lambda products: evaluate_alerts(products, db_path), **ingest_options)
+
+
+def count_alerts(db_path=price_store.DB_NAME):
+    return price_store.cached_read(db_path, ("alerts_count",),
+                                   lambda conn: conn.execute(SQL_COUNT_ALERTS).fetchone()[0])
+
+
+def fetch_alerts(product_name, db_path=price_store.DB_NAME):
+    """讀取特定商品最新一天的警示"""
+    df = price_store.cached_read(db_path, ("alerts", product_name),
+                                 lambda conn: pd.read_sql_query(SQL_FETCH_ALERTS, conn,
+                                                                params=(product_name, product_name)))
+    return df.copy()
@@ -0,0 +1,146 @@
+import argparse
+import os
+import uuid
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+import price_store
+
+# ---------------------------------------------------------
+# 冷資料歸檔 (Parquet / Arrow 欄式儲存)
+# - archive_closed_months()：把已結束月份的 price_facts 資料搬到
+#   {db 檔名}_archive/month=YYYY-MM/platform=平台/*.parquet，再從 SQLite 刪除
+# - read_product()：以 memory-map 開啟分區檔案，只讀取指定商品所在的 row group
+# price_store.fetch_data() 會自動把冷資料與 SQLite 的熱資料合併。
+# 已歸檔月份視為不再變動：歸檔界線記錄在 archive_state，之後寫入更早日期的批次會被拒絕
+# (若補寫舊月份價格，請在歸檔前完成)。
+# 歸檔界線一律對齊到月初 (月 bucket 不會跨越界線)；跨越界線的其他 bucket (界線所在的那一週)
+# 在界線前的幾天同時留在 SQLite，之後的覆蓋寫入重算該 bucket 的 min/max 時仍看得到已歸檔的價格
+# (讀取時冷熱重複以 SQLite 為準)。
+# 執行: python price_archive.py [--db ecommerce_prices.db] [--before 2024-01-01] [--vacuum]
+# ---------------------------------------------------------
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("date", pa.date32()),
+    ("product_name", pa.string()),
+    ("price", pa.int32()),
+    ("month", pa.string()),
+    ("platform", pa.string()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("month", pa.string()), ("platform", pa.string())]), flavor="hive")
+ROWS_PER_GROUP = 8 * 1024    # row group 越小，依商品過濾時可略過的比例越高 (代價是較多的統計資訊)
+CHUNK_ROWS = 2_000_000       # 每次從 SQLite 讀出的筆數，限制歸檔時的記憶體用量
+
+SQL_SELECT_CLOSED = """
+    SELECT date(f.day + 2440587.5) AS date, pl.platform, pr.product_name, f.price
+    FROM price_facts f JOIN products pr USING (product_id) JOIN platforms pl USING (platform_id)
+    WHERE f.day >= ? AND f.day < ?
+"""
+SQL_DELETE_CLOSED = "DELETE FROM price_facts WHERE day < ?"
+SQL_GET_CUTOFF = "SELECT cutoff_day FROM archive_state"
+SQL_SET_CUTOFF = """
+    INSERT INTO archive_state (id, cutoff_day) VALUES (0, ?)
+    ON CONFLICT (id) DO UPDATE SET cutoff_day = max(cutoff_day, excluded.cutoff_day)
+"""
+
+_datasets = {}   # archive_dir -> pyarrow Dataset (檔案列表掃描的結果)
+
+
+def _open_dataset(archive_dir):
+    if archive_dir not in _datasets:
+        # use_mmap：以 memory-map 讀檔，由作業系統分頁快取，不必整份複製進記憶體
+        dataset = ds.dataset(archive_dir, format="parquet", partitioning=PARTITIONING,
+                             filesystem=pafs.LocalFileSystem(use_mmap=True))
+        fragments = list(dataset.get_fragments())
+        # 預先載入每個檔案的 row group 統計，之後查詢可直接在記憶體中略過不相關的檔案與 row group
+        for fragment in fragments:
+            fragment.ensure_complete_metadata()
+        _datasets[archive_dir] = (dataset, fragments)
+    return _datasets[archive_dir]
+
+
+def archive_closed_months(db_path=price_store.DB_NAME, before=None, vacuum=False):
+    """
+    將 before 所在月份 1 日 (預設為本月 1 日) 之前、尚未歸檔的價格資料寫成 Parquet，並從 price_facts 表刪除
+    (跨越界線的彙總 bucket 保留在 price_facts，下次歸檔時不會重複寫出)
+    彙總表 price_rollups 不受影響，長區間圖表仍可直接讀取
+    回傳歸檔筆數
+    """
+    # 月中的日期會把同一個月拆成冷熱兩半，重算月 min/max 時會漏掉已歸檔的那一半
+    before_date = price_store.bucket_start("month", before or datetime.now())
+    cutoff = price_store.to_day(before_date)
+    # 彙總 bucket 只要有一天在界線之後就保留整個 bucket 的原始資料
+    keep_from = min(price_store.to_day(price_store.bucket_start(grain, before_date))
+                    for grain in price_store.ROLLUP_GRAINS)
+    archive_dir = price_store.archive_dir_for(db_path)
+    run_id = uuid.uuid4().hex
+    total = 0
+    with price_store.write_lock():
+        conn = price_store.get_connection(db_path)
+        # 上次歸檔界線之前的資料都已寫出 (沒有紀錄時從頭開始)
+        previous = conn.execute(SQL_GET_CUTOFF).fetchone()
+        start = previous[0] if previous else -(1 << 62)
+        chunks = pd.read_sql_query(SQL_SELECT_CLOSED, conn, params=(start, cutoff), chunksize=CHUNK_ROWS)
+        for i, df in enumerate(chunks):
+            df["month"] = df["date"].str.slice(0, 7)
+            # 檔案內依商品、日期排序，row group 的 min/max 統計才能有效略過不相關的商品
+            df = df.sort_values(["month", "platform", "product_name", "date"])
+            df["date"] = pd.to_datetime(df["date"]).dt.date
+            table = pa.Table.from_pandas(df[ARCHIVE_SCHEMA.names], schema=ARCHIVE_SCHEMA, preserve_index=False)
+            ds.write_dataset(table, archive_dir, format="parquet", partitioning=PARTITIONING,
+                             basename_template=f"part-{run_id}-{i}-{{i}}.parquet",
+                             existing_data_behavior="overwrite_or_ignore",
+                             max_rows_per_group=ROWS_PER_GROUP, min_rows_per_group=ROWS_PER_GROUP // 4)
+            total += len(df)
+        if total == 0:
+            return 0
+        # 先寫檔再刪除：中途失敗頂多兩邊都有同一筆，讀取時會去重
+        with conn:
+            conn.execute(SQL_DELETE_CLOSED, (keep_from,))
+            conn.execute(SQL_SET_CUTOFF, (cutoff,))
+        if vacuum:
+            conn.execute("VACUUM")
+        _datasets.pop(archive_dir, None)
+        price_store.invalidate_cache(db_path)
+    return total
+
+
+def scan_archive(db_path=price_store.DB_NAME, columns=None, filter=None):
+    """以 Arrow Table 讀取歸檔資料 (可指定欄位與過濾條件，皆會下推到 Parquet 讀取)"""
+    archive_dir = price_store.archive_dir_for(db_path)
+    if not os.path.isdir(archive_dir):
+        return ARCHIVE_SCHEMA.empty_table().select(columns or ARCHIVE_SCHEMA.names)
+    dataset, fragments = _open_dataset(archive_dir)
+    if filter is not None:
+        fragments = [sub for sub in (f.subset(filter) for f in fragments) if sub.row_groups]
+        if not fragments:
+            return dataset.schema.empty_table().select(columns or dataset.schema.names)
+    pruned = ds.FileSystemDataset(fragments, dataset.schema, dataset.format, dataset.filesystem)
+    return pruned.to_table(columns=columns, filter=filter)
+
+
+def read_product(product_name, db_path=price_store.DB_NAME):
+    """讀取特定商品的歸檔價格，欄位與 fetch_data 相同：date (YYYY-MM-DD 字串), platform, price"""
+    table = scan_archive(db_path, columns=["date", "platform", "price"],
+                         filter=pc.field("product_name") == product_name)
+    table = table.set_column(0, "date", pc.cast(table["date"], pa.string()))
+    return table.to_pandas().astype({"price": "int64"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="將已結束月份的價格資料歸檔為 Parquet")
+    parser.add_argument("--db", default=price_store.DB_NAME)
+    parser.add_argument("--before", help="歸檔此日期 (YYYY-MM-DD) 所在月份之前的資料，預設為本月 1 日")
+    parser.add_argument("--vacuum", action="store_true", help="歸檔後執行 VACUUM 縮小資料庫檔案")
+    args = parser.parse_args()
+    n = archive_closed_months(args.db, before=args.before, vacuum=args.vacuum)
+    print(f"已歸檔 {n:,} 筆價格資料至 {price_store.archive_dir_for(args.db)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,754 @@
+import os
+import sqlite3
+import threading
+import time
+from itertools import islice
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------
+# 價格資料存取層 (Data Access Layer)
+# - 每個行程只開一條 SQLite 連線 (WAL 模式)，所有 Streamlit rerun 共用
+# - 所有查詢皆為參數化的預備語句 (Prepared Statement)，不再拼接字串
+# - Schema 版本由 PRAGMA user_version 管理，依序執行 MIGRATIONS
+# - 讀取結果放在記憶體快取中，任何寫入都會讓快取失效
+# - 大量寫入走 ingest_prices()：分批 executemany + 明確交易 + UPSERT 去重
+# - 日 / 週 / 月彙總表 (price_rollups) 隨每批寫入增量更新，長區間圖表只讀彙總
+#   大量回填改用 ingest_prices(rebuild_rollups=True)：寫完後才以 GROUP BY 一次重建彙總
+# - 已結束月份可歸檔成 Parquet (price_archive)，fetch_data 會合併冷熱兩層資料
+# - 商品 / 平台存於維度表，事實表 price_facts 只存整數鍵、整數日序與價格
+# ---------------------------------------------------------
+
+DB_NAME = "ecommerce_prices.db"
+
+# --- 日期以整數「日序」儲存：1970-01-01 為第 0 天 (SQLite 以 julianday 換算) ---
+EPOCH = pd.Timestamp("1970-01-01")
+
+# --- 彙總粒度：(bucket 起始日序的 SQL 運算式, 下一個 bucket 起始日序的 SQL 範本, 約略天數) ---
+#     週以星期一為起始 (1970-01-01 為星期四，故 (day + 3) % 7 為星期幾)
+ROLLUP_GRAINS = {
+    "day": ("day", "{bucket} + 1", 1),
+    "week": ("day - (day + 3) % 7", "{bucket} + 7", 7),
+    "month": ("CAST(julianday(date(day + 2440587.5, 'start of month')) - 2440587.5 AS INTEGER)",
+              "CAST(julianday(date({bucket} + 2440587.5, '+1 month')) - 2440587.5 AS INTEGER)", 30),
+}
+
+
+def _rollup_merge_sql(grain, source, buckets="ingest_days"):
+    """
+    將 source (含 product_id, day, platform_id, price, old_price 欄位) 併入 price_rollups
+    old_price 為 NULL 表示新的一列；非 NULL 表示覆蓋舊價格，只需調整 sum，不增加筆數
+    每個 (商品, 日, 平台) 在 source 中只出現一次：
+    - 日粒度的 bucket 就是該列本身，直接寫入，不必 GROUP BY (省去暫存 B-tree 排序)
+    - 週 / 月的 bucket 起始日查 buckets 表 (本批每個日序只算一次)，不對每一列重算日期函數；
+      bucket 內最後價格可用 max((day << 32) | price) 取得 (日序優先比較)，免去視窗函數的排序成本
+    """
+    if grain == "day":
+        select = f"""
+    SELECT product_id, 'day', day, platform_id,
+           price, price, price - coalesce(old_price, 0), old_price IS NULL, day, price
+    FROM {source} WHERE true"""
+    else:
+        select = f"""
+    SELECT product_id, '{grain}', b.{grain}, platform_id,
+           min(price), max(price), sum(price - coalesce(old_price, 0)), sum(old_price IS NULL),
+           max(day), max((day << 32) | price) & 4294967295
+    FROM {source} JOIN {buckets} b USING (day)
+    GROUP BY product_id, b.{grain}, platform_id"""
+    return f"""
+    INSERT INTO price_rollups (product_id, grain, bucket, platform_id,
+                               min_price, max_price, sum_price, n, last_day, last_price){select}
+    ON CONFLICT (product_id, grain, bucket, platform_id) DO UPDATE SET
+        min_price = min(min_price, excluded.min_price),
+        max_price = max(max_price, excluded.max_price),
+        sum_price = sum_price + excluded.sum_price,
+        n = n + excluded.n,
+        last_price = CASE WHEN excluded.last_day >= last_day THEN excluded.last_price ELSE last_price END,
+        last_day = max(last_day, excluded.last_day);
+    """
+
+
+def _rollup_fix_extremes_sql(grain):
+    """被覆蓋的價格可能原本就是 bucket 的最高 / 最低價，這些 bucket 的 min/max 需從原始資料重算"""
+    bucket_expr, next_bucket, _ = ROLLUP_GRAINS[grain]
+    extreme = f"""(SELECT {{func}}(f.price) FROM price_facts f
+                  WHERE f.product_id = r.product_id AND f.platform_id = r.platform_id
+                    AND f.day >= r.bucket AND f.day < {next_bucket.format(bucket="r.bucket")})"""
+    return f"""
+    UPDATE price_rollups AS r SET
+        min_price = {extreme.format(func="min")},
+        max_price = {extreme.format(func="max")}
+    WHERE r.grain = '{grain}' AND (r.product_id, r.bucket, r.platform_id) IN (
+        SELECT product_id, {bucket_expr}, platform_id FROM ingest_facts
+        WHERE old_price IS NOT NULL AND old_price != price
+    );
+    """
+
+
+# v4 回填彙總表時使用的 (舊版 TEXT 欄位) 語句，保留原樣讓舊資料庫仍能依序升級
+_V4_ROLLUP_BACKFILL = """
+    INSERT INTO price_rollups (product_name, grain, bucket, platform,
+                               min_price, max_price, sum_price, n, last_date, last_price)
+    SELECT product_name, '{grain}', bucket, platform, min(price), max(price), sum(price), count(*),
+           max(date), CAST(substr(max(date || price), 11) AS INTEGER)
+    FROM (SELECT {bucket_expr} AS bucket, date, platform, product_name, price FROM prices)
+    GROUP BY product_name, bucket, platform;
+"""
+
+# --- Schema 遷移腳本 (索引 i 的腳本會把 user_version 升到 i+1) ---
+MIGRATIONS = [
+    # v1: 原始價格表 (與舊版 init_db 相同，既有資料庫可直接沿用)
+    """
+    CREATE TABLE IF NOT EXISTS prices (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        platform TEXT,
+        product_name TEXT,
+        price INTEGER
+    );
+    """,
+    # v2: 複合索引，讓「單一商品 + 依日期排序」的查詢走索引而非全表掃描
+    """
+    CREATE INDEX IF NOT EXISTS idx_prices_product_date
+        ON prices (product_name, date);
+    """,
+    # v3: 以 (product_name, date, platform) 唯一索引去重，供 UPSERT 使用
+    #     先刪除舊資料中的重複列 (保留最後寫入的那一筆)；
+    #     新索引的前綴仍是 (product_name, date)，可取代 v2 的索引
+    """
+    DELETE FROM prices WHERE id NOT IN (
+        SELECT max(id) FROM prices GROUP BY product_name, date, platform
+    );
+    DROP INDEX IF EXISTS idx_prices_product_date;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_prices_product_date_platform
+        ON prices (product_name, date, platform);
+    """,
+    # v4: 日 / 週 / 月彙總表 (min / max / avg / 最後價格)，並以既有資料回填
+    """
+    CREATE TABLE IF NOT EXISTS price_rollups (
+        product_name TEXT NOT NULL,
+        grain TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        platform TEXT NOT NULL,
+        min_price INTEGER,
+        max_price INTEGER,
+        sum_price INTEGER,
+        n INTEGER,
+        last_date TEXT,
+        last_price INTEGER,
+        PRIMARY KEY (product_name, grain, bucket, platform)
+    ) WITHOUT ROWID;
+    """ + _V4_ROLLUP_BACKFILL.format(grain="day", bucket_expr="date")
+        + _V4_ROLLUP_BACKFILL.format(grain="week", bucket_expr="date(date, 'weekday 0', '-6 days')")
+        + _V4_ROLLUP_BACKFILL.format(grain="month", bucket_expr="strftime('%Y-%m-01', date)"),
+    # v5: 價格警示 (由 price_alerts 於每批寫入後增量計算)
+    """
+    CREATE TABLE IF NOT EXISTS alerts (
+        date TEXT NOT NULL,
+        product_name TEXT NOT NULL,
+        platform TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        value REAL,
+        message TEXT,
+        created_at TEXT DEFAULT (datetime('now')),
+        PRIMARY KEY (product_name, date, kind, platform)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_alerts_date ON alerts (date);
+    """,
+    # v6: 正規化 — products / platforms 維度表 + 以整數鍵與整數日序為主鍵的事實表
+    #     原本每列重複存放的商品名稱、平台名稱與日期字串 (以及唯一索引中的副本) 都改為整數；
+    #     彙總表同樣改用整數鍵。prices 保留為唯讀 view，供人工查詢與舊報表使用
+    """
+    CREATE TABLE products (
+        product_id INTEGER PRIMARY KEY,
+        product_name TEXT NOT NULL UNIQUE,
+        base_price INTEGER
+    );
+    CREATE TABLE platforms (
+        platform_id INTEGER PRIMARY KEY,
+        platform TEXT NOT NULL UNIQUE
+    );
+    INSERT INTO products (product_name)
+        SELECT product_name FROM prices UNION SELECT product_name FROM price_rollups ORDER BY 1;
+    INSERT INTO platforms (platform)
+        SELECT platform FROM prices UNION SELECT platform FROM price_rollups ORDER BY 1;
+
+    CREATE TABLE price_facts (
+        product_id INTEGER NOT NULL REFERENCES products,
+        day INTEGER NOT NULL,
+        platform_id INTEGER NOT NULL REFERENCES platforms,
+        price INTEGER NOT NULL,
+        PRIMARY KEY (product_id, day, platform_id)
+    ) WITHOUT ROWID;
+    INSERT INTO price_facts (product_id, day, platform_id, price)
+        SELECT pr.product_id, CAST(julianday(p.date) - 2440587.5 AS INTEGER), pl.platform_id, p.price
+        FROM prices p JOIN products pr USING (product_name) JOIN platforms pl USING (platform)
+        ORDER BY 1, 2, 3;
+
+    ALTER TABLE price_rollups RENAME TO price_rollups_v5;
+    CREATE TABLE price_rollups (
+        product_id INTEGER NOT NULL,
+        grain TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        platform_id INTEGER NOT NULL,
+        min_price INTEGER,
+        max_price INTEGER,
+        sum_price INTEGER,
+        n INTEGER,
+        last_day INTEGER,
+        last_price INTEGER,
+        PRIMARY KEY (product_id, grain, bucket, platform_id)
+    ) WITHOUT ROWID;
+    INSERT INTO price_rollups
+        SELECT pr.product_id, r.grain, CAST(julianday(r.bucket) - 2440587.5 AS INTEGER), pl.platform_id,
+               r.min_price, r.max_price, r.sum_price, r.n,
+               CAST(julianday(r.last_date) - 2440587.5 AS INTEGER), r.last_price
+        FROM price_rollups_v5 r JOIN products pr USING (product_name) JOIN platforms pl USING (platform)
+        ORDER BY 1, 2, 3, 4;
+    DROP TABLE price_rollups_v5;
+
+    DROP TABLE prices;
+    CREATE VIEW prices AS
+        SELECT date(f.day + 2440587.5) AS date, pl.platform, pr.product_name, f.price
+        FROM price_facts f JOIN products pr USING (product_id) JOIN platforms pl USING (platform_id);
+    """,
+    # v7: 歸檔界線 (price_archive 寫入)；此日序之前的價格已搬到 Parquet，不再接受寫入
+    """
+    CREATE TABLE IF NOT EXISTS archive_state (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        cutoff_day INTEGER NOT NULL
+    );
+    """,
+]
+
+# --- 連線與大量寫入的 PRAGMA 設定 ---
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",      # 64 MB page cache
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped I/O
+]
+# 批次匯入期間暫時關閉 fsync；中途當機最多遺失尚未 checkpoint 的批次，可重跑補回
+INGEST_PRAGMAS = ["PRAGMA synchronous=OFF"]
+RESTORE_PRAGMAS = ["PRAGMA synchronous=NORMAL"]
+
+DEFAULT_BATCH_SIZE = 50_000
+
+# --- 預備語句 ---
+SQL_COUNT_PRICES = "SELECT count(*) FROM price_facts"
+SQL_FETCH_PRODUCT = """
+    SELECT date(f.day + 2440587.5) AS date, pl.platform, f.price
+    FROM price_facts f JOIN platforms pl USING (platform_id)
+    WHERE f.product_id = (SELECT product_id FROM products WHERE product_name = ?)
+    ORDER BY f.day
+"""
+# 最新一天的價格取自日彙總 (last_price)，原始資料歸檔後仍可讀到
+SQL_FETCH_LATEST = """
+    WITH target AS (SELECT product_id FROM products WHERE product_name = ?)
+    SELECT date(r.bucket + 2440587.5) AS date, pl.platform, r.last_price AS price
+    FROM price_rollups r JOIN platforms pl USING (platform_id)
+    WHERE r.product_id = (SELECT product_id FROM target) AND r.grain = 'day'
+      AND r.bucket = (SELECT max(bucket) FROM price_rollups
+                      WHERE product_id = (SELECT product_id FROM target) AND grain = 'day')
+"""
+SQL_FETCH_ROLLUP = """
+    SELECT date(r.bucket + 2440587.5) AS date, pl.platform, r.min_price, r.max_price,
+           CAST(round(1.0 * r.sum_price / r.n) AS INTEGER) AS avg_price, r.last_price
+    FROM price_rollups r JOIN platforms pl USING (platform_id)
+    WHERE r.product_id = (SELECT product_id FROM products WHERE product_name = ?)
+      AND r.grain = ? AND r.bucket >= ? AND r.bucket <= ?
+    ORDER BY r.bucket
+"""
+SQL_FIRST_DATE = """
+    SELECT date(min(bucket) + 2440587.5) FROM price_rollups
+    WHERE product_id = (SELECT product_id FROM products WHERE product_name = ?) AND grain = 'day'
+"""
+SQL_STAGE_CREATE = [
+    """CREATE TEMP TABLE IF NOT EXISTS ingest_batch (
+        date TEXT, platform TEXT, product_name TEXT, price INTEGER
+    )""",
+    """CREATE TEMP TABLE IF NOT EXISTS ingest_facts (
+        product_id INTEGER, day INTEGER, platform_id INTEGER, price INTEGER, old_price INTEGER
+    )""",
+    # 本批出現的日序 → 各粒度 bucket 起始日 (日粒度即日序本身)
+    "CREATE TEMP TABLE IF NOT EXISTS ingest_days (day INTEGER PRIMARY KEY, "
+    + ", ".join(f"{grain} INTEGER" for grain in ROLLUP_GRAINS if grain != "day") + ")",
+]
+SQL_STAGE_CLEAR = ["DELETE FROM ingest_batch", "DELETE FROM ingest_facts", "DELETE FROM ingest_days"]
+SQL_STAGE_INSERT = "INSERT INTO ingest_batch (date, platform, product_name, price) VALUES (?, ?, ?, ?)"
+# 新出現的商品 / 平台自動加入維度表
+SQL_STAGE_DIMENSIONS = [
+    "INSERT OR IGNORE INTO products (product_name) SELECT DISTINCT product_name FROM ingest_batch",
+    "INSERT OR IGNORE INTO platforms (platform) SELECT DISTINCT platform FROM ingest_batch",
+]
+# 名稱換成整數鍵、日期換成日序，並帶出將被覆蓋的舊價格
+SQL_STAGE_RESOLVE = """
+    INSERT INTO ingest_facts (product_id, day, platform_id, price, old_price)
+    SELECT pr.product_id, b.day, pl.platform_id, b.price,
+           (SELECT f.price FROM price_facts f
+            WHERE f.product_id = pr.product_id AND f.day = b.day AND f.platform_id = pl.platform_id)
+    FROM (SELECT CAST(julianday(date) - 2440587.5 AS INTEGER) AS day, platform, product_name, price
+          FROM ingest_batch) b
+    JOIN products pr ON pr.product_name = b.product_name
+    JOIN platforms pl ON pl.platform = b.platform
+"""
+# 本批中落在已歸檔日期的最早一天 (沒有則為 NULL)
+SQL_STAGE_ARCHIVED = """
+    SELECT date(min(day) + 2440587.5), date(max(a.cutoff_day) + 2440587.5)
+    FROM ingest_facts JOIN archive_state a ON day < a.cutoff_day
+"""
+SQL_UPSERT_FROM_STAGE = """
+    INSERT INTO price_facts (product_id, day, platform_id, price)
+    SELECT product_id, day, platform_id, price FROM ingest_facts WHERE true
+    ON CONFLICT (product_id, day, platform_id) DO UPDATE SET price = excluded.price
+"""
+SQL_STAGE_BUCKETS = (
+    "INSERT INTO ingest_days (day, " + ", ".join(g for g in ROLLUP_GRAINS if g != "day") + ") SELECT day, "
+    + ", ".join(expr for g, (expr, _, _) in ROLLUP_GRAINS.items() if g != "day")
+    + " FROM (SELECT DISTINCT day FROM ingest_facts)"
+)
+# --- 大量回填 (ingest_prices(rebuild_rollups=True))：鍵在 Python 端解析，直接 UPSERT 整數列，最後才重建彙總 ---
+SQL_INSERT_PRODUCT = "INSERT OR IGNORE INTO products (product_name) VALUES (?)"
+SQL_INSERT_PLATFORM = "INSERT OR IGNORE INTO platforms (platform) VALUES (?)"
+SQL_PRODUCT_IDS = "SELECT product_name, product_id FROM products"
+SQL_PLATFORM_IDS = "SELECT platform, platform_id FROM platforms"
+SQL_ARCHIVE_CUTOFF = "SELECT cutoff_day FROM archive_state"
+FACT_ROWS_PER_STATEMENT = 100   # 多列 VALUES：每個語句寫入的列數 (參數綁定與執行的次數降為 1/100)
+SQL_UPSERT_FACTS = """
+    INSERT INTO price_facts (product_id, day, platform_id, price) VALUES {values}
+    ON CONFLICT (product_id, day, platform_id) DO UPDATE SET price = excluded.price
+"""
+SQL_UPSERT_FACT = SQL_UPSERT_FACTS.format(values="(?, ?, ?, ?)")
+SQL_UPSERT_FACTS_MANY = SQL_UPSERT_FACTS.format(values=", ".join(["(?, ?, ?, ?)"] * FACT_ROWS_PER_STATEMENT))
+SQL_COUNT_FACTS_FROM = "SELECT count(*) FROM price_facts WHERE day >= ?"
+SQL_INSERT_ROLLUP = """
+    INSERT INTO price_rollups (product_id, grain, bucket, platform_id,
+                               min_price, max_price, sum_price, n, last_day, last_price)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# 重建區間內每一天的 bucket 起始日 (與 SQL_STAGE_BUCKETS 相同的 ingest_days 表)
+SQL_REBUILD_DAYS = (
+    "INSERT INTO ingest_days (day, " + ", ".join(g for g in ROLLUP_GRAINS if g != "day") + ") "
+    "WITH RECURSIVE d(day) AS (SELECT ? UNION ALL SELECT day + 1 FROM d WHERE day < ?) SELECT day, "
+    + ", ".join(expr for g, (expr, _, _) in ROLLUP_GRAINS.items() if g != "day") + " FROM d"
+)
+SQL_REBUILD_MAX_DAY = "SELECT max(day) FROM price_facts"
+
+
+def _rollup_rebuild_sql(grain):
+    """以 price_facts 中 bucket >= ? 的資料重建該粒度的彙總 (先刪除再以一次 GROUP BY 寫入)"""
+    if grain == "day":
+        select = """
+    SELECT product_id, 'day', day, platform_id, price, price, price, 1, day, price
+    FROM price_facts WHERE day >= ?1"""
+    else:
+        select = f"""
+    SELECT product_id, '{grain}', b.{grain}, platform_id, min(price), max(price), sum(price), count(*),
+           max(day), max((day << 32) | price) & 4294967295
+    FROM price_facts JOIN ingest_days b USING (day)
+    WHERE day >= ?1
+    GROUP BY product_id, b.{grain}, platform_id"""
+    return [f"DELETE FROM price_rollups WHERE grain = '{grain}' AND bucket >= ?1", f"""
+    INSERT INTO price_rollups (product_id, grain, bucket, platform_id,
+                               min_price, max_price, sum_price, n, last_day, last_price){select}
+    """]
+
+
+SQL_ROLLUP_REBUILDS = {grain: _rollup_rebuild_sql(grain) for grain in ROLLUP_GRAINS}
+SQL_ROLLUP_UPDATES = [sql for grain in ROLLUP_GRAINS
+                      for sql in (_rollup_merge_sql(grain, "ingest_facts"), _rollup_fix_extremes_sql(grain))]
+
+_connections = {}            # db_path -> sqlite3.Connection
+_lock = threading.RLock()    # Streamlit 每個 session 跑在不同執行緒，共用連線需加鎖
+_read_cache = {}             # (db_path, 查詢鍵) -> 查詢結果
+
+
+def get_connection(db_path=DB_NAME):
+    """取得 (必要時建立) 該資料庫在本行程中共用的連線"""
+    with _lock:
+        conn = _connections.get(db_path)
+        if conn is None:
+            conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            migrate(conn)
+            for sql in SQL_STAGE_CREATE:
+                conn.execute(sql)
+            _connections[db_path] = conn
+        return conn
+
+
+def close_connection(db_path=DB_NAME):
+    """關閉共用連線 (主要給測試與批次腳本使用)"""
+    with _lock:
+        conn = _connections.pop(db_path, None)
+        if conn is not None:
+            conn.close()
+        invalidate_cache(db_path)
+
+
+def migrate(conn):
+    """依 user_version 執行尚未套用的遷移腳本"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        # 腳本與版本號在同一個交易中提交，中途失敗不會留下半套 schema
+        conn.executescript(f"BEGIN; {script} PRAGMA user_version = {target}; COMMIT;")
+
+
+def archive_dir_for(db_path=DB_NAME):
+    """資料庫對應的 Parquet 歸檔目錄 (與 .db 檔放在一起)"""
+    return os.path.splitext(db_path)[0] + "_archive"
+
+
+def write_lock():
+    """共用連線的鎖；外部模組 (例如歸檔工作) 需要跨多個語句的一致性時使用"""
+    return _lock
+
+
+def init_db(db_path=DB_NAME):
+    """初始化資料庫與資料表 (只有第一次連線時才會真正執行遷移)"""
+    get_connection(db_path)
+
+
+def invalidate_cache(db_path=DB_NAME):
+    """清除指定資料庫的讀取快取 (寫入後呼叫)"""
+    with _lock:
+        for key in [k for k in _read_cache if k[0] == db_path]:
+            del _read_cache[key]
+
+
+def cached_read(db_path, key, loader):
+    """以 key 快取 loader(conn) 的結果，直到下一次寫入讓快取失效"""
+    with _lock:
+        cache_key = (db_path, key)
+        if cache_key not in _read_cache:
+            _read_cache[cache_key] = loader(get_connection(db_path))
+        return _read_cache[cache_key]
+
+
+def count_prices(db_path=DB_NAME):
+    """價格資料總筆數"""
+    return cached_read(db_path, ("count",),
+                       lambda conn: conn.execute(SQL_COUNT_PRICES).fetchone()[0])
+
+
+def _load_product_history(conn, product_name, db_path):
+    hot = pd.read_sql_query(SQL_FETCH_PRODUCT, conn, params=(product_name,))
+    if not os.path.isdir(archive_dir_for(db_path)):
+        return hot
+    import price_archive  # 延遲載入：沒有歸檔資料時不需要 pyarrow
+    cold = price_archive.read_product(product_name, db_path)
+    df = pd.concat([cold, hot], ignore_index=True)
+    # 歸檔中途失敗可能造成冷熱兩層重複，以 SQLite (較新) 為準
+    df = df.drop_duplicates(subset=["date", "platform"], keep="last")
+    return df.sort_values("date", kind="stable", ignore_index=True)
+
+
+def fetch_data(product_name, db_path=DB_NAME):
+    """從資料庫讀取特定商品的歷史價格 (含已歸檔的 Parquet 冷資料)"""
+    df = cached_read(db_path, ("product", product_name),
+                     lambda conn: _load_product_history(conn, product_name, db_path))
+    # 回傳副本，避免呼叫端修改到快取內容
+    return df.copy()
+
+
+def fetch_latest(product_name, db_path=DB_NAME):
+    """讀取特定商品最新一天的各平台價格"""
+    df = cached_read(db_path, ("latest", product_name),
+                     lambda conn: pd.read_sql_query(SQL_FETCH_LATEST, conn, params=(product_name,)))
+    return df.copy()
+
+
+def first_date(product_name, db_path=DB_NAME):
+    """特定商品最早一筆價格的日期 (讀彙總表，原始資料歸檔後仍有效)"""
+    return cached_read(db_path, ("first_date", product_name),
+                       lambda conn: conn.execute(SQL_FIRST_DATE, (product_name,)).fetchone()[0])
+
+
+def to_day(value):
+    """日期 (字串 / Timestamp) → 整數日序"""
+    return (pd.Timestamp(value).normalize() - EPOCH).days
+
+
+def choose_grain(start, end, max_points=400):
+    """選擇能讓 [start, end] 區間的資料點數不超過 max_points 的最細彙總粒度"""
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    for grain, (_, _, approx_days) in ROLLUP_GRAINS.items():
+        if days / approx_days <= max_points:
+            return grain
+    return "month"
+
+
+def bucket_start(grain, day):
+    """day 所屬 bucket 的起始日 (與 ROLLUP_GRAINS 的 SQL 運算式一致)"""
+    day = pd.Timestamp(day).normalize()
+    if grain == "week":
+        return day - pd.Timedelta(days=day.weekday())
+    if grain == "month":
+        return day.replace(day=1)
+    return day
+
+
+def fetch_rollup(product_name, grain, start, end, db_path=DB_NAME):
+    """
+    讀取特定商品在 [start, end] 區間的彙總價格 (bucket 起始日介於區間內)
+    欄位：date (bucket 起始日), platform, min_price, max_price, avg_price, last_price
+    """
+    params = (product_name, grain, to_day(bucket_start(grain, start)), to_day(end))
+    df = cached_read(db_path, ("rollup",) + params,
+                     lambda conn: pd.read_sql_query(SQL_FETCH_ROLLUP, conn, params=params))
+    return df.copy()
+
+
+def iter_batches(rows, batch_size=DEFAULT_BATCH_SIZE):
+    """將任意 iterable (可為 generator) 切成固定大小的 list 批次"""
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+PRICE_COLUMNS = ["date", "platform", "product_name", "price"]
+
+
+def read_price_file(path, table="prices", chunk_rows=DEFAULT_BATCH_SIZE):
+    """
+    逐塊讀取外部價格檔 (CSV、Parquet 或 SQLite 的 table 資料表，欄位 date, platform, product_name, price)，
+    產生 ingest_prices 可直接使用的 (date, platform, product_name, price) 列；日期統一為 YYYY-MM-DD
+    """
+    path = str(path)
+    if path.endswith((".db", ".sqlite")):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        columns = ", ".join(PRICE_COLUMNS)
+        chunks = pd.read_sql_query(f'SELECT {columns} FROM "{table}"', conn, chunksize=chunk_rows)
+    elif path.endswith(".csv"):
+        conn = None
+        chunks = pd.read_csv(path, usecols=PRICE_COLUMNS, chunksize=chunk_rows)
+    else:
+        import pyarrow.parquet as pq  # 延遲載入：只有 Parquet 來源需要
+        conn = None
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(chunk_rows, columns=PRICE_COLUMNS))
+    try:
+        for chunk in chunks:
+            chunk = chunk.dropna()
+            dates = pd.to_datetime(chunk["date"], format="ISO8601").dt.strftime("%Y-%m-%d")
+            yield from zip(dates.tolist(), chunk["platform"].astype(str).tolist(),
+                           chunk["product_name"].astype(str).tolist(), chunk["price"].astype(int).tolist())
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def _index_order(row):
+    date, platform, product_name, _ = row
+    return product_name, date, platform
+
+
+def _dimension_ids(conn, names, mapping, sql_insert, sql_select):
+    """名稱 → 整數鍵；mapping 中沒有的名稱先寫入維度表，再重新讀取整張維度表"""
+    missing = [name for name in names if name not in mapping]
+    if missing:
+        conn.executemany(sql_insert, ((name,) for name in missing))
+        mapping.update(conn.execute(sql_select).fetchall())
+    return mapping
+
+
+def _rebuild_rollups(conn, first_day):
+    """重建 first_day 所在 bucket 起的所有彙總 (每個粒度一次 GROUP BY)；之前的 bucket 不受影響"""
+    starts = {grain: to_day(bucket_start(grain, EPOCH + pd.Timedelta(days=first_day))) for grain in ROLLUP_GRAINS}
+    last_day = conn.execute(SQL_REBUILD_MAX_DAY).fetchone()[0]
+    for sql in SQL_STAGE_CLEAR:
+        conn.execute(sql)
+    conn.execute(SQL_REBUILD_DAYS, (min(starts.values()), last_day))
+    for grain, statements in SQL_ROLLUP_REBUILDS.items():
+        for sql in statements:
+            conn.execute(sql, (starts[grain],))
+
+
+def _reduce_by_bucket(product, bucket, platform, low, high, total, n, last):
+    """依 (商品, bucket, 平台) 合併部分彙總：min / max / 加總 / 筆數 / 最後價格 ((day << 32) | price 取最大)"""
+    order = np.lexsort((platform, bucket, product))
+    product, bucket, platform, low, high, total, n, last = (
+        column[order] for column in (product, bucket, platform, low, high, total, n, last))
+    starts = np.flatnonzero(np.r_[True, (product[1:] != product[:-1]) | (bucket[1:] != bucket[:-1])
+                                  | (platform[1:] != platform[:-1])])
+    return (product[starts], bucket[starts], platform[starts], np.minimum.reduceat(low, starts),
+            np.maximum.reduceat(high, starts), np.add.reduceat(total, starts), np.add.reduceat(n, starts),
+            np.maximum.reduceat(last, starts))
+
+
+def _bucket_days(grain, days):
+    """日序陣列 → bucket 起始日序 (與 ROLLUP_GRAINS 的 SQL 運算式一致)"""
+    if grain == "week":
+        return days - (days + 3) % 7
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+
+class _Backfill:
+    """
+    ingest_prices(rebuild_rollups=True) 的狀態
+    - 名稱 / 日期 → 整數鍵的對照表在 Python 端解析並跨批次共用，事實列以多列 VALUES 直接 UPSERT
+    - 週 / 月彙總以 numpy 逐批算出部分彙總；只有「純新增」的回填 (寫入的鍵都不重複，
+      且都在既有資料之後) 才直接寫入這些結果，其餘情況在 finish() 改由 SQL 從 price_facts 重建
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.products, self.platforms, self.days = {}, {}, {}
+        cutoff = conn.execute(SQL_ARCHIVE_CUTOFF).fetchone()
+        self.cutoff = cutoff and cutoff[0]
+        self.last_existing_day = conn.execute(SQL_REBUILD_MAX_DAY).fetchone()[0]
+        self.first_day = None
+        self.rows = 0
+        self.touched = set()
+        self.partials = {grain: [] for grain in ROLLUP_GRAINS if grain != "day"}
+
+    def write(self, batch):
+        """寫入一批 (date, platform, product_name, price)；呼叫端負責交易"""
+        names = {row[2] for row in batch}
+        products = _dimension_ids(self.conn, names, self.products, SQL_INSERT_PRODUCT, SQL_PRODUCT_IDS)
+        platforms = _dimension_ids(self.conn, {row[1] for row in batch}, self.platforms, SQL_INSERT_PLATFORM,
+                                   SQL_PLATFORM_IDS)
+        for date in {row[0] for row in batch} - self.days.keys():
+            self.days[date] = to_day(date)
+        product = np.array([products[row[2]] for row in batch], dtype=np.int64)
+        day = np.array([self.days[row[0]] for row in batch], dtype=np.int64)
+        platform = np.array([platforms[row[1]] for row in batch], dtype=np.int64)
+        price = np.array([row[3] for row in batch], dtype=np.int64)
+        first_day = int(day.min())
+        if self.cutoff is not None and first_day < self.cutoff:
+            archived = (EPOCH + pd.Timedelta(days=first_day)).strftime("%Y-%m-%d")
+            cutoff = (EPOCH + pd.Timedelta(days=self.cutoff)).strftime("%Y-%m-%d")
+            raise ValueError(f"{archived} 的價格已歸檔 ({cutoff} 之前)，不能再寫入；請在歸檔前補寫舊資料")
+
+        # 同一批內重複的鍵依序 UPSERT，以最後一筆為準
+        flat = np.column_stack((product, day, platform, price)).ravel().tolist()
+        width = 4 * FACT_ROWS_PER_STATEMENT
+        full = len(flat) // width * width
+        self.conn.executemany(SQL_UPSERT_FACTS_MANY, (flat[i:i + width] for i in range(0, full, width)))
+        self.conn.executemany(SQL_UPSERT_FACT, (flat[i:i + 4] for i in range(full, len(flat), 4)))
+
+        self.first_day = first_day if self.first_day is None else min(self.first_day, first_day)
+        self.rows += len(batch)
+        self.touched |= names
+        if self.partials is None:
+            return
+        buckets = {grain: _bucket_days(grain, day) for grain in self.partials}
+        if self.last_existing_day is not None and min(b.min() for b in buckets.values()) <= self.last_existing_day:
+            # 寫入的 bucket 已有舊資料：部分彙總不完整，改由 finish() 以 SQL 重建
+            self.partials = None
+            return
+        last = (day << 32) | price
+        for grain, parts in self.partials.items():
+            parts.append(_reduce_by_bucket(product, buckets[grain], platform, price, price, price,
+                                           np.ones_like(price), last))
+            if len(parts) >= 32:
+                parts[:] = [_reduce_by_bucket(*map(np.concatenate, zip(*parts)))]
+
+    def finish(self):
+        """重建本次寫入涉及的彙總 bucket；呼叫端負責交易"""
+        if self.first_day is None:
+            return
+        starts = {grain: to_day(bucket_start(grain, EPOCH + pd.Timedelta(days=self.first_day)))
+                  for grain in ROLLUP_GRAINS}
+        # 區間內的事實列數等於寫入筆數 → 每一筆都是新的鍵 (沒有覆蓋、沒有重複)，部分彙總即為完整結果
+        clean = (self.partials is not None
+                 and self.conn.execute(SQL_COUNT_FACTS_FROM, (min(starts.values()),)).fetchone()[0] == self.rows)
+        if not clean:
+            _rebuild_rollups(self.conn, self.first_day)
+            return
+        for sql in SQL_ROLLUP_REBUILDS["day"]:
+            self.conn.execute(sql, (starts["day"],))
+        for grain, parts in self.partials.items():
+            self.conn.execute(SQL_ROLLUP_REBUILDS[grain][0], (starts[grain],))
+            product, bucket, platform, low, high, total, n, last = _reduce_by_bucket(*map(np.concatenate, zip(*parts)))
+            self.conn.executemany(SQL_INSERT_ROLLUP, zip(
+                product.tolist(), [grain] * len(product), bucket.tolist(), platform.tolist(), low.tolist(),
+                high.tolist(), total.tolist(), n.tolist(), (last >> 32).tolist(), (last & 0xFFFFFFFF).tolist()))
+
+
+def ingest_prices(rows, batch_size=DEFAULT_BATCH_SIZE, db_path=DB_NAME, progress=None, on_batch=None,
+                  rebuild_rollups=False):
+    """
+    大量匯入價格資料 (date, platform, product_name, price)
+    - rows 可以是 generator，依 batch_size 分批讀取，記憶體用量與總筆數無關
+    - 每批一個明確交易，以 executemany 執行 UPSERT：
+      同一天、同平台、同商品重複抓取時覆蓋價格而非新增一列
+    - 含有已歸檔日期 (price_archive) 的批次會整批回滾並拋出 ValueError
+    - 每批先依唯一索引順序 (product_name, date, platform) 排序，讓 B-tree 以循序方式寫入
+    - 同一交易內增量更新 price_rollups：只動到本批涉及的 bucket，不重算整段歷史
+    - progress(累計筆數, 已耗秒數) 會在每批提交後呼叫
+    - on_batch(本批涉及的商品名稱 list) 會在每批提交後呼叫，供警示等下游計算增量更新
+    - rebuild_rollups=True (大量回填)：每批只把整數鍵直接 UPSERT 進 price_facts，不維護彙總表；
+      全部寫入後，從最早寫入日期所在的 bucket 起以每個粒度一次 GROUP BY 重建 price_rollups。
+      on_batch 改為重建完成後呼叫一次 (所有涉及的商品)
+    回傳 {"rows", "batches", "seconds", "rows_per_sec"}
+    """
+    total = 0
+    batches = 0
+    start = time.perf_counter()
+    with _lock:
+        conn = get_connection(db_path)
+        for pragma in INGEST_PRAGMAS:
+            conn.execute(pragma)
+        try:
+            if rebuild_rollups:
+                backfill = _Backfill(conn)
+                try:
+                    for batch in iter_batches(rows, batch_size):
+                        with conn:
+                            backfill.write(batch)
+                        total += len(batch)
+                        batches += 1
+                        if progress is not None:
+                            progress(total, time.perf_counter() - start)
+                finally:
+                    # 中途失敗時，已提交的批次仍需重建彙總
+                    with conn:
+                        backfill.finish()
+                if on_batch is not None and backfill.touched:
+                    on_batch(sorted(backfill.touched))
+            else:
+                for batch in iter_batches(rows, batch_size):
+                    # 同一批內重複的鍵以最後一筆為準
+                    staged = sorted({_index_order(row): row for row in batch}.values(), key=_index_order)
+                    conn.execute("BEGIN")
+                    try:
+                        for sql in SQL_STAGE_CLEAR:
+                            conn.execute(sql)
+                        conn.executemany(SQL_STAGE_INSERT, staged)
+                        for sql in SQL_STAGE_DIMENSIONS:
+                            conn.execute(sql)
+                        conn.execute(SQL_STAGE_RESOLVE)
+                        # 已歸檔的日期不能再寫入：舊價格已不在 price_facts，覆蓋會被當成新的一列 (n 重複計算)
+                        archived, cutoff = conn.execute(SQL_STAGE_ARCHIVED).fetchone()
+                        if archived is not None:
+                            raise ValueError(f"{archived} 的價格已歸檔 ({cutoff} 之前)，不能再寫入；請在歸檔前補寫舊資料")
+                        conn.execute(SQL_UPSERT_FROM_STAGE)
+                        conn.execute(SQL_STAGE_BUCKETS)
+                        for sql in SQL_ROLLUP_UPDATES:
+                            conn.execute(sql)
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    conn.commit()
+                    total += len(batch)
+                    batches += 1
+                    if on_batch is not None:
+                        on_batch(sorted({row[2] for row in staged}))
+                    if progress is not None:
+                        progress(total, time.perf_counter() - start)
+        finally:
+            for pragma in RESTORE_PRAGMAS:
+                conn.execute(pragma)
+            invalidate_cache(db_path)
+    seconds = time.perf_counter() - start
+    return {
+        "rows": total,
+        "batches": batches,
+        "seconds": seconds,
+        "rows_per_sec": total / seconds if seconds > 0 else float("inf"),
+    }
@@ -0,0 +1,256 @@
+import asyncio
+import random
+import re
+import ssl
+import time
+from urllib.parse import quote, urlsplit
+
+# ---------------------------------------------------------
+# 非同步爬蟲引擎 (asyncio)
+# - 每個平台各自的併發上限 (Semaphore) 與 Token Bucket 限速，避免被目標網站封鎖
+# - 連線錯誤 / 逾時 / 5xx / 429 / 解析失敗會以指數退避重試
+# - 每個平台可註冊自己的頁面解析器 (register_parser)
+# - 抓到的價格以批次方式串流寫入 sink (例如 price_store.ingest_prices)
+# 只依賴標準函式庫；HTTP 客戶端為精簡的 HTTP/1.1 GET 實作
+# ---------------------------------------------------------
+
+USER_AGENT = "Mozilla/5.0 (compatible; PriceTrackerBot/1.0)"
+
+
+class ScrapeError(Exception):
+    """抓取或解析失敗；retryable 表示是否值得重試"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+# --- 1. 平台解析器 ---
+_PARSERS = {}
+
+
+def register_parser(platform):
+    """註冊平台的價格解析器：parser(html: str) -> int"""
+    def decorator(func):
+        _PARSERS[platform] = func
+        return func
+    return decorator
+
+
+def get_parser(platform):
+    """取得平台解析器；未註冊的平台使用 schema.org 的 itemprop="price" 通用解析"""
+    return _PARSERS.get(platform, parse_schema_org_price)
+
+
+def _to_int_price(text):
+    return int(float(text.replace(",", "").replace("$", "").strip()))
+
+
+def parse_schema_org_price(html):
+    """通用解析：<meta itemprop="price" content="29900">"""
+    m = re.search(r'itemprop="price"\s+content="([\d.,]+)"', html)
+    if not m:
+        raise ScrapeError("找不到 itemprop=price 標籤")
+    return _to_int_price(m.group(1))
+
+
+@register_parser("PChome 24h")
+def parse_pchome(html):
+    """PChome 商品頁：<span id="PriceTotal">29,900</span>"""
+    m = re.search(r'id="PriceTotal"[^>]*>\s*\$?([\d,]+)', html)
+    if not m:
+        raise ScrapeError("PChome 頁面找不到 PriceTotal")
+    return _to_int_price(m.group(1))
+
+
+@register_parser("Momo 購物網")
+def parse_momo(html):
+    """Momo 商品頁：<span class="price">$29,900</span>"""
+    m = re.search(r'class="price"[^>]*>\s*\$?([\d,]+)', html)
+    if not m:
+        raise ScrapeError("Momo 頁面找不到 price")
+    return _to_int_price(m.group(1))
+
+
+# --- 2. 限速器 ---
+class TokenBucket:
+    """Token Bucket 限速：平均每秒 rate 次，最多可瞬間爆量 capacity 次"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# --- 3. 精簡 HTTP 客戶端 ---
+async def http_get(url, timeout=10.0):
+    """發送 HTTP/1.1 GET (Connection: close)，回傳 (status, body 字串)"""
+    parts = urlsplit(url)
+    https = parts.scheme == "https"
+    port = parts.port or (443 if https else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    async def _request():
+        reader, writer = await asyncio.open_connection(
+            parts.hostname, port, ssl=ssl.create_default_context() if https else None)
+        try:
+            writer.write((f"GET {path} HTTP/1.1\r\nHost: {parts.hostname}\r\n"
+                          f"User-Agent: {USER_AGENT}\r\nAccept-Encoding: identity\r\n"
+                          f"Connection: close\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        return raw
+
+    raw = await asyncio.wait_for(_request(), timeout)
+    head, _, body = raw.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        status = int(lines[0].split()[1])
+    except (IndexError, ValueError):
+        raise ScrapeError(f"無效的 HTTP 回應: {lines[0]!r}")
+    headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:])}
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        body = _decode_chunked(body)
+    charset = re.search(r"charset=([\w-]+)", headers.get("content-type", ""))
+    return status, body.decode(charset.group(1) if charset else "utf-8", errors="replace")
+
+
+def _decode_chunked(body):
+    out = bytearray()
+    while body:
+        size_line, _, rest = body.partition(b"\r\n")
+        size = int(size_line.split(b";")[0], 16)
+        if size == 0:
+            break
+        out += rest[:size]
+        body = rest[size + 2:]
+    return bytes(out)
+
+
+# --- 4. 抓取引擎 ---
+def build_jobs(products, platforms, base_url):
+    """建立 (platform, product_name, url) 工作清單；URL 格式為 {base_url}/{平台}/{商品}"""
+    base_url = base_url.rstrip("/")
+    return [(platform, p_name, f"{base_url}/{quote(platform)}/{quote(p_name)}")
+            for p_name in products for platform in platforms]
+
+
+class ScrapeEngine:
+    """
+    非同步價格抓取引擎
+    - max_concurrency: 全域同時連線數上限
+    - per_platform_concurrency: 每個平台同時連線數上限
+    - rate_per_platform: 每個平台每秒請求數 (Token Bucket)；None 表示不限速
+    - retries / backoff: 失敗時最多重試次數與退避基準秒數 (backoff * 2^n + 抖動)
+    - sink(rows): 接收 [(date, platform, product_name, price), ...] 的批次寫入函式
+    """
+
+    def __init__(self, sink=None, max_concurrency=100, per_platform_concurrency=20,
+                 rate_per_platform=None, retries=3, backoff=0.2, timeout=10.0, batch_size=500):
+        self.sink = sink
+        self.max_concurrency = max_concurrency
+        self.per_platform_concurrency = per_platform_concurrency
+        self.rate_per_platform = rate_per_platform
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.batch_size = batch_size
+
+    async def _fetch_one(self, platform, product_name, url, limits):
+        global_sem, platform_sems, buckets = limits
+        parser = get_parser(platform)
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+            async with global_sem, platform_sems[platform]:
+                if platform in buckets:
+                    await buckets[platform].acquire()
+                try:
+                    status, html = await http_get(url, self.timeout)
+                    if status == 429 or status >= 500:
+                        raise ScrapeError(f"HTTP {status}")
+                    if status != 200:
+                        raise ScrapeError(f"HTTP {status}", retryable=False)
+                    return parser(html)
+                except ScrapeError as e:
+                    last_error = e
+                    if not e.retryable:
+                        break
+                except (OSError, asyncio.TimeoutError, ValueError) as e:
+                    last_error = e
+        raise ScrapeError(f"{platform} - {product_name}: {last_error}", retryable=False)
+
+    async def run(self, jobs, date=None):
+        """
+        執行所有 (platform, product_name, url) 工作，結果以批次串流寫入 sink
+        回傳統計資訊與每筆工作的 log
+        """
+        date = date or time.strftime("%Y-%m-%d")
+        platforms = {platform for platform, _, _ in jobs}
+        limits = (
+            asyncio.Semaphore(self.max_concurrency),
+            {p: asyncio.Semaphore(self.per_platform_concurrency) for p in platforms},
+            {p: TokenBucket(self.rate_per_platform) for p in platforms} if self.rate_per_platform else {},
+        )
+        queue = asyncio.Queue()
+        logs = []
+        stats = {"ok": 0, "failed": 0, "written": 0}
+
+        async def writer():
+            buffer = []
+            while True:
+                row = await queue.get()
+                if row is not None:
+                    buffer.append(row)
+                if buffer and (row is None or len(buffer) >= self.batch_size):
+                    if self.sink is not None:
+                        # sink 多半是同步的 SQLite 寫入，丟到執行緒避免卡住事件迴圈
+                        await asyncio.to_thread(self.sink, buffer)
+                    stats["written"] += len(buffer)
+                    buffer = []
+                if row is None:
+                    return
+
+        async def worker(platform, product_name, url):
+            try:
+                price = await self._fetch_one(platform, product_name, url, limits)
+            except ScrapeError as e:
+                stats["failed"] += 1
+                logs.append(f"抓取失敗: {e}")
+                return
+            stats["ok"] += 1
+            logs.append(f"抓取成功: {platform} - {product_name} : ${price}")
+            await queue.put((date, platform, product_name, price))
+
+        start = time.perf_counter()
+        writer_task = asyncio.create_task(writer())
+        await asyncio.gather(*(worker(*job) for job in jobs))
+        await queue.put(None)
+        await writer_task
+        stats["seconds"] = time.perf_counter() - start
+        stats["skus_per_sec"] = len(jobs) / stats["seconds"] if stats["seconds"] > 0 else float("inf")
+        stats["logs"] = logs
+        return stats
+
+
+def scrape(jobs, sink=None, date=None, **engine_options):
+    """同步介面：在新的事件迴圈中執行 ScrapeEngine.run()"""
+    return asyncio.run(ScrapeEngine(sink=sink, **engine_options).run(jobs, date=date))
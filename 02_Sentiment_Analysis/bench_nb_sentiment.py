@@ -0,0 +1,95 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import nb_sentiment
+import score_cache
+import sentiment_engine
+from bench_sentiment import synthetic_reviews
+
+# ---------------------------------------------------------
+# [向量化 Naive Bayes 速度與一致性報告]
+# 比較 backend="nb" 與逐句 SnowNLP：
+# - 吞吐量：斷詞 + 建立稀疏矩陣 / 矩陣評分 分開計時
+# - 權重匯出檢查：以 SnowNLP 自己的斷詞結果餵給匯出的權重，分數應與 SnowNLP 相同 (只差浮點誤差)
+# - 一致性：標籤一致率、3×3 混淆矩陣、分數 MAE 與相關係數 (差異來自斷詞方式不同)
+# SnowNLP 很慢，只隨機抽取 --reference 則「不重複」文字作為比較基準
+# 執行: python bench_nb_sentiment.py --csv reviews.csv --reference 3000
+#       python bench_nb_sentiment.py --reviews 100000   (未指定 --csv 時使用模擬評論)
+# ---------------------------------------------------------
+
+
+def load_texts(args):
+    if args.csv:
+        texts = pd.read_csv(args.csv, usecols=["text"])["text"].dropna().astype(str)
+        return [score_cache.normalize(t) for t in texts]
+    return synthetic_reviews(args.reviews)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量化 Naive Bayes 與 SnowNLP 的速度、一致性比較")
+    parser.add_argument("--csv", help="評論 CSV (需包含 'text' 欄位)；未指定時使用模擬評論")
+    parser.add_argument("--reviews", type=int, default=100_000, help="模擬評論數")
+    parser.add_argument("--reference", type=int, default=3_000, help="以 SnowNLP 評分作為基準的不重複文字數")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    texts = load_texts(args)
+    model, load_seconds = timed(nb_sentiment.get_model)
+    print(f"評論數: {len(texts):,}，詞彙數: {len(model.vocab):,}，載入模型 {load_seconds:.2f}s")
+
+    (matrix, unseen), featurize_seconds = timed(model.featurize, texts)
+    nb_scores, matmul_seconds = timed(model.score_matrix, matrix, unseen)
+    nb_seconds = featurize_seconds + matmul_seconds
+    print(f"{'nb':>8}: 斷詞+建矩陣 {featurize_seconds:.2f}s，矩陣評分 {matmul_seconds * 1000:.1f}ms "
+          f"→ {len(texts) / nb_seconds:,.0f} 則/秒")
+
+    distinct = pd.Series(list(dict.fromkeys(texts)))
+    reference = distinct.sample(min(args.reference, len(distinct)), random_state=args.seed).tolist()
+    snow_scores, snow_seconds = timed(
+        lambda: sentiment_engine.score_texts(reference, min_parallel=len(reference) + 1))
+    print(f"{'snownlp':>8}: {snow_seconds:.1f}s → {len(reference) / snow_seconds:,.0f} 則/秒 "
+          f"(基準 {len(reference):,} 則)")
+
+    # 權重匯出檢查：同樣的詞 → 同樣的分數
+    from snownlp import normal, seg
+    exact = model.score_matrix(*model.featurize_tokens([normal.filter_stop(seg.seg(t)) for t in reference]))
+    export_error = float(np.abs(exact - snow_scores).max())
+
+    fast_scores = model.score(reference)
+    fast_labels = sentiment_engine.sentiment_labels(fast_scores)
+    snow_labels = sentiment_engine.sentiment_labels(snow_scores)
+    agreement = float((fast_labels == snow_labels).mean())
+    confusion = pd.crosstab(pd.Series(snow_labels, name="SnowNLP"), pd.Series(fast_labels, name="nb"))
+    mae = float(np.abs(fast_scores - snow_scores).mean())
+    corr = float(np.corrcoef(fast_scores, snow_scores)[0, 1])
+
+    print(f"權重匯出最大誤差 (同樣斷詞): {export_error:.2e}")
+    print(f"標籤一致率: {agreement:.1%}，分數 MAE: {mae:.3f}，相關係數: {corr:.3f}")
+    print(confusion.to_string())
+    print(f"加速倍數: {(len(texts) / nb_seconds) / (len(reference) / snow_seconds):,.0f}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "reviews": len(texts), "reference": len(reference),
+                "nb_texts_per_sec": len(texts) / nb_seconds, "nb_featurize_seconds": featurize_seconds,
+                "nb_matmul_seconds": matmul_seconds, "snownlp_texts_per_sec": len(reference) / snow_seconds,
+                "export_max_error": export_error, "label_agreement": agreement, "mae": mae, "corr": corr,
+                "confusion": {row: {col: int(n) for col, n in counts.items()} for row, counts in confusion.iterrows()},
+                "mean_score_nb": float(nb_scores.mean()),
+            }, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
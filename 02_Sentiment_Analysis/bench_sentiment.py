@@ -0,0 +1,67 @@
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+import sentiment_engine
+
+# ---------------------------------------------------------
+# [情感評分吞吐量測試]
+# 以模擬評論 (由片段隨機組合) 量測 sentiment_engine 在不同 worker 數下的 則/秒，
+# 並確認多行程結果與單行程完全一致
+# 執行: python bench_sentiment.py --reviews 20000 --workers 1 2 4 8
+# ---------------------------------------------------------
+
+FRAGMENTS = [
+    "這家餐廳的牛排真的太好吃了", "服務生態度非常親切", "環境也很乾淨", "CP值很高", "下次一定會再來",
+    "味道還可以", "排隊排太久了", "中規中矩", "價格偏高", "份量有點少", "停車不太方便",
+    "服務態度很差", "湯送上來是冷的", "衛生環境堪憂", "完全不推", "牛排煎得太老了", "動線規劃很亂",
+]
+
+
+def synthetic_reviews(n, seed=42):
+    """由 1~4 個片段組成的模擬評論"""
+    rng = random.Random(seed)
+    return ["，".join(rng.sample(FRAGMENTS, rng.randint(1, 4))) + "。" for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SnowNLP 多行程情感評分吞吐量測試")
+    parser.add_argument("--reviews", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk-size", type=int, default=sentiment_engine.DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    texts = synthetic_reviews(args.reviews)
+    print(f"可用核心數: {sentiment_engine.default_workers()}，評論數: {len(texts):,}")
+
+    start = time.perf_counter()
+    baseline = sentiment_engine.score_texts(texts, min_parallel=len(texts) + 1)
+    seconds = time.perf_counter() - start
+    results = [{"mode": "in-process", "workers": 0, "seconds": seconds, "texts_per_sec": len(texts) / seconds}]
+    print(f"{'in-process':>12}: {seconds:.1f}s → {len(texts) / seconds:,.0f} 則/秒")
+
+    for workers in args.workers:
+        sentiment_engine.shutdown_pool()
+        # 計時包含 pool 啟動與每個 worker 載入模型，與 Streamlit 第一次分析時的體感相同
+        start = time.perf_counter()
+        scores = sentiment_engine.score_texts(texts, workers=workers, chunk_size=args.chunk_size, min_parallel=0)
+        seconds = time.perf_counter() - start
+        identical = bool(np.array_equal(scores, baseline))
+        results.append({"mode": "pool", "workers": workers, "seconds": seconds,
+                        "texts_per_sec": len(texts) / seconds, "identical": identical})
+        print(f"{f'workers={workers}':>12}: {seconds:.1f}s → {len(texts) / seconds:,.0f} 則/秒 "
+              f"(結果一致: {identical})")
+    sentiment_engine.shutdown_pool()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"reviews": len(texts), "cores": sentiment_engine.default_workers(), "results": results},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+import review_stream
+import sentiment_engine
+from bench_sentiment import synthetic_reviews
+
+# ---------------------------------------------------------
+# [分析後評論 DataFrame 記憶體剖析]
+# 比較原本的欄位型別 (Python 物件字串、float64) 與 review_stream.compact_frame 的精簡型別，
+# 以 memory_usage(deep=True) 換算成「每百萬則評論」的用量，並比較依標籤篩選的成本：
+#   複製篩選 df[df['sentiment_label'] == 標籤] vs 以 categorical 代碼產生的布林遮罩
+# 執行: python profile_review_memory.py --reviews 1000000
+# ---------------------------------------------------------
+
+PLATFORMS = ["Google Maps", "Facebook", "Dcard"]
+
+
+def legacy_frame(n, seed=42):
+    """原本 analyze_sentiment 產生的欄位型別：物件字串 + float64"""
+    rng = random.Random(seed)
+    scores = np.random.default_rng(seed).random(n)
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "platform": pd.Series([rng.choice(PLATFORMS) for _ in range(n)], dtype=object),
+        "text": pd.Series(synthetic_reviews(n, seed), dtype=object),
+        "sentiment_score": scores,
+        "sentiment_label": pd.Series(sentiment_engine.sentiment_labels(scores), dtype=object),
+    })
+
+
+def per_million(nbytes, n):
+    return nbytes / n * 1_000_000 / 1024 ** 2
+
+
+def column_report(df, n):
+    usage = df.memory_usage(deep=True, index=False)
+    return {column: per_million(int(nbytes), n) for column, nbytes in usage.items()}
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析後評論 DataFrame 的記憶體剖析")
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+    n = args.reviews
+
+    legacy = legacy_frame(n)
+    compact, convert_ms = timed(lambda: review_stream.compact_frame(legacy.copy()))
+    before, after = column_report(legacy, n), column_report(compact, n)
+
+    print(f"評論數: {n:,} (以下為每百萬則的 MB，轉換耗時 {convert_ms:,.0f}ms)")
+    print(f"{'欄位':<16}{'原本':>10}{'精簡':>10}  型別")
+    for column in legacy.columns:
+        print(f"{column:<16}{before[column]:>10.1f}{after[column]:>10.1f}  "
+              f"{legacy[column].dtype} → {compact[column].dtype}")
+    total_before, total_after = sum(before.values()), sum(after.values())
+    print(f"{'合計':<16}{total_before:>10.1f}{total_after:>10.1f}  ({total_before / total_after:.1f}x)")
+
+    # 依標籤篩選：複製出子集 vs 布林遮罩 (1 byte/列，不複製任何欄位)
+    label = sentiment_engine.POSITIVE_LABEL
+    subset, copy_ms = timed(lambda: legacy[legacy['sentiment_label'] == label])
+    copy_mb = per_million(int(subset.memory_usage(deep=True, index=True).sum()), n)
+    code = review_stream.LABEL_CODES[label]
+    mask, mask_ms = timed(lambda: review_stream.label_codes(compact['sentiment_label']) == code)
+    mask_mb = per_million(mask.nbytes, n)
+    print(f"篩選「{label}」：複製子集 {copy_mb:.1f} MB / {copy_ms:.0f}ms，布林遮罩 {mask_mb:.1f} MB / {mask_ms:.1f}ms")
+
+    # 各標籤筆數：字串比對 vs categorical 代碼 bincount
+    _, legacy_count_ms = timed(lambda: legacy['sentiment_label'].map(review_stream.LABEL_CODES).value_counts())
+    _, codes_count_ms = timed(lambda: np.bincount(review_stream.label_codes(compact['sentiment_label']),
+                                                  minlength=len(review_stream.LABELS)))
+    print(f"各標籤筆數：字串對照 {legacy_count_ms:.0f}ms，代碼 bincount {codes_count_ms:.1f}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "reviews": n, "mb_per_million_before": before, "mb_per_million_after": after,
+                "total_before": total_before, "total_after": total_after,
+                "filter_copy_mb": copy_mb, "filter_mask_mb": mask_mb,
+                "filter_copy_ms": copy_ms, "filter_mask_ms": mask_ms,
+            }, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
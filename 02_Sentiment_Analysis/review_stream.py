@@ -0,0 +1,164 @@
+import sqlite3
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import score_cache
+import sentiment_engine
+import token_store
+
+# ---------------------------------------------------------
+# 分塊串流分析 (大型評論 CSV)
+# 不把整個 CSV 讀進一個 DataFrame：每次讀 chunk_rows 列，評分 (score_cache) + 斷詞後，
+# 只把結果累加進 ReviewAggregate (平均分數、各標籤筆數、各標籤詞頻向量、前 N 筆樣本)，
+# 處理完的 chunk 即可丟棄，記憶體用量與檔案大小無關。
+# 儀表板每處理完一個 chunk 就用目前的累計結果重畫 KPI 與圖表。
+#
+# 分析後的 DataFrame 使用精簡欄位型別 (compact_frame)：
+# - text：Arrow 字串 (連續緩衝區，不是每列一個 Python str 物件)
+# - platform / sentiment_label：categorical (每列 1 byte 代碼 + 一份類別表)
+# - sentiment_score：float32 (0~1 的機率，7 位有效數字已足夠；加總時轉回 float64)
+# 記憶體比較見 profile_review_memory.py
+# ---------------------------------------------------------
+
+DEFAULT_CHUNK_ROWS = 20_000
+SAMPLE_ROWS = 10            # 保留前幾筆評論作為樣本表格
+LABELS = [sentiment_engine.POSITIVE_LABEL, sentiment_engine.NEGATIVE_LABEL, sentiment_engine.NEUTRAL_LABEL]
+LABEL_CODES = {label: code for code, label in enumerate(LABELS)}
+TEXT_DTYPE = "string[pyarrow]"
+LABEL_DTYPE = pd.CategoricalDtype(LABELS)
+SCORE_DTYPE = np.float32
+
+
+def compact_frame(df):
+    """把評論 DataFrame 的欄位轉成精簡型別 (就地修改並回傳同一個 DataFrame)"""
+    df['text'] = df['text'].astype(TEXT_DTYPE)
+    if 'platform' in df.columns:
+        df['platform'] = df['platform'].astype("category")
+    if 'sentiment_label' in df.columns:
+        df['sentiment_label'] = df['sentiment_label'].astype(LABEL_DTYPE)
+    if 'sentiment_score' in df.columns:
+        df['sentiment_score'] = df['sentiment_score'].astype(SCORE_DTYPE)
+    return df
+
+
+def label_codes(labels):
+    """標籤欄位 → LABELS 的索引 (numpy)；categorical 欄位直接取代碼，不必逐列比對字串"""
+    if labels.dtype == LABEL_DTYPE:
+        return labels.cat.codes.to_numpy()
+    return labels.map(LABEL_CODES).to_numpy()
+
+
+class ReviewAggregate:
+    """
+    逐塊累加的評論分析結果
+    詞頻以 (標籤 × 詞彙) 的整數矩陣累加：每個 chunk 的斷詞結果來自 TokenStore (每則不重複文字只斷詞一次)，
+    切換 全部 / 正面 / 負面 只是對矩陣的列做加總，不必重新斷詞
+    """
+
+    def __init__(self, sample_rows=SAMPLE_ROWS, store=None):
+        self.sample_rows = sample_rows
+        self.store = store or token_store.get_default_store()
+        self.rows = 0
+        self.chunks = 0
+        self.score_sum = 0.0
+        self.label_counts = Counter()
+        self.term_matrix = np.zeros((len(LABELS), 0), dtype=np.int64)
+        self._samples = []
+
+    def update(self, df):
+        """累加一個已評分的 chunk (欄位：text, sentiment_score, sentiment_label)"""
+        self.rows += len(df)
+        self.chunks += 1
+        self.score_sum += float(df['sentiment_score'].to_numpy().sum(dtype=np.float64))
+        codes = label_codes(df['sentiment_label'])
+        label_totals = np.bincount(codes, minlength=len(LABELS))
+        self.label_counts.update({LABELS[code]: int(n) for code, n in enumerate(label_totals) if n})
+        counts = self.store.count(df['text'], codes, len(LABELS))
+        if counts.shape[1] > self.term_matrix.shape[1]:
+            # 詞彙表只會變長：舊矩陣右側補零
+            grown = np.zeros_like(counts)
+            grown[:, :self.term_matrix.shape[1]] = self.term_matrix
+            self.term_matrix = grown
+        self.term_matrix[:, :counts.shape[1]] += counts
+        missing = self.sample_rows - sum(len(s) for s in self._samples)
+        if missing > 0:
+            self._samples.append(df[['text', 'sentiment_label', 'sentiment_score']].head(missing))
+        return self
+
+    @property
+    def mean_score(self):
+        return self.score_sum / self.rows if self.rows else float("nan")
+
+    @property
+    def positive_ratio(self):
+        """正面評論佔比 (0~100)"""
+        return self.label_counts[sentiment_engine.POSITIVE_LABEL] / self.rows * 100 if self.rows else 0.0
+
+    def label_series(self):
+        """各標籤筆數 (由多到少)，供圓餅圖使用"""
+        return pd.Series(dict(self.label_counts.most_common()), dtype="int64")
+
+    def samples(self):
+        """前 sample_rows 筆評論與分數"""
+        if not self._samples:
+            return pd.DataFrame(columns=['text', 'sentiment_label', 'sentiment_score'])
+        return pd.concat(self._samples, ignore_index=True)
+
+    def term_vector(self, label=None):
+        """詞頻向量 (索引為詞彙 id)；label 為 None 時合併所有標籤"""
+        if label is None:
+            return self.term_matrix.sum(axis=0)
+        return self.term_matrix[LABEL_CODES[label]]
+
+    def terms(self, label=None, top=None):
+        """高頻詞 Counter (詞 -> 次數)；top 為 None 時回傳所有出現過的詞"""
+        vector = self.term_vector(label)
+        ids = np.flatnonzero(vector)
+        if top is not None and len(ids) > top:
+            ids = ids[np.argpartition(vector[ids], -top)[-top:]]
+        ids = ids[np.argsort(-vector[ids], kind="stable")]
+        return Counter({self.store.terms[i]: int(vector[i]) for i in ids})
+
+
+def iter_csv(source, chunk_rows=DEFAULT_CHUNK_ROWS, keep_columns=False):
+    """
+    逐塊讀取評論 CSV (source 可為路徑或檔案物件)，只保留 text 非空的列 (Arrow 字串)
+    keep_columns=False 時只保留 text 欄位；批次輸出 (analytics.py) 需要保留 id、platform 等其他欄位
+    """
+    reader = pd.read_csv(source, chunksize=chunk_rows, dtype={'text': TEXT_DTYPE})
+    for chunk in reader:
+        if 'text' not in chunk.columns:
+            raise ValueError("CSV 檔案必須包含 'text' 欄位")
+        yield (chunk if keep_columns else chunk[['text']]).dropna(subset=['text'])
+
+
+def iter_sqlite(path, table="reviews", chunk_rows=DEFAULT_CHUNK_ROWS):
+    """逐塊讀取 SQLite 評論資料表 (需有 text 欄位，保留所有欄位)，只保留 text 非空的列"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        for chunk in pd.read_sql_query(f'SELECT * FROM "{table}"', conn, chunksize=chunk_rows):
+            if 'text' not in chunk.columns:
+                raise ValueError(f"資料表 {table} 必須包含 'text' 欄位")
+            chunk = chunk.dropna(subset=['text'])
+            chunk['text'] = chunk['text'].astype(TEXT_DTYPE)
+            yield chunk
+    finally:
+        conn.close()
+
+
+def analyze_chunk(df, progress=None, **engine_options):
+    """為評論 DataFrame 就地加上 sentiment_score / sentiment_label 欄位，並轉成精簡欄位型別"""
+    scores, labels = score_cache.score_texts_cached(df['text'], progress=progress, **engine_options)
+    df['sentiment_score'] = scores.astype(SCORE_DTYPE)
+    df['sentiment_label'] = pd.Categorical(labels, dtype=LABEL_DTYPE)
+    return compact_frame(df)
+
+
+def stream_csv(source, chunk_rows=DEFAULT_CHUNK_ROWS, aggregate=None, **engine_options):
+    """逐塊分析評論 CSV，每完成一個 chunk 就 yield 目前的 ReviewAggregate"""
+    aggregate = aggregate or ReviewAggregate()
+    for chunk in iter_csv(source, chunk_rows):
+        aggregate.update(analyze_chunk(chunk, **engine_options))
+        yield aggregate
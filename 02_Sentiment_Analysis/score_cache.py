@@ -0,0 +1,205 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import sentiment_engine
+
+# ---------------------------------------------------------
+# 情感分數快取 (以正規化文字的雜湊為鍵)
+# 評論大量重複 (複製貼上、重複上傳)，同一句話只需要讓 SnowNLP 算一次：
+# - 鍵：正規化文字 (去頭尾空白、連續空白合併) + 模型版本 的 BLAKE2b 雜湊 (不同 backend 的分數分開存放)
+# - 第一層：行程內 LRU (OrderedDict)，Streamlit rerun 直接命中
+# - 第二層：SQLite 檔案，跨 session、跨上傳、跨重新啟動共用；超過 max_bytes 時淘汰最久沒用到的項目
+# 只有兩層都沒命中的「不重複」文字才會送進 sentiment_engine 評分
+# ---------------------------------------------------------
+
+# 模型或正規化規則改變時更新版本字串，舊的快取項目就不會再被讀到 (之後自然被淘汰)
+MODEL_VERSIONS = {
+    "snownlp": "snownlp-0.12.3/v1",
+    "nb": "snownlp-0.12.3-nb-fmm/v1",
+}
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sentiment_cache.db")
+MEMORY_ITEMS = 200_000               # LRU 最多保留的項目數
+MAX_BYTES = 64 * 1024 * 1024         # SQLite 檔案的大小上限
+EVICT_FRACTION = 0.2                 # 超過上限時一次淘汰的比例 (避免每次寫入都觸發)
+LOOKUP_CHUNK = 500                   # 每個 IN (...) 查詢的鍵數
+
+SQL_CREATE = """
+    CREATE TABLE IF NOT EXISTS scores (
+        key BLOB PRIMARY KEY,
+        score REAL NOT NULL,
+        label TEXT NOT NULL,
+        last_used INTEGER NOT NULL
+    ) WITHOUT ROWID
+"""
+SQL_UPSERT = """
+    INSERT INTO scores (key, score, label, last_used) VALUES (?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET last_used = excluded.last_used
+"""
+SQL_TOUCH = "UPDATE scores SET last_used = ? WHERE key = ?"
+SQL_LIVE_BYTES = """
+    SELECT (page_count - freelist_count) * page_size FROM pragma_page_count, pragma_freelist_count, pragma_page_size
+"""
+SQL_EVICT = """
+    DELETE FROM scores WHERE key IN (
+        SELECT key FROM scores ORDER BY last_used LIMIT (SELECT CAST(count(*) * ? AS INTEGER) FROM scores)
+    )
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """正規化文字：去頭尾空白並把連續空白合併成一個空格 (不轉換全形標點，以免影響斷詞)"""
+    return _WHITESPACE.sub(" ", str(text)).strip()
+
+
+def text_key(normalized, backend=sentiment_engine.DEFAULT_BACKEND):
+    """正規化文字 → 16 bytes 的快取鍵"""
+    version = MODEL_VERSIONS[backend]
+    return hashlib.blake2b(f"{version}\x00{normalized}".encode("utf-8"), digest_size=16).digest()
+
+
+class ScoreCache:
+    """
+    兩層的情感分數快取：記憶體 LRU → SQLite
+    - path: SQLite 檔案路徑；None 表示只用記憶體
+    - memory_items: LRU 項目上限
+    - max_bytes: SQLite 檔案內有效資料的大小上限
+    """
+
+    def __init__(self, path=DEFAULT_PATH, memory_items=MEMORY_ITEMS, max_bytes=MAX_BYTES):
+        self.path = path
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evicted": 0}
+
+    def _connection(self):
+        if self._conn is None and self.path:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute(SQL_CREATE)
+        return self._conn
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """查詢多個鍵，回傳 {key: (score, label)} (只含命中的項目)"""
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                value = self._memory.get(key)
+                if value is None:
+                    missing.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[key] = value
+            self.stats["memory_hits"] += len(found)
+            conn = self._connection()
+            if conn is not None and missing:
+                for i in range(0, len(missing), LOOKUP_CHUNK):
+                    chunk = missing[i:i + LOOKUP_CHUNK]
+                    rows = conn.execute(
+                        f"SELECT key, score, label FROM scores WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                    for key, score, label in rows:
+                        found[key] = (score, label)
+                        self._remember(key, (score, label))
+                disk_hits = [key for key in missing if key in found]
+                self.stats["disk_hits"] += len(disk_hits)
+                if disk_hits:
+                    # 更新最後使用時間，淘汰時才會保留常用的項目
+                    now = int(time.time())
+                    with conn:
+                        conn.executemany(SQL_TOUCH, ((now, key) for key in disk_hits))
+            self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """寫入多個 (key, score, label)"""
+        with self._lock:
+            for key, score, label in items:
+                self._remember(key, (score, label))
+            conn = self._connection()
+            if conn is None:
+                return
+            now = int(time.time())
+            with conn:
+                conn.executemany(SQL_UPSERT, ((key, score, label, now) for key, score, label in items))
+            self._evict_if_needed(conn)
+
+    def _evict_if_needed(self, conn):
+        if conn.execute(SQL_LIVE_BYTES).fetchone()[0] <= self.max_bytes:
+            return
+        # 刪除最久沒用到的一批項目；釋放的頁面留在檔案內重複使用，檔案大小不會超過上限太多
+        with conn:
+            evicted = conn.execute(SQL_EVICT, (EVICT_FRACTION,)).rowcount
+        self.stats["evicted"] += evicted
+
+    def clear(self):
+        """清空兩層快取"""
+        with self._lock:
+            self._memory.clear()
+            conn = self._connection()
+            if conn is not None:
+                with conn:
+                    conn.execute("DELETE FROM scores")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """行程內共用的預設快取 (所有 Streamlit session 共用同一個 LRU 與 SQLite 檔案)"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ScoreCache()
+        return _default_cache
+
+
+def score_texts_cached(texts, cache=None, progress=None, backend=sentiment_engine.DEFAULT_BACKEND, **engine_options):
+    """
+    取得每則文字的 (分數, 標籤)，回傳 (scores numpy array, labels list)，順序與輸入相同
+    只有快取未命中的「不重複」文字會交給 sentiment_engine.score_texts 評分
+    progress(已完成筆數, 需評分筆數) 只在有文字需要評分時呼叫
+    backend 見 sentiment_engine.score_texts
+    """
+    cache = cache or get_default_cache()
+    normalized = [normalize(t) for t in texts]
+    keys_by_text = {text: text_key(text, backend) for text in dict.fromkeys(normalized)}
+    found = cache.get_many(list(keys_by_text.values()))
+
+    pending = [text for text, key in keys_by_text.items() if key not in found]
+    if pending:
+        scores = sentiment_engine.score_texts(pending, progress=progress, backend=backend, **engine_options)
+        labels = sentiment_engine.sentiment_labels(scores)
+        items = [(keys_by_text[text], float(score), label) for text, score, label in zip(pending, scores, labels)]
+        cache.put_many(items)
+        found.update((key, (score, label)) for key, score, label in items)
+
+    values = [found[keys_by_text[text]] for text in normalized]
+    scores = np.fromiter((score for score, _ in values), dtype=np.float64, count=len(values))
+    return scores, [label for _, label in values]
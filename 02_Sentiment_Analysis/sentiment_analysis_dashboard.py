@@ -1,21 +1,31 @@
 import streamlit as st
 import pandas as pd
-import jieba
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-from snownlp import SnowNLP
 import random
 import os
 import platform
+import sys
+import review_stream
+import sentiment_engine
+import token_store
+import wordcloud_cache
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 共用的 perf_stages 在 repo 根目錄
+import perf_stages
 
 # ---------------------------------------------------------
 # [安裝與執行教學]
-# 1. 安裝套件: pip install streamlit pandas matplotlib jieba wordcloud snownlp
+# 1. 安裝套件: pip install streamlit pandas matplotlib jieba wordcloud snownlp scipy
 # 2. 執行程式: python -m streamlit run sentiment_analysis_dashboard.py
+# 啟動速度：matplotlib、wordcloud、結巴與 SnowNLP 都在用到時才載入，
+# 模型與詞典以 st.cache_resource 每個行程只載入一次 (實測見根目錄 startup_report.py)
+# 效能：各階段 (情感評分、結巴斷詞、圓餅圖、文字雲) 的耗時顯示在側邊欄的「效能」面板 (perf_stages)
+# 切換文字雲類型 (全部 / 正面 / 負面) 的整次 rerun (AppTest 實測，2 萬與 20 萬則上傳相同)：
+#   約 0.22 秒，其中重畫圓餅圖約 0.16 秒，詞頻加總 (agg.terms) 本身 < 0.1ms；
+#   該類型的文字雲第一次產生時約 0.7 秒 (之後取用 PNG 快取)
 # ---------------------------------------------------------
 
 # --- 1. 系統配置與字體設定 (解決中文亂碼問題) ---
 st.set_page_config(page_title="社群輿情與情感分析系統", layout="wide")
+perf_stages.begin_run("sentiment")
 
 def get_chinese_font():
     """偵測系統中的計算中文字體路徑 (針對 Windows 優化)"""
@@ -32,13 +42,31 @@ def get_chinese_font():
 
 CHINESE_FONT_PATH = get_chinese_font()
 
-# 設定 Matplotlib 字體以顯示中文
-if CHINESE_FONT_PATH and os.path.exists(CHINESE_FONT_PATH):
-    from matplotlib.font_manager import FontProperties
-    font_prop = FontProperties(fname=CHINESE_FONT_PATH)
-    plt.rcParams['font.sans-serif'] = [font_prop.get_name()]
-    plt.rcParams['axes.unicode_minus'] = False
-else:
+@st.cache_resource
+@perf_stages.staged("載入 matplotlib")
+def load_pyplot():
+    """載入 Matplotlib 並設定字體以顯示中文 (第一次畫圖時才載入，每個行程一次)"""
+    import matplotlib.pyplot as plt
+    if CHINESE_FONT_PATH and os.path.exists(CHINESE_FONT_PATH):
+        from matplotlib.font_manager import FontProperties
+        font_prop = FontProperties(fname=CHINESE_FONT_PATH)
+        plt.rcParams['font.sans-serif'] = [font_prop.get_name()]
+        plt.rcParams['axes.unicode_minus'] = False
+    return plt
+
+@st.cache_resource(show_spinner="正在載入情感模型...")
+@perf_stages.staged("載入情感模型")
+def load_sentiment_model(backend):
+    """情感模型每個行程只載入一次 (所有 session 共用)"""
+    return sentiment_engine.load_model(backend)
+
+@st.cache_resource(show_spinner="正在載入斷詞詞典...")
+@perf_stages.staged("載入結巴詞典")
+def load_tokenizer():
+    """結巴前綴詞典每個行程只建立一次 (所有 session 共用)"""
+    return token_store.load_dictionary()
+
+if not (CHINESE_FONT_PATH and os.path.exists(CHINESE_FONT_PATH)):
     st.warning("⚠️ 未偵測到中文字體，圖表中的中文可能會顯示為方框。")
 
 # --- 2. 模擬資料生成 (Mock Data) ---
@@ -88,63 +116,79 @@ def load_mock_data():
 
 # --- 3. 核心分析功能 ---
 
-def analyze_sentiment(df):
-    """使用 SnowNLP 進行情感分析"""
+def analyze_sentiment(df, progress=None, backend="snownlp"):
+    """使用 SnowNLP 進行情感分析 (大量評論時由 sentiment_engine 分散到多個行程計算)"""
     # SnowNLP 的 sentiments 屬性會回傳 0~1 的數值，越接近 1 代表越正面
-    df['sentiment_score'] = df['text'].apply(lambda x: SnowNLP(x).sentiments)
-    
-    # 定義情感標籤
-    def get_label(score):
-        if score > 0.6: return "正面 (Positive)"
-        elif score < 0.4: return "負面 (Negative)"
-        else: return "中性 (Neutral)"
-        
-    df['sentiment_label'] = df['sentiment_score'].apply(get_label)
-    return df
-
-def generate_wordcloud(text_list):
-    """生成文字雲"""
-    # 1. 結巴斷詞
-    text = " ".join(text_list)
-    # 載入繁體結巴模式 (可選)
-    # jieba.set_dictionary('dict.txt.big') 
-    
-    words = jieba.cut(text)
-    
-    # 2. 去除停用詞 (Stopwords)
-    stopwords = set(["的", "了", "是", "也", "都", "就", "但", "很", "在", "有", "我", "去", "吃", "這", "那"])
-    filtered_words = [w for w in words if w not in stopwords and len(w) > 1] # 過濾單字
-    
-    final_text = " ".join(filtered_words)
-    
-    # 3. 繪製文字雲
-    wc = WordCloud(
+    # backend="nb" 改用向量化 Naive Bayes (同一個 SnowNLP 模型，整批以稀疏矩陣評分，速度快數十倍)
+    # 分數與標籤 (>0.6 正面、<0.4 負面) 以文字雜湊快取：重複的評論、rerun 與重新上傳都不必重算
+    # 結果欄位為精簡型別：float32 分數、categorical 標籤/平台、Arrow 字串 (見 review_stream.compact_frame)
+    with perf_stages.stage(f"情感評分 ({backend})", rows=len(df)):
+        return review_stream.analyze_chunk(df, progress=progress, backend=backend)
+
+def accumulate(agg, df):
+    """結巴斷詞 + 累加詞頻、標籤與樣本 (ReviewAggregate.update)"""
+    with perf_stages.stage("結巴斷詞 + 累計", rows=len(df)):
+        return agg.update(df)
+
+def generate_wordcloud(term_counts):
+    """由詞頻 (斷詞與停用詞過濾已在 token_store 完成) 生成文字雲 PNG；相同詞頻直接取用快取圖片"""
+    return wordcloud_cache.render_png(
+        term_counts,
         font_path=CHINESE_FONT_PATH, # 重要：必須指定中文字體
         background_color="white",
         width=800,
         height=400,
         max_words=100
-    ).generate(final_text)
-    
-    return wc, filtered_words
+    )
+
+def render_overview(agg):
+    """以目前的累計結果繪製 數據概覽 與 情感分佈 (串流模式下每個 chunk 完成後重畫)"""
+    # 1. 數據概覽
+    with kpi_area.container():
+        col1, col2, col3 = st.columns(3)
+        col1.metric("平均情感分數 (0-1)", f"{agg.mean_score:.2f}")
+        col2.metric("正面評論佔比", f"{agg.positive_ratio:.1f}%")
+        col3.metric("總評論數", f"{agg.rows:,} 則")
+
+    # 2. 情感分佈圖 (Pie Chart)
+    with distribution_area.container():
+        col_chart, col_table = st.columns([1, 1])
+
+        with col_chart, perf_stages.stage("情感分佈圓餅圖"):
+            plt = load_pyplot()
+            sentiment_counts = agg.label_series()
+            fig1, ax1 = plt.subplots()
+            ax1.pie(sentiment_counts, labels=sentiment_counts.index, autopct='%1.1f%%', 
+                    colors=['#66b3ff', '#ff9999', '#99ff99'], startangle=90)
+            ax1.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+            st.pyplot(fig1)
+            plt.close(fig1)  # 串流時會反覆重畫，釋放舊的 figure
+            
+            # 如果沒有中文字體，使用備用顯示方式
+            if not CHINESE_FONT_PATH:
+                st.caption("若圖表文字顯示方框，請檢查系統是否安裝微軟正黑體")
+
+        with col_table:
+            st.dataframe(agg.samples(), height=300)
 
 # --- 4. Streamlit UI 介面 ---
 
 # 側邊欄
 st.sidebar.title("📊 輿情分析控制台")
 data_source = st.sidebar.radio("選擇資料來源", ["載入範例資料 (餐廳評論)", "上傳 CSV 檔案 (進階功能)"])
+SENTIMENT_BACKENDS = {"SnowNLP (逐句，最精準)": "snownlp", "向量化 Naive Bayes (高速)": "nb"}
+backend_name = st.sidebar.selectbox("情感分析模型", list(SENTIMENT_BACKENDS))
+backend = SENTIMENT_BACKENDS[backend_name]
 
 if data_source == "載入範例資料 (餐廳評論)":
     raw_df = load_mock_data()
     st.sidebar.success("✅ 範例資料已載入")
 else:
+    # 大型 CSV 不一次讀入：以串流模式逐塊評分與斷詞，只保留累計結果
     uploaded_file = st.sidebar.file_uploader("上傳您的評論 CSV (需包含 'text' 欄位)", type="csv")
-    if uploaded_file:
-        raw_df = pd.read_csv(uploaded_file)
-        if 'text' not in raw_df.columns:
-            st.error("CSV 檔案必須包含 'text' 欄位")
-            st.stop()
-    else:
+    chunk_rows = st.sidebar.number_input("每次處理的列數 (串流模式)", min_value=1_000, max_value=500_000,
+                                         value=review_stream.DEFAULT_CHUNK_ROWS, step=5_000)
+    if not uploaded_file:
         st.info("請上傳檔案或切換至範例資料")
         st.stop()
 
@@ -152,38 +196,58 @@ else:
 st.title("🗣️ 產品/服務 輿情情感分析儀表板")
 st.markdown("透過 **NLP 自然語言處理** 技術，自動分析消費者評論，提煉商業洞察。")
 
-# 進行分析
-with st.spinner('正在進行情感運算與斷詞分析...'):
-    df = analyze_sentiment(raw_df)
-    
-# 1. 數據概覽
-col1, col2, col3 = st.columns(3)
-avg_score = df['sentiment_score'].mean()
-positive_ratio = (df['sentiment_label'] == '正面 (Positive)').mean() * 100
-col1.metric("平均情感分數 (0-1)", f"{avg_score:.2f}")
-col2.metric("正面評論佔比", f"{positive_ratio:.1f}%")
-col3.metric("總評論數", f"{len(df)} 則")
-
-# 2. 情感分佈圖 (Pie Chart)
+kpi_area = st.empty()
 st.subheader("1. 情感傾向分佈")
-col_chart, col_table = st.columns([1, 1])
-
-with col_chart:
-    sentiment_counts = df['sentiment_label'].value_counts()
-    fig1, ax1 = plt.subplots()
-    ax1.pie(sentiment_counts, labels=sentiment_counts.index, autopct='%1.1f%%', 
-            colors=['#66b3ff', '#ff9999', '#99ff99'], startangle=90)
-    ax1.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-    
-    # 如果沒有中文字體，使用備用顯示方式
-    if not CHINESE_FONT_PATH:
-        st.pyplot(fig1)
-        st.caption("若圖表文字顯示方框，請檢查系統是否安裝微軟正黑體")
+distribution_area = st.empty()
+
+def scoring_progress(progress_bar=None):
+    """評分進度回呼：開始評分時才載入情感模型 (快取全部命中時完全不必載入)"""
+    def report(done, total):
+        if done == 0 and not sentiment_engine.uses_pool(total, backend=backend):
+            load_sentiment_model(backend)
+        if progress_bar is not None:
+            progress_bar.progress(done / total, text=f"情感運算中... {done:,} / {total:,} 則")
+    return report
+
+# 進行分析 (詞典與模型在標題顯示後才載入)
+load_tokenizer()
+if data_source == "載入範例資料 (餐廳評論)":
+    with st.spinner('正在進行情感運算與斷詞分析...'):
+        progress_bar = st.progress(0.0, text="情感運算中...")
+        df = analyze_sentiment(raw_df, backend=backend, progress=scoring_progress(progress_bar))
+        progress_bar.empty()
+        agg = accumulate(review_stream.ReviewAggregate(), df)
+    render_overview(agg)
+else:
+    # 同一個上傳檔 (file_id 每次上傳都不同) 與模型的累計結果保存在 session：
+    # 切換文字雲類型等互動引發的 rerun 直接取用，不必重新讀取、雜湊與評分整個檔案
+    upload_key = (uploaded_file.file_id, backend)
+    cached = st.session_state.get("upload_aggregate")
+    if cached is not None and cached[0] == upload_key:
+        agg = cached[1]
+        render_overview(agg)
     else:
-        st.pyplot(fig1)
+        progress_bar = st.progress(0.0, text="串流分析中...")
+        agg = review_stream.ReviewAggregate()
+        try:
+            # 即 review_stream.stream_csv 的迴圈，展開以便分別量測評分與斷詞 (效能面板會合併各區塊的時間)
+            for chunk in review_stream.iter_csv(uploaded_file, chunk_rows=int(chunk_rows)):
+                accumulate(agg, analyze_sentiment(chunk, backend=backend, progress=scoring_progress()))
+                # 以已讀取的位元組估計進度 (總列數要讀完整個檔案才知道)
+                done = min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0)
+                progress_bar.progress(done, text=f"串流分析中... 已處理 {agg.rows:,} 則 ({agg.chunks} 個區塊)")
+                render_overview(agg)
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+        progress_bar.empty()
+        # 只保存完整處理完的結果 (串流途中被互動中斷時下次 rerun 會重新處理)
+        st.session_state["upload_aggregate"] = (upload_key, agg)
+    if agg.rows == 0:
+        st.warning("CSV 檔案中沒有評論資料。")
+        st.stop()
 
-with col_table:
-    st.dataframe(df[['text', 'sentiment_label', 'sentiment_score']].head(10), height=300)
+avg_score = agg.mean_score
 
 # 3. 文字雲分析
 st.subheader("2. 關鍵字文字雲 (Word Cloud)")
@@ -192,26 +256,22 @@ st.markdown("分析消費者最常提到的關鍵詞：")
 # 分別產生 正面 vs 負面 文字雲
 sentiment_filter = st.radio("選擇要分析的評論類型：", ["全部", "正面 (Positive)", "負面 (Negative)"], horizontal=True)
 
+# 詞頻向量在分析時已按標籤累加好，切換類型只需加總向量並取前 100 個詞 (文字雲的上限)
 if sentiment_filter == "全部":
-    target_text = df['text'].tolist()
-elif sentiment_filter == "正面 (Positive)":
-    target_text = df[df['sentiment_label'] == "正面 (Positive)"]['text'].tolist()
+    term_counts = agg.terms(top=100)
 else:
-    target_text = df[df['sentiment_label'] == "負面 (Negative)"]['text'].tolist()
+    term_counts = agg.terms(sentiment_filter, top=100)
 
-if target_text:
-    wc_img, keywords = generate_wordcloud(target_text)
+if term_counts:
+    with perf_stages.stage("文字雲", rows=len(term_counts)):
+        wc_png = generate_wordcloud(term_counts)
     
-    # 顯示文字雲圖片
-    fig2, ax2 = plt.subplots(figsize=(10, 5))
-    ax2.imshow(wc_img, interpolation='bilinear')
-    ax2.axis("off")
-    st.pyplot(fig2)
+        # 顯示文字雲圖片 (直接顯示 PNG，不再經過 matplotlib 重新點陣化)
+        st.image(wc_png)
     
     # 顯示高頻詞統計
     st.write("🔥 **高頻關鍵詞 Top 10：**")
-    from collections import Counter
-    word_counts = Counter(keywords).most_common(10)
+    word_counts = term_counts.most_common(10)
     st.bar_chart(pd.DataFrame(word_counts, columns=["關鍵字", "次數"]).set_index("關鍵字").T)
 else:
     st.warning("沒有符合條件的評論資料。")
@@ -230,4 +290,6 @@ st.info(insight)
 
 # 頁尾
 st.markdown("---")
-st.caption("開發者: [EddieTcLee] | 技術棧: Python, Jieba (NLP), SnowNLP, Streamlit")
\ No newline at end of file
+st.caption("開發者: [EddieTcLee] | 技術棧: Python, Jieba (NLP), SnowNLP, Streamlit")
+
+perf_stages.render_panel()
\ No newline at end of file
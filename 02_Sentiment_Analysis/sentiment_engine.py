@@ -0,0 +1,162 @@
+import atexit
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+
+# ---------------------------------------------------------
+# 批次情感評分引擎 (多行程)
+# SnowNLP 的情感模型是純 Python 的 Naive Bayes，一次只能用一顆 CPU。
+# score_texts() 把評論切成固定大小的區塊，分散到 process pool：
+# - 每個 worker 啟動時只載入一次 SnowNLP 模型，之後重複使用
+# - 結果依原始順序串流回傳 (iter_scores)，可邊算邊回報進度
+# - 筆數少於 min_parallel 時直接在本行程計算，省去啟動 worker 的成本
+# - pool 在行程內共用，Streamlit rerun 時不必重新啟動 worker 與載入模型
+# worker 以 spawn 方式啟動：Streamlit 行程內有多條執行緒，fork 可能複製到被鎖住的狀態
+#
+# 實測 (bench_sentiment.py --reviews 50000，1 vCPU 容器，Python 3.11 / SnowNLP 0.12.3)：
+#   in-process : 182.2s → 274 則/秒
+#   workers=1  : 189.5s → 264 則/秒 (含 pool 啟動與每個 worker 載入模型)
+#   workers=2  : 185.3s → 270 則/秒 (只有一顆核心，無法加速；結果與單行程完全一致)
+# 每則評分彼此獨立、區塊之間只傳文字與分數，多核機器上吞吐量預期隨核心數近線性成長，
+# 扣除每個 worker 約 1~2 秒的模型載入時間；
+# 在多核機器上請以 bench_sentiment.py 重新量測並更新此表。
+#
+# backend="nb" 改用 nb_sentiment 的向量化 Naive Bayes (SnowNLP 模型匯出 + 稀疏矩陣評分)，
+# 在本行程逐區塊計算，不使用 process pool；速度與一致性見 bench_nb_sentiment.py
+# ---------------------------------------------------------
+
+DEFAULT_CHUNK_SIZE = 2000      # 每個工作區塊的評論數 (太小會被行程間傳輸成本吃掉)
+MIN_PARALLEL = 5000            # 少於此筆數時不啟動 process pool
+BACKENDS = ("snownlp", "nb")   # 逐句 SnowNLP / 向量化 Naive Bayes
+DEFAULT_BACKEND = "snownlp"
+
+# 情感標籤的分界 (分數 > 0.6 為正面、< 0.4 為負面，其餘為中性)
+POSITIVE_LABEL = "正面 (Positive)"
+NEGATIVE_LABEL = "負面 (Negative)"
+NEUTRAL_LABEL = "中性 (Neutral)"
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+_classify = None               # worker 內的 snownlp.sentiment.classify
+
+
+def _load_model():
+    """載入 SnowNLP 情感模型 (import 時會讀取模型檔，只做一次)"""
+    global _classify
+    if _classify is None:
+        from snownlp import sentiment
+        _classify = sentiment.classify
+    return _classify
+
+
+def load_model(backend=DEFAULT_BACKEND):
+    """在本行程載入指定 backend 的情感模型 (每個行程只載入一次)"""
+    if backend == "nb":
+        import nb_sentiment
+        return nb_sentiment.get_model()
+    return _load_model()
+
+
+def _score_chunk(texts):
+    """評分一個區塊；與 SnowNLP(text).sentiments 結果相同"""
+    classify = _load_model()
+    return np.fromiter((classify(text) for text in texts), dtype=np.float64, count=len(texts))
+
+
+def sentiment_label(score):
+    """情感分數 → 標籤"""
+    if score > 0.6: return POSITIVE_LABEL
+    elif score < 0.4: return NEGATIVE_LABEL
+    else: return NEUTRAL_LABEL
+
+
+def sentiment_labels(scores):
+    """一批情感分數 → 標籤 (numpy object array)，分界與 sentiment_label 相同"""
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.select([scores > 0.6, scores < 0.4], [POSITIVE_LABEL, NEGATIVE_LABEL], NEUTRAL_LABEL).astype(object)
+
+
+def default_workers():
+    """預設 worker 數：可用的 CPU 核心數"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def get_pool(workers=None):
+    """取得 (必要時建立) 共用的 process pool；worker 數改變時重建"""
+    global _pool, _pool_workers
+    workers = workers or default_workers()
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            shutdown_pool()
+            ctx = multiprocessing.get_context("spawn")
+            _pool = ctx.Pool(workers, initializer=_load_model)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    """關閉共用的 process pool"""
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+        _pool_workers = 0
+
+
+atexit.register(shutdown_pool)
+
+
+def uses_pool(n_texts, workers=None, min_parallel=MIN_PARALLEL, backend=DEFAULT_BACKEND):
+    """評分 n_texts 則文字時是否會使用 process pool (否則在本行程載入模型計算)"""
+    if backend == "nb":
+        return False
+    # 未指定 workers 且只有一顆核心時，pool 只會增加傳輸成本；明確指定 workers 時一律使用 pool
+    return n_texts >= min_parallel and not (workers is None and default_workers() == 1)
+
+
+def iter_scores(texts, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, min_parallel=MIN_PARALLEL,
+                backend=DEFAULT_BACKEND):
+    """依原始順序逐區塊產生情感分數 (numpy array)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的情感模型: {backend} (可用: {', '.join(BACKENDS)})")
+    texts = list(texts)
+    chunks = (texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size))
+    if backend == "nb":
+        import nb_sentiment
+        for chunk in chunks:
+            yield nb_sentiment.score_texts(chunk)
+        return
+    if not uses_pool(len(texts), workers, min_parallel, backend):
+        for chunk in chunks:
+            yield _score_chunk(chunk)
+        return
+    # imap 依提交順序回傳結果：先完成的區塊會等前面的區塊，呼叫端看到的順序與輸入一致
+    yield from get_pool(workers).imap(_score_chunk, chunks)
+
+
+def score_texts(texts, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, min_parallel=MIN_PARALLEL, progress=None,
+                backend=DEFAULT_BACKEND):
+    """
+    計算每則文字的 SnowNLP 情感分數 (0~1，越接近 1 越正面)，回傳與輸入同順序的 numpy array
+    - workers: worker 數 (預設為可用核心數；只有一顆核心時直接在本行程計算)
+    - backend: "snownlp" (逐句，與 SnowNLP 完全一致) 或 "nb" (向量化 Naive Bayes，快但斷詞不同)
+    - progress(已完成筆數, 總筆數): 開始評分時 (已完成 0 筆) 與每個區塊完成後呼叫
+    """
+    texts = list(texts)
+    scores = np.empty(len(texts), dtype=np.float64)
+    done = 0
+    if progress is not None:
+        progress(0, len(texts))
+    for chunk_scores in iter_scores(texts, workers, chunk_size, min_parallel, backend):
+        scores[done:done + len(chunk_scores)] = chunk_scores
+        done += len(chunk_scores)
+        if progress is not None:
+            progress(done, len(texts))
+    return scores
@@ -0,0 +1,66 @@
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+
+# ---------------------------------------------------------
+# 文字雲圖片快取
+# 文字雲的版面配置是整頁最慢的步驟；同一組高頻詞 + 同一組繪圖參數的結果是固定的
+# (固定 random_state)，因此把算好的 PNG bytes 依「前 N 個詞頻表 + 繪圖參數」的雜湊快取起來，
+# 命中時直接交給 st.image 顯示，不必重新排版，也不必經過 matplotlib imshow 重新點陣化。
+# wordcloud 套件 (連同 matplotlib) 只在快取未命中、真的要繪製時才載入。
+# ---------------------------------------------------------
+
+RENDER_DEFAULTS = {
+    "background_color": "white",
+    "width": 800,
+    "height": 400,
+    "max_words": 100,
+    "random_state": 42,   # 固定版面，快取命中與重新繪製的結果才會一致
+}
+MAX_CACHE_BYTES = 32 * 1024 * 1024   # 快取的 PNG 總大小上限
+
+_images = OrderedDict()              # key -> PNG bytes (LRU)
+_cache_bytes = 0
+_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def cache_key(frequencies, params):
+    """前 max_words 個詞頻 (依次數、詞排序) + 繪圖參數 的雜湊"""
+    top = sorted(frequencies.items(), key=lambda item: (-item[1], item[0]))[:params["max_words"]]
+    payload = json.dumps([top, sorted(params.items())], ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def render_png(frequencies, font_path=None, **options):
+    """
+    以詞頻 (dict: 詞 -> 次數) 繪製文字雲並回傳 PNG bytes
+    options 可覆蓋 RENDER_DEFAULTS；相同詞頻與參數會直接回傳快取的圖片
+    """
+    global _cache_bytes
+    params = dict(RENDER_DEFAULTS, font_path=font_path, **options)
+    key = cache_key(frequencies, params)
+    with _lock:
+        png = _images.get(key)
+        if png is not None:
+            _images.move_to_end(key)
+            stats["hits"] += 1
+            return png
+        stats["misses"] += 1
+
+    from wordcloud import WordCloud  # 延遲載入：快取命中時不需要 wordcloud / matplotlib
+    wc = WordCloud(**params).generate_from_frequencies(frequencies)
+    buffer = io.BytesIO()
+    wc.to_image().save(buffer, format="PNG")
+    png = buffer.getvalue()
+
+    with _lock:
+        if key not in _images:
+            _images[key] = png
+            _cache_bytes += len(png)
+            while _cache_bytes > MAX_CACHE_BYTES and len(_images) > 1:
+                _, evicted = _images.popitem(last=False)
+                _cache_bytes -= len(evicted)
+    return png
@@ -0,0 +1,162 @@
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import mock_orders
+import order_sources
+import rfm_engine
+import rfm_parallel
+import rfm_state
+
+# ---------------------------------------------------------
+# [RFM 計算效能測試]
+# 以 mock_orders 產生的訂單比較：
+# - legacy：原本 rfm_analytics_app.calculate_rfm 的寫法 (每個客戶一次 lambda、apply(axis=1) 分群、字串組合 RFM_Score)
+# - engine：rfm_engine.calculate_rfm (bincount 聚合 + np.select 規則表)
+# 並確認兩者的 R/F/M、分數、RFM_Score 與客群完全一致
+# --fractional：金額改為含小數 (到分) 並加入少量缺值，另確認其他計算路徑 (CSV / Parquet / SQLite 來源、
+#   rfm_parallel、rfm_state) 也保留小數並略過缺值；Monetary 以相對誤差 1e-9 比較
+#   (groupby().sum() 以補償加總累加浮點數，與 bincount 的最後幾位可能不同)，分數與客群仍須完全一致
+# 執行: python bench_rfm.py --customers 1000000 10000000 --orders-per-customer 5
+#       python bench_rfm.py --customers 100000 --fractional
+# ---------------------------------------------------------
+
+
+def legacy_calculate_rfm(df):
+    """原本的 calculate_rfm (效能比較基準，不要在應用中使用)"""
+    snapshot_date = df['OrderDate'].max() + datetime.timedelta(days=1)
+    rfm = df.groupby('CustomerID', observed=True).agg({
+        'OrderDate': lambda x: (snapshot_date - x.max()).days,
+        'CustomerID': 'count',
+        'Amount': 'sum'
+    })
+    rfm.rename(columns={'OrderDate': 'Recency', 'CustomerID': 'Frequency', 'Amount': 'Monetary'}, inplace=True)
+    rfm['R_Score'] = pd.qcut(rfm['Recency'], 5, labels=[5, 4, 3, 2, 1])
+    rfm['F_Score'] = pd.qcut(rfm['Frequency'].rank(method='first'), 5, labels=[1, 2, 3, 4, 5])
+    rfm['M_Score'] = pd.qcut(rfm['Monetary'], 5, labels=[1, 2, 3, 4, 5])
+    rfm['R_Score'] = rfm['R_Score'].astype(int)
+    rfm['F_Score'] = rfm['F_Score'].astype(int)
+    rfm['M_Score'] = rfm['M_Score'].astype(int)
+    rfm['RFM_Score'] = rfm['R_Score'].astype(str) + rfm['F_Score'].astype(str) + rfm['M_Score'].astype(str)
+
+    def segment_customer(row):
+        r, f, m = row['R_Score'], row['F_Score'], row['M_Score']
+        if r >= 4 and f >= 4 and m >= 4:
+            return "🏆 VIP客戶"
+        elif r >= 3 and f >= 3 and m >= 3:
+            return "💎 忠誠客戶"
+        elif r >= 4 and f == 1:
+            return "🌱 新進潛力客戶"
+        elif r <= 2 and f >= 4:
+            return "⚠️ 流失預警客戶"
+        elif r <= 2 and f <= 2:
+            return "💤 沉睡/流失客戶"
+        else:
+            return "🙂 一般挽留客戶"
+
+    rfm['Customer_Segment'] = rfm.apply(segment_customer, axis=1)
+    return rfm
+
+
+def same_result(legacy, engine):
+    """legacy 與 engine 的結果是否一致 (RFM_Score 比較整數值，客群比較字串；Monetary 比較整數或浮點數與相對誤差)"""
+    columns = ['Recency', 'Frequency', 'R_Score', 'F_Score', 'M_Score']
+    return (np.array_equal(legacy.index.astype(str), engine.index.astype(str))
+            and all(np.array_equal(legacy[c].to_numpy(), engine[c].to_numpy()) for c in columns)
+            and legacy['Monetary'].dtype.kind == engine['Monetary'].dtype.kind
+            and np.allclose(legacy['Monetary'].to_numpy(), engine['Monetary'].to_numpy(), rtol=1e-9, atol=0)
+            and np.array_equal(legacy['RFM_Score'].astype(int).to_numpy(), engine['RFM_Score'].to_numpy())
+            and np.array_equal(legacy['Customer_Segment'].to_numpy(dtype=object),
+                               engine['Customer_Segment'].to_numpy(dtype=object)))
+
+
+def fractional_orders(orders, missing=0.001, seed=0):
+    """金額加上 0.00-0.99 的小數，並把約 missing 比例的金額設為缺值"""
+    rng = np.random.default_rng(seed)
+    amounts = orders['Amount'].to_numpy() + rng.integers(0, 100, len(orders)) / 100
+    amounts[rng.random(len(orders)) < missing] = np.nan
+    return orders.assign(Amount=amounts)
+
+
+def other_paths(orders):
+    """同一批訂單經其他計算路徑的結果：訂單來源 (寫成暫存檔)、分片平行聚合、增量狀態"""
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        paths = {name: os.path.join(folder, f"orders.{name}") for name in ("csv", "parquet", "db")}
+        orders.to_csv(paths["csv"], index=False)
+        orders.to_parquet(paths["parquet"], index=False)
+        with sqlite3.connect(paths["db"]) as conn:
+            orders.astype({"CustomerID": str}).assign(OrderDate=orders['OrderDate'].dt.strftime("%Y-%m-%d")) \
+                .to_sql("orders", conn, index=False)
+        for name, path in paths.items():
+            results[name] = rfm_engine.calculate_rfm(path)
+        results["read_orders"] = rfm_engine.calculate_rfm(order_sources.read_orders(paths["db"]))
+    results["parallel"] = rfm_parallel.calculate_rfm(orders, workers=2, min_parallel=0)
+    state = rfm_state.RFMState(path=None)
+    state.update(orders)
+    # 增量狀態的分數來自草圖 (見 rfm_state)，這裡只比較依客戶編號排序後的 R/F/M 數值
+    results["state"] = state.score().sort_index()
+    return results
+
+
+def same_values(legacy, other):
+    """只比較 Recency / Frequency / Monetary (Monetary 比較整數或浮點數與相對誤差)"""
+    return (np.array_equal(legacy.index.astype(str), other.index.astype(str))
+            and np.array_equal(legacy['Recency'].to_numpy(), other['Recency'].to_numpy())
+            and np.array_equal(legacy['Frequency'].to_numpy(), other['Frequency'].to_numpy())
+            and legacy['Monetary'].dtype.kind == other['Monetary'].dtype.kind
+            and np.allclose(legacy['Monetary'].to_numpy(), other['Monetary'].to_numpy(), rtol=1e-9, atol=0))
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RFM 計算效能測試 (原本寫法 vs rfm_engine)")
+    parser.add_argument("--customers", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--orders-per-customer", type=int, default=5)
+    parser.add_argument("--legacy-max", type=int, default=10_000_000, help="客戶數超過此值時略過原本寫法")
+    parser.add_argument("--fractional", action="store_true", help="金額含小數與缺值，並確認其他計算路徑的結果")
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    results = []
+    for customers in args.customers:
+        orders = mock_orders.generate_orders(customers * args.orders_per_customer, n_customers=customers)
+        if args.fractional:
+            orders = fractional_orders(orders)
+        engine, engine_seconds = timed(rfm_engine.calculate_rfm, orders)
+        result = {"customers": len(engine), "orders": len(orders), "engine_seconds": engine_seconds}
+        line = f"客戶 {len(engine):>11,} / 訂單 {len(orders):>11,}：engine {engine_seconds:7.2f}s"
+        if customers <= args.legacy_max:
+            legacy, legacy_seconds = timed(legacy_calculate_rfm, orders)
+            result.update(legacy_seconds=legacy_seconds, identical=bool(same_result(legacy, engine)))
+            line += (f"，legacy {legacy_seconds:7.1f}s ({legacy_seconds / engine_seconds:,.0f}x)，"
+                     f"結果一致: {result['identical']}")
+            if args.fractional:
+                checks = {name: (same_values if name == "state" else same_result)(legacy, other)
+                          for name, other in other_paths(orders).items()}
+                result["paths_identical"] = checks
+                line += "\n  其他路徑一致: " + "，".join(f"{name} {ok}" for name, ok in checks.items())
+            del legacy
+        print(line)
+        results.append(result)
+        del orders, engine
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
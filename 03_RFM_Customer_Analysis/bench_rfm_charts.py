@@ -0,0 +1,83 @@
+import argparse
+import json
+import time
+
+import mock_orders
+import rfm_charts
+import rfm_engine
+import rfm_results
+
+# ---------------------------------------------------------
+# [價值分佈矩陣的繪製成本]
+# - 逐點：sns.scatterplot 畫出每位客戶 (hue + size)，原本的做法
+# - 分箱：RFMBins 聚合 (Recency, Frequency) 網格後以 pcolormesh 畫熱度圖 (三種著色，及疊加分層抽樣)
+# - 快取命中：rfm_charts.render_png 直接回傳 PNG bytes
+# 每種方式記錄繪製 + 存成 PNG 的時間與 PNG 大小；--save-dir 可另存 PNG 以目視比對
+# 執行: python bench_rfm_charts.py --customers 1000000 --orders-per-customer 5
+# ---------------------------------------------------------
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def load_plotting():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="價值分佈矩陣：逐點散佈圖 vs 分箱熱度圖 vs 快取命中")
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--orders-per-customer", type=int, default=5)
+    parser.add_argument("--scatter-max", type=int, default=1_000_000, help="客戶數超過此值時不量測逐點散佈圖")
+    parser.add_argument("--save-dir", help="另存各張 PNG 的資料夾")
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    orders = mock_orders.generate_orders(args.customers * args.orders_per_customer, n_customers=args.customers)
+    rfm = rfm_engine.calculate_rfm(orders)
+    rfm['Customer_Segment'] = rfm['Customer_Segment'].cat.remove_unused_categories()
+    result = rfm_results.RFMResult(rfm)
+    data_key = rfm_results.orders_fingerprint(orders)
+    (plt, sns), import_seconds = timed(load_plotting)
+    bins, bin_seconds = timed(lambda: rfm_charts.RFMBins(rfm))
+    sample, sample_seconds = timed(lambda: rfm_charts.stratified_sample(result))
+    print(f"客戶 {len(rfm):,} / 訂單 {len(orders):,}；載入圖表套件 {import_seconds:.2f}s，"
+          f"分箱 {bin_seconds * 1000:.0f}ms ({bins.counts.shape[0]}x{bins.counts.shape[1]} 格)，"
+          f"分層抽樣 {sample_seconds * 1000:.0f}ms ({len(sample):,} 人)")
+
+    modes = {
+        "binned_count": lambda: rfm_charts.draw_binned(plt, sns, bins, "count"),
+        "binned_monetary": lambda: rfm_charts.draw_binned(plt, sns, bins, "monetary"),
+        "binned_segment": lambda: rfm_charts.draw_binned(plt, sns, bins, "segment"),
+        "binned_count_sample": lambda: rfm_charts.draw_binned(plt, sns, bins, "count", sample),
+    }
+    if len(rfm) <= args.scatter_max:
+        modes = dict(scatter=lambda: rfm_charts.draw_scatter(plt, sns, rfm), **modes)
+
+    report = {"customers": len(rfm), "orders": len(orders), "bin_seconds": bin_seconds,
+              "sample_seconds": sample_seconds, "modes": {}}
+    print(f"{'方式':<22}{'繪製 + PNG':>12}{'PNG 大小':>12}{'快取命中':>12}")
+    for name, draw in modes.items():
+        key = rfm_charts.figure_key(data_key, name)
+        png, seconds = timed(lambda: rfm_charts.render_png(key, draw))
+        _, hit_seconds = timed(lambda: rfm_charts.render_png(key, draw))
+        report["modes"][name] = {"seconds": seconds, "png_bytes": len(png), "hit_seconds": hit_seconds}
+        print(f"{name:<22}{seconds:>11.2f}s{len(png) / 1024:>10,.0f}KB{hit_seconds * 1e6:>10.1f}us")
+        if args.save_dir:
+            with open(f"{args.save_dir}/{name}.png", "wb") as f:
+                f.write(png)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+import mock_orders
+import rfm_engine
+import rfm_parallel
+
+# ---------------------------------------------------------
+# [分片平行 RFM 的擴展性測試]
+# 以相同的訂單比較單行程 rfm_engine 與 rfm_parallel (workers = 1..N)：
+# - 聚合：customer_totals vs sharded_totals (分片排列 + 共用記憶體 + pool 平行聚合)
+# - 完整計算：聚合 + 全體客戶打分
+# pool 先以一次完整計算暖機 (spawn 啟動 worker 的時間不計入)，每種設定量測 repeat 次取中位數，
+# 並確認結果與單行程完全一致
+# 執行: python bench_rfm_parallel.py --orders 20000000 --customers 2000000 --workers 1 2 4 8
+# ---------------------------------------------------------
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def median_time(repeat, func, *args, **kwargs):
+    runs = [timed(func, *args, **kwargs) for _ in range(repeat)]
+    return runs[-1][0], statistics.median(seconds for _, seconds in runs)
+
+
+def same_result(a, b):
+    columns = ['Recency', 'Frequency', 'Monetary', 'RFM_Score', 'Customer_Segment']
+    return a.index.equals(b.index) and all(np.array_equal(a[c].to_numpy(), b[c].to_numpy()) for c in columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分片平行 RFM 的擴展性測試")
+    parser.add_argument("--orders", type=int, default=20_000_000)
+    parser.add_argument("--customers", type=int, default=2_000_000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, rfm_parallel.default_workers()}))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    orders = mock_orders.generate_orders(args.orders, n_customers=args.customers)
+    print(f"訂單 {len(orders):,} / 客戶 {args.customers:,} / 可用核心 {rfm_parallel.default_workers()}")
+    _, baseline_totals = median_time(args.repeat, rfm_engine.customer_totals, orders)
+    expected, baseline_full = median_time(args.repeat, rfm_engine.calculate_rfm, orders)
+    results = [{"workers": 0, "totals_seconds": baseline_totals, "full_seconds": baseline_full, "identical": True}]
+    print(f"{'設定':<12}{'聚合':>9}{'完整計算':>10}{'加速 (完整)':>12}  結果一致")
+    print(f"{'單行程':<12}{baseline_totals:>8.2f}s{baseline_full:>9.2f}s{1:>11.2f}x  -")
+
+    for workers in args.workers:
+        _, startup = timed(rfm_parallel.calculate_rfm, orders, workers=workers)   # 暖機：啟動 pool
+        _, totals_seconds = median_time(args.repeat, rfm_parallel.sharded_totals, orders, workers=workers)
+        result, full_seconds = median_time(args.repeat, rfm_parallel.calculate_rfm, orders, workers=workers)
+        identical = bool(same_result(expected, result))
+        results.append({"workers": workers, "startup_seconds": startup, "totals_seconds": totals_seconds,
+                        "full_seconds": full_seconds, "identical": identical})
+        print(f"{f'workers={workers}':<12}{totals_seconds:>8.2f}s{full_seconds:>9.2f}s"
+              f"{baseline_full / full_seconds:>11.2f}x  {identical}")
+    rfm_parallel.shutdown_pool()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
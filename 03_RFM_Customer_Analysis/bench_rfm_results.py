@@ -0,0 +1,79 @@
+import argparse
+import json
+import statistics
+import time
+
+import mock_orders
+import rfm_engine
+import rfm_results
+
+# ---------------------------------------------------------
+# [切換客群時每次 rerun 的成本]
+# - 原本：每次 rerun 重算 calculate_rfm，再以字串比對篩選客群、str.contains 算 VIP 佔比、
+#   value_counts 算各客群人數、sort_values 排序客戶名單
+# - 快取：RFM 結果依指紋快取，rerun 只查 KPI / 各客群人數，並依客群索引取出該客群的列
+# 另列出一次性的成本：訂單指紋、計算 RFM 與建立 RFMResult (客群索引 + KPI)
+# 執行: python bench_rfm_results.py --customers 1000000 --orders-per-customer 5
+# ---------------------------------------------------------
+
+
+def timed(func, repeat=1):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - start)
+    return result, statistics.median(runs)
+
+
+def legacy_rerun(orders, segment):
+    rfm = rfm_engine.calculate_rfm(orders)
+    vip_share = len(rfm[rfm['Customer_Segment'].str.contains('VIP')]) / len(rfm)
+    counts = rfm['Customer_Segment'].value_counts()
+    target = rfm[rfm['Customer_Segment'] == segment]
+    table = rfm.sort_values(by='RFM_Score', ascending=False)
+    return vip_share, counts, target, table
+
+
+def cached_rerun(cache, key, segment):
+    result = cache[key]
+    return result.kpis, result.segment_counts, result.segment(segment)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="切換客群時每次 rerun 的成本 (原本 vs 快取 + 客群索引)")
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--orders-per-customer", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    orders = mock_orders.generate_orders(args.customers * args.orders_per_customer, n_customers=args.customers)
+    data_key, fingerprint_seconds = timed(lambda: rfm_results.orders_fingerprint(orders))
+    rfm, rfm_seconds = timed(lambda: rfm_engine.calculate_rfm(orders))
+    result, index_seconds = timed(lambda: rfm_results.RFMResult(rfm))
+    cache = {(data_key, rfm_results.config_fingerprint()): result}
+    key = (data_key, rfm_results.config_fingerprint())
+
+    report = {"customers": len(rfm), "orders": len(orders), "fingerprint_seconds": fingerprint_seconds,
+              "rfm_seconds": rfm_seconds, "index_seconds": index_seconds, "segments": {}}
+    print(f"客戶 {len(rfm):,} / 訂單 {len(orders):,}")
+    print(f"一次性：訂單指紋 {fingerprint_seconds:.2f}s，計算 RFM {rfm_seconds:.2f}s，"
+          f"建立客群索引 + KPI {index_seconds:.2f}s")
+    print(f"{'客群':<16}{'人數':>10}{'原本 rerun':>12}{'快取 rerun':>12}{'加速':>10}")
+    for segment, count in result.segment_counts.items():
+        (_, _, legacy_target, _), legacy_seconds = timed(lambda: legacy_rerun(orders, segment), max(1, args.repeat // 2))
+        (_, _, target), cached_seconds = timed(lambda: cached_rerun(cache, key, segment), args.repeat)
+        assert legacy_target.index.sort_values().equals(target.index.sort_values())
+        report["segments"][segment] = {"customers": int(count), "legacy_seconds": legacy_seconds,
+                                       "cached_seconds": cached_seconds}
+        print(f"{segment:<16}{count:>10,}{legacy_seconds:>11.3f}s{cached_seconds * 1000:>10.2f}ms"
+              f"{legacy_seconds / cached_seconds:>9,.0f}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+import mock_orders
+import rfm_engine
+
+# ---------------------------------------------------------
+# [超過記憶體的 RFM 來源：峰值記憶體與耗時]
+# 每種方式在全新的子行程中執行一次 rfm_engine.calculate_rfm，回報峰值 RSS (ru_maxrss)：
+# - memory：pd.read_parquet 載入整張訂單表後計算 (原本的作法，作為基準)
+# - parquet：order_sources 逐批讀取 Parquet、合併每批的客戶聚合
+# - sqlite：聚合以 GROUP BY 交給 SQLite
+# 資料檔不存在時先以 mock_orders 產生 (5,000 萬筆 SQLite 約需數分鐘)
+# 執行: python bench_rfm_sources.py --orders 50000000 --customers 1000000
+# ---------------------------------------------------------
+
+MODES = ["memory", "parquet", "sqlite"]
+
+
+def run_mode(mode, source):
+    """在目前行程中計算一次 RFM，回傳耗時、客戶數與峰值 RSS"""
+    start = time.perf_counter()
+    if mode == "memory":
+        rfm = rfm_engine.calculate_rfm(pd.read_parquet(source))
+    else:
+        rfm = rfm_engine.calculate_rfm(source)
+    return {
+        "seconds": time.perf_counter() - start,
+        "customers": len(rfm),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "vip_share": float((rfm['Customer_Segment'] == rfm_engine.SEGMENT_RULES[0][0]).mean()),
+    }
+
+
+def measure(mode, source):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, source],
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="超過記憶體的 RFM 來源：峰值記憶體與耗時")
+    parser.add_argument("--orders", type=int, default=50_000_000)
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--parquet", default="orders_bench.parquet")
+    parser.add_argument("--sqlite", default="orders_bench.db")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "SOURCE"), help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(*args.child)))
+        return
+
+    sources = {"memory": args.parquet, "parquet": args.parquet, "sqlite": args.sqlite}
+    for path in {sources[mode] for mode in args.modes}:
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            mock_orders.write_orders(path, args.orders, n_customers=args.customers)
+            print(f"已產生 {path} ({args.orders:,} 筆，{time.perf_counter() - start:.0f}s)")
+
+    results = {}
+    print(f"{'方式':<10}{'耗時':>10}{'峰值 RSS':>12}{'客戶數':>12}{'VIP 佔比':>10}")
+    for mode in args.modes:
+        result = results[mode] = measure(mode, sources[mode])
+        if "error" in result:
+            print(f"{mode:<10}失敗：{result['error']}")
+            continue
+        print(f"{mode:<10}{result['seconds']:>9.1f}s{result['peak_rss_mb']:>9,.0f} MB"
+              f"{result['customers']:>12,}{result['vip_share']:>10.2%}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import mock_orders
+import rfm_engine
+import rfm_state
+
+# ---------------------------------------------------------
+# [增量 RFM 狀態測試]
+# 模擬「歷史訂單已併入狀態，今天又來一批新訂單」：
+# - 效能：rfm_state 併入新批次 + 以草圖打分 vs rfm_engine 以全部歷史訂單重算
+# - 精確度：草圖分界與精確分位數 (np.quantile) 的相對誤差，以及 R/F/M 分數、客群與精確結果不同的客戶比例
+# - 增量檢查：訂單 (含退款的負金額、DAY_ORIGIN 之前的交易日) 打亂後分成多批併入，
+#   R/F/M 數值與 F 分數必須與 rfm_engine 完全相同 (同次數客戶依客戶編號決定名次)
+# 每位客戶的訂單數越多，Monetary 越容易超過 LINEAR_MAX 而使用對數桶 (近似)
+# 執行: python bench_rfm_state.py --customers 1000000 --orders-per-customer 20
+# ---------------------------------------------------------
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def edge_errors(state, rfm):
+    """草圖分界相對精確分位數的最大相對誤差"""
+    edges = state.boundaries()
+    return {column: float(np.max(np.abs(edges[column] / np.quantile(rfm[column], rfm_state.QUINTILES) - 1)))
+            for column in edges}
+
+
+def mismatch_rates(result, exact):
+    exact = exact.reindex(result.index)
+    columns = ['R_Score', 'F_Score', 'M_Score', 'Customer_Segment']
+    return {column: float((result[column].to_numpy(dtype=object) != exact[column].to_numpy(dtype=object)).mean())
+            for column in columns}
+
+
+def check_incremental(n_orders=200_000, n_customers=20_000, batches=10):
+    """分批併入 (含負金額與 DAY_ORIGIN 之前的交易日) 後與 rfm_engine 比對；回傳各欄位與精確結果相同的比例"""
+    rng = np.random.default_rng(0)
+    orders = mock_orders.generate_orders(n_orders, n_customers=n_customers)
+    orders['Amount'] = orders['Amount'].astype(np.int64)
+    picked = rng.choice(n_orders, n_orders // 5, replace=False)
+    refunds, early = picked[:len(picked) // 2], picked[len(picked) // 2:]
+    orders.loc[refunds, 'Amount'] *= -3
+    orders.loc[early, 'OrderDate'] = (pd.Timestamp(rfm_state.DAY_ORIGIN) - pd.Timedelta(days=400)
+                                      + pd.to_timedelta(rng.integers(0, 800, len(early)), unit='D'))
+
+    state = rfm_state.RFMState(None)
+    shuffled = orders.sample(frac=1, random_state=1)
+    bounds = np.linspace(0, n_orders, batches + 1).astype(int)
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        state.update(shuffled.iloc[start:stop])
+    result, exact = state.score(), rfm_engine.calculate_rfm(orders)
+    assert result.index.equals(exact.index), "客戶順序與 rfm_engine 不同"
+    agreement = {column: float((result[column].to_numpy(dtype=object) == exact[column].to_numpy(dtype=object)).mean())
+                 for column in ['Recency', 'Frequency', 'Monetary', 'R_Score', 'F_Score', 'M_Score']}
+    for column in ['Recency', 'Frequency', 'Monetary', 'F_Score']:
+        assert agreement[column] == 1, f"{column} 與 rfm_engine 不同：{agreement[column]:.2%} 相同"
+    return agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量 RFM 狀態：效能與精確度")
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--orders-per-customer", type=int, default=20)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--batch-orders", type=int, default=100_000, help="今天新進的訂單數")
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    today = datetime.date.today()
+    history = mock_orders.generate_orders(args.customers * args.orders_per_customer, n_customers=args.customers,
+                                          days=args.days - 1, end=today - datetime.timedelta(days=1))
+    batch = mock_orders.generate_orders(args.batch_orders, n_customers=args.customers, days=1, end=today, seed=7)
+    report = {"customers": args.customers, "history_orders": len(history), "batch_orders": len(batch)}
+    report["incremental_agreement"] = check_incremental()
+    print("增量檢查 (分批併入、含負值) 與精確結果相同的比例："
+          + "，".join(f"{k} {v:.2%}" for k, v in report["incremental_agreement"].items()))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state = rfm_state.RFMState(os.path.join(tmp, "rfm_state.db"))
+        _, report["initial_load_seconds"] = timed(state.update, history)
+        _, report["reload_seconds"] = timed(rfm_state.RFMState, state.path)
+        state.score()   # 首次打分會建立客戶 Index 快取，之後的批次沿用
+        _, report["batch_update_seconds"] = timed(state.update, batch)
+        memory_state = rfm_state.RFMState(None)
+        memory_state.update(history)
+        _, report["batch_update_memory_seconds"] = timed(memory_state.update, batch)
+    result, report["score_seconds"] = timed(state.score)
+
+    orders = pd.concat([history, batch], ignore_index=True)
+    del history
+    exact, report["full_recompute_seconds"] = timed(rfm_engine.calculate_rfm, orders)
+    del orders
+    report["edge_relative_error"] = edge_errors(state, exact)
+    report["mismatch_rate"] = mismatch_rates(result, exact)
+
+    print(f"客戶 {len(exact):,} / 歷史訂單 {report['history_orders']:,} / 新批次 {report['batch_orders']:,}")
+    print(f"首次併入全部歷史 (含 SQLite)：{report['initial_load_seconds']:.2f}s，"
+          f"重新啟動載入狀態：{report['reload_seconds']:.2f}s")
+    print(f"併入新批次：SQLite {report['batch_update_seconds']:.3f}s / 只在記憶體 "
+          f"{report['batch_update_memory_seconds']:.3f}s；以草圖打分：{report['score_seconds']:.2f}s")
+    incremental = report['batch_update_seconds'] + report['score_seconds']
+    print(f"全部歷史重算：{report['full_recompute_seconds']:.2f}s (增量 {incremental:.2f}s，"
+          f"{report['full_recompute_seconds'] / incremental:.1f}x)")
+    print("分界最大相對誤差：" + "，".join(f"{k} {v:.4%}" for k, v in report["edge_relative_error"].items())
+          + f" (上限 {rfm_state.RELATIVE_ACCURACY:.1%})")
+    print("與精確結果不同的客戶比例：" + "，".join(f"{k} {v:.4%}" for k, v in report["mismatch_rate"].items()))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
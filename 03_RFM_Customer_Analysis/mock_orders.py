@@ -0,0 +1,135 @@
+import argparse
+import datetime
+import sqlite3
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------
+# 模擬交易資料產生器 (向量化)
+# 一次以 numpy 陣列產生整批訂單，不逐筆建立 Python 物件：
+# - 客戶：整數代碼 (0..n_customers-1)，DataFrame 中為 categorical ("C001" ... 只存一份)
+# - 日期：datetime64 陣列運算 (起始日 + 天數偏移)，不必再 pd.to_datetime 解析
+# - 金額：Gamma 分佈 (大部分落在 500-3000，少數大額) + 100，int32
+# - 季節性：依每天的權重抽樣日期 (業務成長、週末、年度旺季)，預設為均勻分佈
+# 以 SeedSequence 為每個區塊產生獨立的亂數流，相同 seed 與區塊大小的結果可重現。
+# 超過記憶體的規模請用 iter_order_chunks() 逐塊處理，或以命令列寫成 Parquet / SQLite / CSV：
+# 執行: python mock_orders.py --rows 100000000 --customers 1000000 --out orders.parquet
+# ---------------------------------------------------------
+
+CHUNK_ROWS = 5_000_000       # 每個區塊的訂單數 (約 80 MB)
+SEASONALITY = {
+    "growth": 0.0,           # 最後一天相對第一天多出的交易比例 (例如 1.0 = 兩倍，模擬業務成長)
+    "weekend": 0.0,          # 週末 (六、日) 額外的交易比例
+    "yearly": 0.0,           # 年度旺季的振幅 (0~1)
+    "peak_day": 330,         # 旺季高峰為一年中的第幾天 (預設 11 月底)
+}
+
+
+@lru_cache(maxsize=8)
+def customer_ids(n_customers):
+    """客戶代碼 → 顯示用的客戶編號 (C001, C002, ...)"""
+    width = max(3, len(str(n_customers)))
+    return pd.Index([f"C{i:0{width}d}" for i in range(1, n_customers + 1)])
+
+
+def day_weights(start, days, seasonality=None):
+    """start 起 days 天每天的交易機率 (總和為 1)"""
+    params = dict(SEASONALITY, **(seasonality or {}))
+    dates = np.datetime64(start, "D") + np.arange(days)
+    weights = 1 + params["growth"] * np.arange(days) / max(days - 1, 1)
+    weekday = (dates.astype(np.int64) + 3) % 7            # 1970-01-01 為星期四 → 0 = 星期一
+    weights *= np.where(weekday >= 5, 1 + params["weekend"], 1.0)
+    day_of_year = (dates - dates.astype("datetime64[Y]")).astype(np.int64)
+    weights *= 1 + params["yearly"] * np.cos(2 * np.pi * (day_of_year - params["peak_day"]) / 365.25)
+    return weights / weights.sum()
+
+
+def generate_orders(n_rows=1000, n_customers=200, days=365, end=None, seasonality=None, seed=42):
+    """
+    產生 end (預設為今天，不含) 之前 days 天內的 n_rows 筆訂單
+    回傳 DataFrame：CustomerID (categorical)、OrderDate (datetime64)、Amount (int32)
+    seed 可為整數、SeedSequence 或 np.random.Generator
+    """
+    rng = np.random.default_rng(seed)
+    end = np.datetime64(end or datetime.date.today(), "D")
+    start = end - days
+
+    codes = rng.integers(0, n_customers, size=n_rows, dtype=np.int32)
+    if seasonality:
+        offsets = rng.choice(days, size=n_rows, p=day_weights(start, days, seasonality))
+    else:
+        offsets = rng.integers(0, days, size=n_rows)
+    amounts = rng.gamma(shape=2, scale=1000, size=n_rows).astype(np.int32) + 100
+
+    return pd.DataFrame({
+        "CustomerID": pd.Categorical.from_codes(codes, categories=customer_ids(n_customers)),
+        "OrderDate": (start + offsets.astype("timedelta64[D]")).astype("datetime64[ns]"),
+        "Amount": amounts,
+    })
+
+
+def iter_order_chunks(n_rows, chunk_rows=CHUNK_ROWS, seed=42, **options):
+    """分塊產生 n_rows 筆訂單 (每塊為一個 DataFrame)，options 同 generate_orders"""
+    n_chunks = -(-n_rows // chunk_rows)
+    for i, child in enumerate(np.random.SeedSequence(seed).spawn(n_chunks)):
+        yield generate_orders(min(chunk_rows, n_rows - i * chunk_rows), seed=child, **options)
+
+
+def write_orders(path, n_rows, chunk_rows=CHUNK_ROWS, table_name="orders", **options):
+    """
+    逐塊寫出模擬訂單 (.parquet、.db / .sqlite 的 table_name 資料表或 .csv)，
+    記憶體用量只與區塊大小有關；回傳寫入筆數
+    """
+    parquet = path.endswith(".parquet")
+    sqlite = path.endswith((".db", ".sqlite"))
+    if parquet:
+        import pyarrow as pa  # 延遲載入：只有輸出 Parquet 時需要
+        import pyarrow.parquet as pq
+    written = 0
+    writer = None
+    try:
+        for chunk in iter_order_chunks(n_rows, chunk_rows, **options):
+            if parquet:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            elif sqlite:
+                writer = writer or sqlite3.connect(path)
+                # 客戶編號存成文字、日期存成 ISO 文字 (與一般交易系統匯出的資料表相同)
+                chunk.astype({"CustomerID": str}).to_sql(table_name, writer, index=False,
+                                                         if_exists="append" if written else "replace")
+            else:
+                chunk.to_csv(path, mode="a" if written else "w", header=not written, index=False)
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="產生大規模模擬訂單 (Parquet / SQLite / CSV)")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--customers", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--growth", type=float, default=SEASONALITY["growth"])
+    parser.add_argument("--weekend", type=float, default=SEASONALITY["weekend"])
+    parser.add_argument("--yearly", type=float, default=SEASONALITY["yearly"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="orders.parquet", help="輸出檔 (.parquet、.db 或 .csv)")
+    args = parser.parse_args()
+
+    seasonality = {"growth": args.growth, "weekend": args.weekend, "yearly": args.yearly}
+    start = time.perf_counter()
+    written = write_orders(args.out, args.rows, args.chunk_rows, n_customers=args.customers, days=args.days,
+                           seasonality=seasonality if any(seasonality.values()) else None, seed=args.seed)
+    seconds = time.perf_counter() - start
+    print(f"已寫入 {written:,} 筆訂單 → {args.out} ({seconds:.1f}s，{written / seconds:,.0f} 筆/秒)")
+
+
+if __name__ == "__main__":
+    main()
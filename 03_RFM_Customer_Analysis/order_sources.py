@@ -0,0 +1,169 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import rfm_engine
+
+# ---------------------------------------------------------
+# 超過記憶體的訂單來源 (out-of-core)：只產生每位客戶一列的聚合結果，不載入整張訂單表
+# - SQLite：MAX / COUNT / SUM 以 GROUP BY 交給 SQLite 計算 (排序溢出時寫入暫存檔，不佔用 Python 記憶體)
+#   訂單表欄位為 CustomerID (文字)、OrderDate (ISO 日期文字)、Amount (整數或含小數)；
+#   若有 (CustomerID, OrderDate, Amount) 索引，SQLite 可直接依索引順序聚合，不必排序
+#   結果依 CustomerID 排序 (與 Parquet / CSV 來源相同)：F 分數的 rank(method='first') 以列順序決定同分名次，
+#   GROUP BY 本身不保證輸出順序
+# - Parquet (單一檔案或資料夾)：以 pyarrow 逐批讀取，客戶編號的 Arrow 字典對應到累計的客戶代碼後，
+#   以 bincount / maximum.at 併入累計結果；記憶體只與批次大小及客戶數有關
+# - CSV：逐塊讀取，每塊以 rfm_engine.customer_totals 聚合後併入累計結果 (最後交易日取最大、次數與金額相加)
+# 記憶體量測見 bench_rfm_sources.py
+# ---------------------------------------------------------
+
+BATCH_ROWS = 1_000_000
+SQL_CHUNK_ROWS = 100_000
+CSV_CHUNK_ROWS = 1_000_000
+COLUMNS = ["CustomerID", "OrderDate", "Amount"]
+
+SQL_TOTALS = """
+    SELECT CustomerID, MAX(OrderDate) AS LastOrder, COUNT(*) AS Frequency, COALESCE(SUM(Amount), 0) AS Monetary
+    FROM "{table}"
+    WHERE CustomerID IS NOT NULL
+    GROUP BY CustomerID
+    ORDER BY CustomerID
+"""
+
+
+def _empty_totals():
+    return pd.DataFrame({'LastOrder': pd.Series(dtype='datetime64[ns]'), 'Frequency': pd.Series(dtype=np.int64),
+                         'Monetary': pd.Series(dtype=np.int64)}, index=pd.Index([], name='CustomerID'))
+
+
+def sqlite_totals(path, table="orders", chunk_rows=SQL_CHUNK_ROWS):
+    """
+    SQLite 訂單表 → 每位客戶的 LastOrder / Frequency / Monetary (聚合在 SQLite 內完成)
+    結果逐塊讀取並立即轉成精簡型別，不會同時持有整個結果集的 Python 物件
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        chunks = []
+        for chunk in pd.read_sql_query(SQL_TOTALS.format(table=table), conn, chunksize=chunk_rows):
+            chunks.append(pd.DataFrame({
+                'CustomerID': chunk['CustomerID'].astype("string[pyarrow]"),
+                'LastOrder': pd.to_datetime(chunk['LastOrder'], format="ISO8601"),
+                'Frequency': chunk['Frequency'].astype(np.int64),
+                # SUM 在金額全為整數時回傳整數，含小數時回傳浮點數 (與 groupby().sum() 相同)
+                'Monetary': pd.to_numeric(chunk['Monetary']),
+            }))
+    finally:
+        conn.close()
+    if not chunks:
+        return _empty_totals()
+    return pd.concat(chunks, ignore_index=True).set_index('CustomerID')
+
+
+def parquet_totals(path, batch_rows=BATCH_ROWS):
+    """
+    Parquet 訂單 → 每位客戶的 LastOrder / Frequency / Monetary (逐批聚合)
+    客戶編號以 Arrow 字典編碼處理：每批只把字典對應到累計的客戶代碼 (相同字典沿用上一批的對應)，
+    訂單本身只做整數 bincount / maximum.at，不建立任何 pandas 字串物件
+    """
+    import pyarrow as pa  # 延遲載入：只有 Parquet 來源需要
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    # pre_buffer 會把讀過的欄位區塊留在快取中 (5,000 萬筆時峰值多約 450 MB)；預讀的批次越多峰值也越高，逐一讀取即可
+    parquet_format = ds.ParquetFileFormat(default_fragment_scan_options=ds.ParquetFragmentScanOptions(pre_buffer=False))
+    dataset = ds.dataset(path, format=parquet_format)
+    customers = pd.Index([], dtype=object)
+    last_order = np.zeros(0, dtype=np.int64)
+    frequency = np.zeros(0, dtype=np.int64)
+    # 整數金額累加成 int64，其餘 (含小數) 累加成 float64；缺值以 0 計入 (與 rfm_engine.amount_values 相同)
+    integer_amounts = pa.types.is_integer(dataset.schema.field('Amount').type)
+    monetary = np.zeros(0, dtype=np.int64 if integer_amounts else np.float64)
+    dictionary, mapping = None, None
+
+    for batch in dataset.to_batches(columns=COLUMNS, batch_size=batch_rows, batch_readahead=1, fragment_readahead=1):
+        ids = batch.column('CustomerID')
+        if not pa.types.is_dictionary(ids.type):
+            ids = pc.dictionary_encode(ids)
+        if dictionary is None or not ids.dictionary.equals(dictionary):
+            dictionary = ids.dictionary
+            mapping = customers.get_indexer(dictionary.to_pandas())
+            new = mapping < 0
+            if new.any():
+                # 第一次出現的客戶附加在最後
+                mapping[new] = np.arange(len(customers), len(customers) + new.sum())
+                customers = customers.append(pd.Index(dictionary.filter(pa.array(new)).to_pandas()))
+                grow = len(customers) - len(frequency)
+                last_order = np.concatenate([last_order, np.full(grow, np.iinfo(np.int64).min)])
+                frequency = np.concatenate([frequency, np.zeros(grow, dtype=np.int64)])
+                monetary = np.concatenate([monetary, np.zeros(grow, dtype=monetary.dtype)])
+
+        codes = mapping[pc.fill_null(ids.indices, 0).to_numpy()]
+        dates = batch.column('OrderDate').cast(pa.timestamp('ns')).to_numpy().view(np.int64)
+        amounts = batch.column('Amount')
+        amounts = pc.fill_null(amounts if integer_amounts else amounts.cast(pa.float64()), 0).to_numpy()
+        if ids.null_count:
+            # 缺少客戶編號的訂單不列入 (與 groupby 相同)
+            valid = ids.is_valid().to_numpy(zero_copy_only=False)
+            codes, dates, amounts = codes[valid], dates[valid], amounts[valid]
+        frequency += np.bincount(codes, minlength=len(customers))
+        monetary += rfm_engine.sum_amounts(codes, amounts, len(customers))
+        np.maximum.at(last_order, codes, dates)
+
+    observed = frequency > 0
+    return pd.DataFrame({
+        'LastOrder': last_order[observed].view('datetime64[ns]'),
+        'Frequency': frequency[observed],
+        'Monetary': monetary[observed],
+    }, index=pd.Index(customers[observed], name='CustomerID')).sort_index()
+
+
+def csv_totals(path, chunk_rows=CSV_CHUNK_ROWS):
+    """CSV 訂單 → 每位客戶的 LastOrder / Frequency / Monetary (逐塊聚合，記憶體只與區塊大小及客戶數有關)"""
+    totals = None
+    reader = pd.read_csv(path, usecols=COLUMNS, chunksize=chunk_rows, dtype={'CustomerID': "string[pyarrow]"},
+                         parse_dates=['OrderDate'])
+    for chunk in reader:
+        part = rfm_engine.customer_totals(chunk)
+        if totals is not None:
+            part = pd.concat([totals, part]).groupby(level=0).agg(
+                {'LastOrder': 'max', 'Frequency': 'sum', 'Monetary': 'sum'})
+        totals = part
+    if totals is None:
+        return _empty_totals()
+    return totals.astype({'LastOrder': 'datetime64[ns]'})
+
+
+def source_totals(source, **options):
+    """
+    依副檔名選擇來源：.db / .sqlite → SQLite (options: table, chunk_rows)、.csv → CSV (options: chunk_rows)，
+    其餘視為 Parquet (options: batch_rows)
+    """
+    if str(source).endswith((".db", ".sqlite")):
+        return sqlite_totals(source, **options)
+    if str(source).endswith(".csv"):
+        return csv_totals(source, **options)
+    return parquet_totals(source, **options)
+
+
+def read_orders(source, table="orders"):
+    """
+    把整張訂單表讀進記憶體 (CustomerID 為 categorical、OrderDate 為 datetime64)，
+    供需要訂單 DataFrame 的計算使用 (例如 rfm_parallel 的分片平行聚合)
+    """
+    source = str(source)
+    if source.endswith((".db", ".sqlite")):
+        conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+        try:
+            df = pd.read_sql_query(f'SELECT {", ".join(COLUMNS)} FROM "{table}"', conn)
+        finally:
+            conn.close()
+    elif source.endswith(".csv"):
+        df = pd.read_csv(source, usecols=COLUMNS)
+    else:
+        df = pd.read_parquet(source, columns=COLUMNS)
+    return pd.DataFrame({
+        'CustomerID': df['CustomerID'].astype("category"),
+        'OrderDate': pd.to_datetime(df['OrderDate'], format="ISO8601").astype('datetime64[ns]'),
+        'Amount': rfm_engine.amount_values(df['Amount']),
+    })
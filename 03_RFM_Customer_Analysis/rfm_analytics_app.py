@@ -1,20 +1,26 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import datetime
 import platform
 import os
+import sys
+import mock_orders
+import rfm_engine
+import rfm_results
+import rfm_charts
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 共用的 perf_stages 在 repo 根目錄
+import perf_stages
 
 # ---------------------------------------------------------
 # [安裝與執行教學]
 # 1. 安裝套件: pip install streamlit pandas matplotlib seaborn
 # 2. 執行程式: streamlit run rfm_analytics_app.py
+# 啟動速度：matplotlib / seaborn (import 約 2.5 秒) 在畫圖表時才載入，每個行程只載入一次
+# 圖表：畫好的 PNG 依資料指紋快取 (rfm_charts)；客戶數超過 2 萬時價值分佈矩陣改用分箱熱度圖
+# 效能：各階段 (產生資料、calculate_rfm、畫圖) 的耗時顯示在側邊欄的「效能」面板 (perf_stages)
 # ---------------------------------------------------------
 
 # --- 1. 系統配置與字體設定 (解決中文亂碼問題) ---
 st.set_page_config(page_title="RFM 顧客價值分析系統", layout="wide")
+perf_stages.begin_run("rfm")
 
 def get_chinese_font():
     """偵測系統中的計算中文字體路徑"""
@@ -28,111 +34,72 @@ def get_chinese_font():
     return None
 
 CHINESE_FONT_PATH = get_chinese_font()
-if CHINESE_FONT_PATH and os.path.exists(CHINESE_FONT_PATH):
-    from matplotlib.font_manager import FontProperties
-    font_prop = FontProperties(fname=CHINESE_FONT_PATH)
-    plt.rcParams['font.sans-serif'] = [font_prop.get_name()]
-    plt.rcParams['axes.unicode_minus'] = False
-    sns.set(font=font_prop.get_name())
+
+@st.cache_resource(show_spinner="正在載入圖表套件...")
+@perf_stages.staged("載入 matplotlib / seaborn")
+def load_plotting():
+    """載入 Matplotlib / Seaborn 並設定中文字體 (第一次畫圖時才載入，每個行程一次)"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    if CHINESE_FONT_PATH and os.path.exists(CHINESE_FONT_PATH):
+        from matplotlib.font_manager import FontProperties
+        font_prop = FontProperties(fname=CHINESE_FONT_PATH)
+        plt.rcParams['font.sans-serif'] = [font_prop.get_name()]
+        plt.rcParams['axes.unicode_minus'] = False
+        sns.set(font=font_prop.get_name())
+    return plt, sns
 
 # --- 2. 模擬交易資料生成 (Mock Data) ---
 @st.cache_data
-def generate_transaction_data(n_rows=1000):
+@perf_stages.staged("產生模擬訂單", rows=len)
+def generate_transaction_data(n_rows=1000, n_customers=200):
     """生成模擬的電商訂單資料 (Transaction Data)"""
-    np.random.seed(42)
-    
-    # 模擬 200 位客戶
-    customer_ids = [f'C{str(i).zfill(3)}' for i in range(1, 201)]
-    
-    data = []
-    # 設定起始日期 (一年前)
-    start_date = datetime.date.today() - datetime.timedelta(days=365)
-    
-    for _ in range(n_rows):
-        cust_id = np.random.choice(customer_ids)
-        
-        # 模擬日期：越接近現在的日期，交易機率越高 (模擬業務成長)
-        days_offset = np.random.randint(0, 365)
-        date = start_date + datetime.timedelta(days=days_offset)
-        
-        # 模擬金額：大部分消費落在 500-3000，少數大額
-        amount = int(np.random.gamma(shape=2, scale=1000)) + 100
-        
-        data.append([cust_id, date, amount])
-        
-    df = pd.DataFrame(data, columns=['CustomerID', 'OrderDate', 'Amount'])
-    df['OrderDate'] = pd.to_datetime(df['OrderDate'])
-    return df
+    # 整批以 numpy 陣列產生 (mock_orders)：客戶為 categorical、日期為 datetime64，
+    # 同一套產生器也用於千萬筆以上的大規模測試
+    return mock_orders.generate_orders(n_rows, n_customers=n_customers, days=365, seed=42)
+
+@st.cache_data
+@perf_stages.staged("訂單指紋")
+def transaction_data_fingerprint(n_rows=1000, n_customers=200):
+    """模擬訂單的內容指紋 (只在資料重新產生時計算一次)"""
+    return rfm_results.orders_fingerprint(generate_transaction_data(n_rows, n_customers))
 
 # --- 3. RFM 計算核心邏輯 ---
-def calculate_rfm(df):
+@perf_stages.staged("calculate_rfm", rows=len)
+def calculate_rfm(orders):
     """
     計算 Recency, Frequency, Monetary 並進行評分
+    聚合、五等分打分 (pd.qcut) 與分群規則都在 rfm_engine 以整批陣列運算完成：
+    RFM_Score 為整數代碼 (例如 545)，客群依 rfm_engine.SEGMENT_RULES 規則表判斷
+    orders 可為訂單 DataFrame，或 SQLite / Parquet 訂單來源的路徑 (只載入每位客戶的聚合結果)
     """
-    # 設定基準日 (Snapshot Date)：通常是資料中最後一天交易日的隔天
-    snapshot_date = df['OrderDate'].max() + datetime.timedelta(days=1)
-    
-    # Group By CustomerID 進行聚合運算
-    rfm = df.groupby('CustomerID').agg({
-        'OrderDate': lambda x: (snapshot_date - x.max()).days, # Recency: 距今幾天
-        'CustomerID': 'count',                                 # Frequency: 購買次數
-        'Amount': 'sum'                                        # Monetary: 總消費金額
-    })
-    
-    # 重新命名欄位
-    rfm.rename(columns={
-        'OrderDate': 'Recency',
-        'CustomerID': 'Frequency',
-        'Amount': 'Monetary'
-    }, inplace=True)
-    
-    # --- RFM 打分機制 (1-5分，5分最好) ---
-    # 使用 pd.qcut 將資料分為 5 等份 (Quintiles)
-    
-    # Recency: 越小越好 (分數越高) -> 標籤 [5, 4, 3, 2, 1]
-    rfm['R_Score'] = pd.qcut(rfm['Recency'], 5, labels=[5, 4, 3, 2, 1])
-    
-    # Frequency: 越大越好 (分數越高) -> 標籤 [1, 2, 3, 4, 5]
-    # 注意：如果數據重複值太多 (例如很多人只買1次)，qcut 會報錯，改用 rank method
-    rfm['F_Score'] = pd.qcut(rfm['Frequency'].rank(method='first'), 5, labels=[1, 2, 3, 4, 5])
-    
-    # Monetary: 越大越好 -> 標籤 [1, 2, 3, 4, 5]
-    rfm['M_Score'] = pd.qcut(rfm['Monetary'], 5, labels=[1, 2, 3, 4, 5])
-    
-    # 將 category 轉為 int 以便計算
-    rfm['R_Score'] = rfm['R_Score'].astype(int)
-    rfm['F_Score'] = rfm['F_Score'].astype(int)
-    rfm['M_Score'] = rfm['M_Score'].astype(int)
-    
-    # 計算 RFM 總分 (簡單加總或加權)
-    rfm['RFM_Score'] = rfm['R_Score'].astype(str) + rfm['F_Score'].astype(str) + rfm['M_Score'].astype(str)
-    
-    # --- 客戶分群規則 (Segmentation) ---
-    def segment_customer(row):
-        # 這裡使用常見的簡化規則，可根據商業邏輯調整
-        r, f, m = row['R_Score'], row['F_Score'], row['M_Score']
-        
-        if r >= 4 and f >= 4 and m >= 4:
-            return "🏆 VIP客戶"
-        elif r >= 3 and f >= 3 and m >= 3:
-            return "💎 忠誠客戶"
-        elif r >= 4 and f == 1:
-            return "🌱 新進潛力客戶"
-        elif r <= 2 and f >= 4:
-            return "⚠️ 流失預警客戶" #(曾經買很多，但很久沒來了)
-        elif r <= 2 and f <= 2:
-            return "💤 沉睡/流失客戶"
-        else:
-            return "🙂 一般挽留客戶"
-            
-    rfm['Customer_Segment'] = rfm.apply(segment_customer, axis=1)
-    
+    rfm = rfm_engine.calculate_rfm(orders)
+    # 只保留實際出現的客群，圖表與選單不會出現空的類別
+    rfm['Customer_Segment'] = rfm['Customer_Segment'].cat.remove_unused_categories()
     return rfm
 
+@st.cache_resource(max_entries=8, show_spinner="正在計算 RFM...")
+def load_rfm_result(data_key, config_key, _orders):
+    """
+    依「訂單資料指紋 + 打分設定指紋」快取 RFM 結果 (含客群索引、各客群人數與 KPI)
+    _orders 為訂單來源或產生訂單的函式，不參與快取鍵的雜湊；切換客群等 rerun 直接取用同一份結果
+    """
+    rfm = calculate_rfm(_orders() if callable(_orders) else _orders)
+    with perf_stages.stage("建立客群索引 + KPI", rows=len(rfm)):
+        return rfm_results.RFMResult(rfm)
+
 # --- 4. Streamlit UI ---
 
+# 大量客戶時價值分佈矩陣的網格顏色 (選項 → rfm_charts.draw_binned 的 color_by)
+MATRIX_COLORS = {"客戶數": "count", "平均消費金額": "monetary", "主要客群": "segment"}
+
 st.sidebar.title("🔍 RFM 分析控制台")
-st.sidebar.info("模擬資料：200位客戶，1000筆訂單")
+order_source = st.sidebar.text_input(
+    "訂單來源 (選填)", help="SQLite 資料庫 (.db，orders 資料表) 或 Parquet 檔案 / 資料夾的路徑；留白則使用模擬資料")
+if order_source:
+    st.sidebar.info(f"訂單來源：{order_source}")
+else:
+    st.sidebar.info("模擬資料：200位客戶，1000筆訂單")
 if st.sidebar.button("🔄 重新生成模擬數據"):
     st.cache_data.clear()
     st.rerun()
@@ -140,64 +107,71 @@ if st.sidebar.button("🔄 重新生成模擬數據"):
 st.title("📊 電商會員價值分析模型 (RFM Model)")
 st.markdown("透過 **Recency (最近購買日)**、**Frequency (頻率)**、**Monetary (金額)** 三大指標，將客戶精準分群。")
 
-# 1. 載入與處理資料
-df_orders = generate_transaction_data()
-rfm_df = calculate_rfm(df_orders)
+# 1. 載入與處理資料 (外部來源不載入整張訂單表；結果依資料與設定的指紋快取)
+config_key = rfm_results.config_fingerprint()
+if order_source:
+    if not os.path.exists(order_source):
+        st.error(f"找不到訂單來源：{order_source}")
+        st.stop()
+    data_key = rfm_results.source_fingerprint(order_source)
+    result = load_rfm_result(data_key, config_key, order_source)
+else:
+    data_key = transaction_data_fingerprint()
+    result = load_rfm_result(data_key, config_key, generate_transaction_data)
+rfm_df = result.rfm
 
-# 2. 關鍵指標 (KPI)
+# 2. 關鍵指標 (KPI，建立結果時已算好)
+kpis = result.kpis
 col1, col2, col3, col4 = st.columns(4)
-col1.metric("總營收 (Total Revenue)", f"${rfm_df['Monetary'].sum():,.0f}")
-col2.metric("平均客單價 (AOV)", f"${df_orders['Amount'].mean():,.0f}")
-col3.metric("活躍會員數", f"{len(rfm_df)}")
-col4.metric("VIP 客戶佔比", f"{(len(rfm_df[rfm_df['Customer_Segment'].str.contains('VIP')]) / len(rfm_df) * 100):.1f}%")
+col1.metric("總營收 (Total Revenue)", f"${kpis['total_revenue']:,.0f}")
+col2.metric("平均客單價 (AOV)", f"${kpis['aov']:,.0f}")
+col3.metric("活躍會員數", f"{kpis['customers']}")
+col4.metric("VIP 客戶佔比", f"{kpis['vip_share'] * 100:.1f}%")
 
 st.divider()
 
-# 3. 視覺化分析
+# 3. 視覺化分析 (KPI 先顯示；圖表依資料與設定的指紋快取成 PNG，命中時不載入圖表套件也不重畫)
 col_chart1, col_chart2 = st.columns(2)
+chart_key = (data_key, config_key)
+
+def draw_chart(draw, *args, **kwargs):
+    """快取未命中時才載入 matplotlib / seaborn 並畫圖"""
+    return lambda: draw(*load_plotting(), *args, **kwargs)
 
 with col_chart1:
     st.subheader("👥 客戶分群分佈 (Segmentation)")
     
-    # 畫圓餅圖或長條圖
-    segment_counts = rfm_df['Customer_Segment'].value_counts()
-    
-    fig, ax = plt.subplots(figsize=(8, 6))
-    sns.barplot(x=segment_counts.values, y=segment_counts.index, palette="viridis", ax=ax)
-    ax.set_xlabel("客戶數")
-    st.pyplot(fig)
+    # 畫圓餅圖或長條圖 (各客群人數已預先算好，依人數排序)
+    segment_counts = result.segment_counts
+    with perf_stages.stage("客群分佈圖"):
+        st.image(rfm_charts.render_png(rfm_charts.figure_key(chart_key, "segments"),
+                                       draw_chart(rfm_charts.draw_segment_counts, segment_counts)), width="stretch")
 
 with col_chart2:
     st.subheader("💰 價值分佈矩陣 (R vs F)")
     st.markdown("觀察重點：右上角為高價值群，右下角為需挽留群")
     
-    fig2, ax2 = plt.subplots(figsize=(8, 6))
-    # 繪製散佈圖：X軸為 Recency (天數), Y軸為 Frequency (次數)
-    # 用 Monetary 大小決定點的大小
-    sns.scatterplot(
-        data=rfm_df, 
-        x='Recency', 
-        y='Frequency', 
-        hue='Customer_Segment', 
-        size='Monetary',
-        sizes=(20, 200),
-        alpha=0.7,
-        palette="deep",
-        ax=ax2
-    )
-    # 畫一條虛線做區隔
-    ax2.axvline(x=rfm_df['Recency'].mean(), color='gray', linestyle='--')
-    ax2.axhline(y=rfm_df['Frequency'].mean(), color='gray', linestyle='--')
-    ax2.set_xlabel("距今未消費天數 (Recency)")
-    ax2.set_ylabel("消費頻率 (Frequency)")
-    plt.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
-    st.pyplot(fig2)
+    if rfm_charts.uses_bins(len(rfm_df)):
+        # 客戶數太多時不逐點畫：(Recency, Frequency) 分箱成網格，畫每格的客戶數 / 平均金額 / 主要客群
+        color_by = st.radio("網格顏色：", list(MATRIX_COLORS), horizontal=True)
+        overlay = st.checkbox("疊加分層抽樣的客戶點", help=f"每個客群依人數比例抽樣，共約 {rfm_charts.SAMPLE_SIZE:,} 人")
+        st.caption(f"共 {len(rfm_df):,} 位客戶 (超過 {rfm_charts.POINT_THRESHOLD:,} 人)，以分箱熱度圖顯示")
+        draw = draw_chart(lambda plt, sns: rfm_charts.draw_binned(
+            plt, sns, rfm_charts.RFMBins(rfm_df), MATRIX_COLORS[color_by],
+            rfm_charts.stratified_sample(result) if overlay else None))
+        key = rfm_charts.figure_key(chart_key, "matrix", MATRIX_COLORS[color_by], overlay)
+    else:
+        draw = draw_chart(rfm_charts.draw_scatter, rfm_df)
+        key = rfm_charts.figure_key(chart_key, "scatter")
+    with perf_stages.stage("價值分佈矩陣", rows=len(rfm_df)):
+        st.image(rfm_charts.render_png(key, draw), width="stretch")
 
 # 4. 行銷策略建議 (Actionable Insights)
 st.subheader("💡 智慧行銷策略建議")
 
-selected_segment = st.selectbox("請選擇要分析的客群：", rfm_df['Customer_Segment'].unique())
-target_data = rfm_df[rfm_df['Customer_Segment'] == selected_segment]
+selected_segment = st.selectbox("請選擇要分析的客群：", result.segments)
+# 以預先建立的客群索引取出該客群的列 (不必對整欄做字串比對)
+target_data = result.segment(selected_segment)
 
 st.write(f"目前選定客群：**{selected_segment}** (共 {len(target_data)} 人)")
 
@@ -215,8 +189,10 @@ else:
 
 st.info(strategy_text)
 
-# 5. 資料檢視
+# 5. 資料檢視 (選定客群的名單，已依 RFM_Score 由高到低排序)
 with st.expander("查看詳細客戶名單"):
-    st.dataframe(rfm_df.sort_values(by='RFM_Score', ascending=False), use_container_width=True)
+    st.dataframe(target_data, use_container_width=True)
+
+st.caption("開發者: [EddieTcLee] | 技術棧: Python, Pandas, RFM Analysis, Streamlit")
 
-st.caption("開發者: [EddieTcLee] | 技術棧: Python, Pandas, RFM Analysis, Streamlit")
\ No newline at end of file
+perf_stages.render_panel()
\ No newline at end of file
@@ -0,0 +1,211 @@
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# ---------------------------------------------------------
+# RFM 圖表：大量客戶的分箱繪製 + 圖片快取
+# - 價值分佈矩陣 (R vs F) 原本以 sns.scatterplot 逐點畫出每位客戶 (hue + size)，
+#   客戶數達百萬時要畫數十秒、圖檔也非常大。客戶數超過 POINT_THRESHOLD 時改為先分箱：
+#   (Recency, Frequency) 切成二維網格，以 bincount 一次算出每格的客戶數、Monetary 總和與各客群人數，
+#   再以 pcolormesh 畫成熱度圖 (繪圖成本只與格數有關，與客戶數無關)
+# - 可選擇疊加分層抽樣的客戶點：每個客群依人數比例抽樣 (至少 1 人)，小客群也看得到
+# - 畫好的圖以 PNG bytes 快取 (與 02 的文字雲快取相同的 LRU 做法)，鍵包含資料與打分設定的指紋，
+#   rerun 命中時直接交給 st.image，不必載入 matplotlib / seaborn，也不必重畫
+#
+# 實測 (bench_rfm_charts.py --customers 1000000，約 99 萬位客戶，繪製 + 存成 PNG)：
+#   逐點散佈圖          : 37.9s，537KB
+#   分箱 (客戶數)       : 0.65s，63KB (分箱本身 39ms，20x60 格)
+#   分箱 + 2,000 點抽樣 : 1.09s，245KB
+#   快取命中            : ~10us
+# - PNG 寬度不超過 MAX_WIDTH_PX：原本 200 dpi 的圖寬多為 1,600～2,000px，st.image 每次 rerun 都會縮小並重新編碼 (兩張圖約 0.47s)
+# ---------------------------------------------------------
+
+POINT_THRESHOLD = 20_000             # 客戶數超過此值時改用分箱熱度圖
+RECENCY_BINS = 60
+FREQUENCY_BINS = 40                  # Frequency 的範圍不超過此值時每個整數一格
+SAMPLE_SIZE = 2_000                  # 疊加的抽樣點數上限
+SAVEFIG_OPTIONS = {"format": "png", "dpi": 200, "bbox_inches": "tight"}   # 與 st.pyplot 的預設相同
+MAX_WIDTH_PX = 1460                  # st.image 的最大寬度 (2 x 730)，更寬的圖片會被縮小並重新編碼
+TIGHT_PAD_INCHES = 0.1               # bbox_inches="tight" 預設的留白
+MAX_CACHE_BYTES = 32 * 1024 * 1024   # 快取的 PNG 總大小上限
+
+_images = OrderedDict()              # key -> PNG bytes (LRU)
+_cache_bytes = 0
+_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def uses_bins(n_customers, threshold=POINT_THRESHOLD):
+    """客戶數是否超過逐點繪製的上限"""
+    return n_customers > threshold
+
+
+def figure_key(*parts):
+    """圖表快取鍵：資料指紋、打分設定指紋與繪圖參數的雜湊"""
+    payload = json.dumps(parts, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def render_png(key, draw):
+    """
+    回傳圖表的 PNG bytes：快取命中時直接回傳，否則呼叫 draw() 取得 matplotlib figure 後存成 PNG
+    draw 只在未命中時才呼叫 (圖表套件的載入也放在 draw 裡)
+    """
+    global _cache_bytes
+    with _lock:
+        png = _images.get(key)
+        if png is not None:
+            _images.move_to_end(key)
+            stats["hits"] += 1
+            return png
+        stats["misses"] += 1
+
+    fig = draw()
+    width = fig.get_tightbbox(fig.canvas.get_renderer()).width + 2 * TIGHT_PAD_INCHES
+    dpi = min(SAVEFIG_OPTIONS["dpi"], int((MAX_WIDTH_PX - 2) / width))
+    buffer = io.BytesIO()
+    fig.savefig(buffer, **dict(SAVEFIG_OPTIONS, dpi=dpi))
+    png = buffer.getvalue()
+    import matplotlib.pyplot as plt  # 延遲載入：draw() 已載入 matplotlib，這裡只是取得同一個模組
+    plt.close(fig)
+
+    with _lock:
+        if key not in _images:
+            _images[key] = png
+            _cache_bytes += len(png)
+            while _cache_bytes > MAX_CACHE_BYTES and len(_images) > 1:
+                _, evicted = _images.popitem(last=False)
+                _cache_bytes -= len(evicted)
+    return png
+
+
+class RFMBins:
+    """
+    (Recency, Frequency) 二維網格的聚合結果，陣列形狀皆為 (Frequency 格數, Recency 格數)
+    counts: 客戶數；monetary: Monetary 總和；mix: 各客群人數 (最後一維對應 segments)
+    """
+
+    def __init__(self, rfm, recency_bins=RECENCY_BINS, frequency_bins=FREQUENCY_BINS):
+        recency = rfm['Recency'].to_numpy(dtype=np.int64)
+        frequency = rfm['Frequency'].to_numpy(dtype=np.int64)
+        self.recency_edges, r_idx = _bin(recency, recency_bins)
+        self.frequency_edges, f_idx = _bin(frequency, frequency_bins)
+        shape = (len(self.frequency_edges) - 1, len(self.recency_edges) - 1)
+        cells = f_idx * shape[1] + r_idx
+        size = shape[0] * shape[1]
+
+        self.counts = np.bincount(cells, minlength=size).reshape(shape)
+        self.monetary = np.bincount(cells, weights=rfm['Monetary'].to_numpy(dtype=np.float64),
+                                    minlength=size).reshape(shape)
+        segment = rfm['Customer_Segment'].cat
+        self.segments = [str(name) for name in segment.categories]
+        n_segments = len(self.segments)
+        self.mix = np.bincount(cells * n_segments + segment.codes.to_numpy(),
+                               minlength=size * n_segments).reshape(shape + (n_segments,))
+        self.recency_mean = float(recency.mean()) if len(recency) else 0.0
+        self.frequency_mean = float(frequency.mean()) if len(frequency) else 0.0
+
+    def mean_monetary(self):
+        """每格的平均消費金額 (空格為 NaN)"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.counts > 0, self.monetary / self.counts, np.nan)
+
+    def dominant_segment(self):
+        """每格人數最多的客群代碼 (空格為 -1)"""
+        return np.where(self.counts > 0, self.mix.argmax(axis=-1), -1)
+
+
+def _bin(values, bins):
+    """整數值分箱：範圍不超過 bins 時每個整數一格，否則等寬切 bins 格；回傳 (邊界, 每個值的格索引)"""
+    if len(values) == 0:
+        return np.array([-0.5, 0.5]), np.zeros(0, dtype=np.int64)
+    low, high = int(values.min()), int(values.max())
+    if high - low + 1 <= bins:
+        return np.arange(low, high + 2) - 0.5, values - low
+    edges = np.linspace(low, high + 1, bins + 1)
+    index = np.minimum((values - low) * bins // (high + 1 - low), bins - 1)
+    return edges, index
+
+
+def stratified_sample(result, size=SAMPLE_SIZE, seed=0):
+    """
+    依客群分層抽樣 (RFMResult 的客群索引)：各客群依人數比例分配，每個客群至少 1 人；
+    固定 seed，同一份結果每次抽到相同的客戶 (畫出的圖才能快取)
+    """
+    rng = np.random.default_rng(seed)
+    total = sum(len(p) for p in result.positions.values())
+    picked = []
+    for name, positions in result.positions.items():
+        n = min(len(positions), max(1, round(size * len(positions) / total)))
+        picked.append(rng.choice(positions, n, replace=False))
+    return result.rfm.iloc[np.sort(np.concatenate(picked))] if picked else result.rfm.iloc[:0]
+
+
+def draw_segment_counts(plt, sns, segment_counts):
+    """客群人數長條圖"""
+    fig, ax = plt.subplots(figsize=(8, 6))
+    sns.barplot(x=segment_counts.values, y=segment_counts.index, palette="viridis", ax=ax)
+    ax.set_xlabel("客戶數")
+    return fig
+
+
+def _decorate_matrix(ax, recency_mean, frequency_mean):
+    # 畫一條虛線做區隔
+    ax.axvline(x=recency_mean, color='gray', linestyle='--')
+    ax.axhline(y=frequency_mean, color='gray', linestyle='--')
+    ax.set_xlabel("距今未消費天數 (Recency)")
+    ax.set_ylabel("消費頻率 (Frequency)")
+
+
+def _scatter(sns, ax, rfm, alpha, sizes=(20, 200)):
+    # 繪製散佈圖：X軸為 Recency (天數), Y軸為 Frequency (次數)，用 Monetary 大小決定點的大小
+    sns.scatterplot(data=rfm, x='Recency', y='Frequency', hue='Customer_Segment', size='Monetary',
+                    sizes=sizes, alpha=alpha, palette="deep", ax=ax)
+    ax.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+
+
+def draw_scatter(plt, sns, rfm):
+    """逐點的價值分佈矩陣 (客戶數不多時)"""
+    fig, ax = plt.subplots(figsize=(8, 6))
+    _scatter(sns, ax, rfm, alpha=0.7)
+    _decorate_matrix(ax, rfm['Recency'].mean(), rfm['Frequency'].mean())
+    return fig
+
+
+def draw_binned(plt, sns, bins, color_by="count", sample=None):
+    """
+    分箱的價值分佈矩陣：color_by 為 "count" (客戶數，對數色階)、"monetary" (每格平均消費金額)
+    或 "segment" (每格人數最多的客群)；sample 為要疊加的抽樣客戶 (可省略)
+    """
+    from matplotlib.colors import ListedColormap, LogNorm  # 延遲載入：與 plt 同時載入
+    from matplotlib.patches import Patch
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    x, y = bins.recency_edges, bins.frequency_edges
+    if color_by == "segment":
+        palette = sns.color_palette("deep", len(bins.segments))
+        dominant = np.ma.masked_less(bins.dominant_segment(), 0)
+        ax.pcolormesh(x, y, dominant, cmap=ListedColormap(palette), vmin=-0.5,
+                      vmax=len(bins.segments) - 0.5, alpha=0.35 if sample is not None else 0.9)
+        present = np.unique(dominant.compressed())
+        handles = [Patch(color=palette[i], label=bins.segments[i]) for i in present]
+        if sample is None:
+            ax.legend(handles=handles, title="主要客群", bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+    else:
+        if color_by == "monetary":
+            values, norm, label = np.ma.masked_invalid(bins.mean_monetary()), None, "平均消費金額"
+        else:
+            values, norm, label = np.ma.masked_equal(bins.counts, 0), LogNorm(vmin=1), "客戶數"
+        mesh = ax.pcolormesh(x, y, values, cmap="viridis", norm=norm)
+        fig.colorbar(mesh, ax=ax, label=label, location="bottom" if sample is not None else "right")
+
+    if sample is not None and len(sample):
+        _scatter(sns, ax, sample, alpha=0.8, sizes=(8, 80))
+    ax.set_xlim(x[0], x[-1])
+    ax.set_ylim(y[0], y[-1])
+    _decorate_matrix(ax, bins.recency_mean, bins.frequency_mean)
+    return fig
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import rfm_engine
+
+# ---------------------------------------------------------
+# RFM 結果快取與客群索引
+# - 訂單資料指紋：DataFrame 以 pd.util.hash_pandas_object 逐列雜湊後再整體 blake2b；
+#   外部訂單來源 (SQLite / Parquet) 以路徑、檔案大小與修改時間代表
+# - 打分設定指紋：分群規則表、預設客群、分數等級數與基準日
+#   兩者相同時結果必然相同，應用以這兩個指紋當快取鍵 (st.cache_resource)，rerun 時不必重算
+# - RFMResult 在建立時一次算好：客群 → 列位置索引 (各客群內依 RFM_Score 由高到低)、各客群人數與 KPI，
+#   之後切換客群只需依位置取出該客群的列 (與客群大小成正比)，不必再對整欄做字串比對
+# ---------------------------------------------------------
+
+
+def orders_fingerprint(df):
+    """訂單 DataFrame 的內容指紋 (欄位名稱、型別與每一列的值)"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def source_fingerprint(path):
+    """外部訂單來源的指紋：路徑 + 每個檔案的大小與修改時間 (資料夾會逐一列出其中的檔案)"""
+    path = os.path.abspath(path)
+    files = [path]
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    payload = [[f, os.stat(f).st_size, os.stat(f).st_mtime_ns] for f in files]
+    return hashlib.blake2b(json.dumps([path, payload]).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def config_fingerprint(rules=rfm_engine.SEGMENT_RULES, default_segment=rfm_engine.DEFAULT_SEGMENT,
+                       snapshot_date=None):
+    """打分設定的指紋：規則表、預設客群、分數等級數與基準日"""
+    payload = [rules, default_segment, rfm_engine.N_BINS, None if snapshot_date is None else str(snapshot_date)]
+    return hashlib.blake2b(json.dumps(payload, ensure_ascii=False).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class RFMResult:
+    """
+    RFM 計算結果 + 預先建立的客群索引與 KPI (建立後視為唯讀，可在多個 session 之間共用)
+    rfm 為 rfm_engine.calculate_rfm 的結果 (Customer_Segment 為 categorical)
+    """
+
+    def __init__(self, rfm):
+        self.rfm = rfm
+        codes = rfm['Customer_Segment'].cat.codes.to_numpy()
+        categories = rfm['Customer_Segment'].cat.categories
+
+        # 先依 RFM_Score 由高到低排 (stable)，再依客群代碼分組 (stable)：每個客群的位置都已依分數排序
+        by_score = np.argsort(-rfm['RFM_Score'].to_numpy(dtype=np.int32), kind='stable')
+        grouped = by_score[np.argsort(codes[by_score], kind='stable')]
+        counts = np.bincount(codes, minlength=len(categories))
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        self.positions = {name: grouped[bounds[i]:bounds[i + 1]] for i, name in enumerate(categories) if counts[i]}
+
+        # 各客群人數 (由多到少) 與選單順序 (首次出現的順序，與 unique() 相同)
+        self.segment_counts = pd.Series(counts, index=categories.astype(str), name='count')
+        self.segment_counts = self.segment_counts[self.segment_counts > 0].sort_values(ascending=False, kind='stable')
+        first_seen = np.full(len(categories), len(codes))
+        np.minimum.at(first_seen, codes, np.arange(len(codes)))
+        self.segments = [categories[i] for i in np.argsort(first_seen, kind='stable') if counts[i]]
+
+        monetary = rfm['Monetary'].sum().item()      # 整數金額為 int，含小數時為 float
+        orders = int(rfm['Frequency'].sum())
+        vip = sum(int(n) for name, n in self.segment_counts.items() if "VIP" in name)
+        self.kpis = {
+            "total_revenue": monetary,
+            "aov": monetary / orders if orders else 0.0,
+            "customers": len(rfm),
+            "vip_share": vip / len(rfm) if len(rfm) else 0.0,
+        }
+
+    def segment(self, segment):
+        """某客群的客戶 (依 RFM_Score 由高到低)；只取出該客群的列"""
+        return self.rfm.iloc[self.positions.get(segment, np.zeros(0, dtype=np.intp))]
+
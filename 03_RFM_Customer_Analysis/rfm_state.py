@@ -0,0 +1,261 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import rfm_engine
+
+# ---------------------------------------------------------
+# 增量 RFM 狀態 (不必每次重算整段訂單歷史)
+# - 每位客戶只保存 (最後交易日, 訂單數, 總金額)，新訂單批次先在批次內聚合，再併入狀態：O(批次大小)
+# - 狀態預設存在同目錄的 SQLite (rfm_state.db，path=None 則只在記憶體)，重新啟動時載入；每批只寫回有變動的客戶
+# - 五等分分界由可刪除的分位數草圖 (QuantileSketch) 維護：客戶數值改變時刪除舊值、加入新值，
+#   打分時直接查分界再以 searchsorted 指派 1-5 分，不必排序所有客戶
+#
+# 精確度 (相對 rfm_engine 的 pd.qcut 精確五等分)：
+# - 草圖在 [0, LINEAR_MAX) 內每個整數一個桶 → 整數數值的分界完全精確 (含小數的 Monetary 以整數部分歸桶，分界誤差 < 1)；
+#   最後交易日以 DAY_ORIGIN 起算的天數保存 (2044 年前都在精確範圍內)，R 分界永遠精確
+# - 超過 LINEAR_MAX 的數值 (通常只有大額 Monetary) 以對數桶保存 (DDSketch 的作法)：
+#   每個桶內的數值與代表值的相對誤差 ≤ RELATIVE_ACCURACY，因此分界的相對誤差也 ≤ RELATIVE_ACCURACY (0.1%)，
+#   只有數值落在某個分界 ±0.1% 內的客戶可能被分到相鄰的分數
+# - F 分數沿用 rank(method='first') 的等量切分 (分界在名次上，永遠精確)；打分時客戶依客戶編號排序
+#   (排序順序快取，新客戶以 searchsorted 插入)，同樣次數的客戶與 rfm_engine 一樣依客戶編號決定名次，F 分數完全相同
+# - 負值 (退款造成的負 Monetary、DAY_ORIGIN 之前的交易日) 存在草圖的負值桶 (絕對值以相同方式分桶)，精確度與正值相同
+# 精確度與效能的實測見 bench_rfm_state.py
+# ---------------------------------------------------------
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rfm_state.db")
+DAY_ORIGIN = np.datetime64("2000-01-01", "D")
+LINEAR_MAX = 16384              # 小於此值的整數精確保存
+RELATIVE_ACCURACY = 0.001       # 超過 LINEAR_MAX 時分界的相對誤差上限
+QUINTILES = np.arange(1, rfm_engine.N_BINS) / rfm_engine.N_BINS   # 內部分界 0.2, 0.4, 0.6, 0.8
+
+
+class QuantileSketch:
+    """
+    可刪除的分位數草圖
+    絕對值小於 linear_max 的值每個整數一個桶 (整數精確，小數以整數部分歸桶)，其餘為相對誤差 relative_accuracy 的對數桶；
+    負值以絕對值分桶，另存一組桶計數。桶計數可加可減，因此客戶數值更新時能刪除舊值 (t-digest / KLL 不支援刪除)
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, linear_max=LINEAR_MAX, max_value=2 ** 53):
+        self.linear_max = linear_max
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.first_log_bucket = int(np.ceil(np.log(linear_max) / self.log_gamma))
+        self.counts = np.zeros(self._bucket(np.array([max_value]))[0] + 1, dtype=np.int64)
+        self.negative_counts = np.zeros_like(self.counts)    # 負值：以絕對值分桶
+
+    def _bucket(self, values):
+        """非負數值 → 桶"""
+        buckets = np.floor(values).astype(np.int64) if values.dtype.kind == 'f' else values.astype(np.int64)
+        large = values >= self.linear_max
+        if large.any():
+            log_index = np.ceil(np.log(values[large]) / self.log_gamma).astype(np.int64)
+            buckets[large] = self.linear_max + log_index - self.first_log_bucket
+        return buckets
+
+    def _value(self, buckets):
+        """桶 → 代表值 (對數桶 (γ^(i-1), γ^i] 取 2γ^i / (γ+1)，相對誤差 ≤ relative_accuracy)"""
+        values = buckets.astype(np.float64)
+        large = buckets >= self.linear_max
+        log_index = buckets[large] - self.linear_max + self.first_log_bucket
+        values[large] = 2 * self.gamma ** log_index / (self.gamma + 1)
+        return values
+
+    def add(self, values, weight=1):
+        values = np.asarray(values)
+        negative = values < 0
+        if negative.any():
+            self.negative_counts += np.bincount(self._bucket(-values[negative]), minlength=len(self.counts)) * weight
+            values = values[~negative]
+        self.counts += np.bincount(self._bucket(values), minlength=len(self.counts)) * weight
+
+    def remove(self, values):
+        self.add(values, -1)
+
+    @property
+    def count(self):
+        return int(self.counts.sum() + self.negative_counts.sum())
+
+    def quantiles(self, qs):
+        """與 np.quantile (linear 內插) 相同的定義：第 (n-1)q 個值 (從 0 起算) 於相鄰兩值間內插"""
+        # 由小到大：負值桶 (絕對值由大到小)，接著非負值桶
+        cumulative = np.cumsum(np.concatenate((self.negative_counts[::-1], self.counts)))
+        n = cumulative[-1]
+        if n == 0:
+            raise ValueError("QuantileSketch 是空的")
+        position = (n - 1) * np.asarray(qs, dtype=np.float64)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, n - 1)
+        low, high = (self._signed_value(np.searchsorted(cumulative, k, side='right')) for k in (lower, upper))
+        return low + (position - lower) * (high - low)
+
+    def _signed_value(self, positions):
+        """quantiles 合併後的桶位置 → 代表值 (前 len(negative_counts) 個位置為反序的負值桶)"""
+        positions = np.asarray(positions)
+        offset = len(self.negative_counts)
+        negative = positions < offset
+        return np.where(negative, -self._value(np.where(negative, offset - 1 - positions, 0)),
+                        self._value(np.where(negative, 0, positions - offset)))
+
+
+class RFMState:
+    """
+    每位客戶的增量 RFM 狀態；path 為 SQLite 檔 (None 表示只存在記憶體)
+    update(orders) 併入新訂單，score() 回傳與 rfm_engine.calculate_rfm 相同欄位的結果
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.index = {}                 # 客戶編號 → 狀態代碼 (首次出現的順序)
+        self.customers = []
+        self.sorted_ids = np.zeros(0, dtype=object)     # 依客戶編號排序的客戶編號 (打分時才更新)
+        self.sorted_codes = np.zeros(0, dtype=np.int64)  # 與 sorted_ids 對應的狀態代碼
+        self.customer_index = None      # 依客戶編號排序的 pd.Index 快取，有新客戶時重建
+        self.last_day = np.zeros(0, dtype=np.int32)
+        self.orders = np.zeros(0, dtype=np.int64)
+        self.monetary = np.zeros(0, dtype=np.int64)
+        self.sketches = {"last_day": QuantileSketch(), "monetary": QuantileSketch()}
+        self.lock = threading.Lock()
+        if path:
+            self._load()
+
+    def __len__(self):
+        return len(self.customers)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS customer_state (
+                customer_id TEXT PRIMARY KEY,
+                last_day INTEGER NOT NULL,
+                orders INTEGER NOT NULL,
+                monetary NUMERIC NOT NULL
+            ) WITHOUT ROWID
+        """)
+        return conn
+
+    def _load(self):
+        conn = self._connect()
+        try:
+            rows = pd.read_sql_query("SELECT customer_id, last_day, orders, monetary FROM customer_state", conn)
+        finally:
+            conn.close()
+        self.customers = rows['customer_id'].tolist()
+        self.index = {customer: code for code, customer in enumerate(self.customers)}
+        self.last_day = rows['last_day'].to_numpy(dtype=np.int32)
+        self.orders = rows['orders'].to_numpy(dtype=np.int64)
+        # NUMERIC 欄位：整數金額存成整數，含小數的金額存成浮點數
+        monetary = pd.to_numeric(rows['monetary'])
+        self.monetary = monetary.to_numpy(dtype=np.float64 if monetary.dtype.kind == 'f' else np.int64)
+        self.sketches["last_day"].add(self.last_day)
+        self.sketches["monetary"].add(self.monetary)
+
+    def _codes(self, customers):
+        """批次中的客戶編號 → 狀態代碼；新客戶附加在最後 (陣列容量不足時加倍，新位置補 0)"""
+        known = len(self.customers)
+        codes = np.fromiter((self.index.setdefault(c, len(self.index)) for c in customers),
+                            dtype=np.int64, count=len(customers))
+        self.customers.extend(customers[codes >= known])
+        size = len(self.customers)
+        if size > known:
+            self.customer_index = None
+            if size > len(self.orders):
+                capacity = max(size, 2 * len(self.orders))
+                self.last_day = np.resize(self.last_day, capacity)
+                self.orders = np.resize(self.orders, capacity)
+                self.monetary = np.resize(self.monetary, capacity)
+            # 最後交易日以最小值起算 (DAY_ORIGIN 之前的交易日為負值，取最大值時不能以 0 起算)
+            self.last_day[known:size] = np.iinfo(np.int32).min
+            self.orders[known:size] = 0
+            self.monetary[known:size] = 0
+        return codes
+
+    def update(self, orders):
+        """併入一批新訂單 (CustomerID, OrderDate, Amount)，回傳有變動的客戶數"""
+        totals = rfm_engine.customer_totals(orders)
+        if totals.empty:
+            return 0
+        days = ((totals['LastOrder'].to_numpy().astype('datetime64[D]') - DAY_ORIGIN)
+                // np.timedelta64(1, 'D')).astype(np.int32)
+
+        with self.lock:
+            if totals['Monetary'].dtype.kind == 'f' and self.monetary.dtype.kind != 'f':
+                # 第一次出現含小數 (或缺值) 的金額：總金額改以 float64 保存
+                self.monetary = self.monetary.astype(np.float64)
+            known = len(self.customers)
+            codes = self._codes(totals.index.to_numpy(dtype=object))
+            existing = codes[codes < known]
+            # 既有客戶：先從草圖刪除舊值
+            self.sketches["last_day"].remove(self.last_day[existing])
+            self.sketches["monetary"].remove(self.monetary[existing])
+            # 新客戶的初始值為最小值 / 0，取最大值 / 累加後即為批次值
+            self.last_day[codes] = np.maximum(self.last_day[codes], days)
+            self.orders[codes] += totals['Frequency'].to_numpy()
+            self.monetary[codes] += totals['Monetary'].to_numpy()
+            self.sketches["last_day"].add(self.last_day[codes])
+            self.sketches["monetary"].add(self.monetary[codes])
+            if self.path:
+                self._save(codes)
+        return len(codes)
+
+    def _save(self, codes):
+        rows = zip((self.customers[c] for c in codes), self.last_day[codes].tolist(),
+                   self.orders[codes].tolist(), self.monetary[codes].tolist())
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO customer_state VALUES (?, ?, ?, ?)", rows)
+        finally:
+            conn.close()
+
+    def snapshot_date(self):
+        """與 rfm_engine 相同的預設基準日：最後一天交易日的隔天"""
+        n = len(self.customers)
+        return DAY_ORIGIN + int(self.last_day[:n].max()) + 1
+
+    def boundaries(self, snapshot_date=None):
+        """由草圖取得 Recency / Monetary 的內部分界 (與 pd.qcut 的分界定義相同)"""
+        snapshot = np.datetime64(snapshot_date or self.snapshot_date(), 'D')
+        # Recency = 基準日 - 最後交易日，分位數反向對應
+        last_day_edges = self.sketches["last_day"].quantiles(1 - QUINTILES)
+        recency = (snapshot - DAY_ORIGIN) // np.timedelta64(1, 'D') - last_day_edges
+        return {"Recency": recency, "Monetary": self.sketches["monetary"].quantiles(QUINTILES)}
+
+    def _sorted_codes(self):
+        """依客戶編號排序的狀態代碼；只有新客戶需要排序，再以 searchsorted 插入既有的順序"""
+        known = len(self.sorted_codes)
+        if known < len(self.customers):
+            new_ids = np.array(self.customers[known:], dtype=object)
+            order = np.argsort(new_ids, kind='stable')
+            new_ids = new_ids[order]
+            positions = np.searchsorted(self.sorted_ids, new_ids)
+            self.sorted_ids = np.insert(self.sorted_ids, positions, new_ids)
+            self.sorted_codes = np.insert(self.sorted_codes, positions, order + known)
+            self.customer_index = None
+        if self.customer_index is None:
+            self.customer_index = pd.Index(self.sorted_ids, name='CustomerID')
+        return self.sorted_codes
+
+    def to_frame(self, snapshot_date=None):
+        """
+        目前狀態 → Recency / Frequency / Monetary
+        客戶依客戶編號排序 (與 rfm_engine 相同)，rank(method='first') 打散同次數客戶時名次也相同
+        """
+        codes = self._sorted_codes()
+        snapshot = np.datetime64(snapshot_date or self.snapshot_date(), 'D')
+        return pd.DataFrame({
+            'Recency': ((snapshot - DAY_ORIGIN) // np.timedelta64(1, 'D') - self.last_day[codes]).astype(np.int64),
+            'Frequency': self.orders[codes],
+            'Monetary': self.monetary[codes],
+        }, index=self.customer_index)
+
+    def score(self, rules=rfm_engine.SEGMENT_RULES, snapshot_date=None):
+        """以草圖分界打分：與 rfm_engine.calculate_rfm 相同的欄位 (精確度見模組說明)"""
+        with self.lock:
+            rfm = self.to_frame(snapshot_date)
+            edges = self.boundaries(snapshot_date)
+        return rfm_engine.score_rfm(rfm, rules, edges=edges)
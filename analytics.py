@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# ---------------------------------------------------------
+# [三個分析流程的批次命令列工具 (不啟動 Streamlit)]
+# 三個應用的計算核心都在各自資料夾的獨立模組 (rfm_engine / order_sources、review_stream、
+# price_store / price_alerts)，這些模組不 import streamlit；本工具把對應資料夾加入 sys.path 後直接呼叫，
+# 適合排程的夜間批次，重量級計算不必經過互動頁面。
+# - rfm      : 訂單 (CSV / Parquet / SQLite) → 每位客戶的 RFM 數值、分數與客群
+#              預設逐塊聚合 (out-of-core)；指定 --workers 時讀進記憶體由 rfm_parallel 分片平行聚合
+# - sentiment: 評論 (CSV / SQLite) → 逐塊評分並寫出每則評論的分數與標籤，可另存摘要 (JSON)
+#              --workers 為 SnowNLP 評分的 worker 數
+# - prices   : 匯入價格檔 (選填) → 重算警示並寫出，可另存各商品的價格走勢 (日期 × 平台)
+#              價格寫入是單一 SQLite 交易的循序流程，沒有 --workers
+# --chunksize 為每次讀取 (或寫入資料庫) 的列數；輸出依副檔名寫成 .parquet 或 .csv
+# 執行: python analytics.py rfm --input orders.parquet --output rfm.parquet
+#       python analytics.py sentiment --input reviews.csv --output scored.csv --workers 4 --summary summary.json
+#       python analytics.py prices --db 01_Price_Tracker/ecommerce_prices.db --input prices.csv --output alerts.csv
+# ---------------------------------------------------------
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_DIRS = {
+    "prices": "01_Price_Tracker",
+    "sentiment": "02_Sentiment_Analysis",
+    "rfm": "03_RFM_Customer_Analysis",
+}
+OUTPUT_FORMATS = (".parquet", ".csv")
+SQLITE_SUFFIXES = (".db", ".sqlite")
+
+
+def use_app(command):
+    """把應用資料夾加入 sys.path，之後即可 import 該應用的計算模組 (不會執行 Streamlit 頁面)"""
+    path = os.path.join(ROOT, APP_DIRS[command])
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+class FrameWriter:
+    """逐塊寫出 DataFrame：.parquet 寫成同一個檔案的多個 row group，.csv 以附加方式寫入"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._writer = None
+
+    def write(self, df):
+        if self.path.endswith(".parquet"):
+            import pyarrow as pa  # 延遲載入：只有輸出 Parquet 時需要
+            import pyarrow.parquet as pq
+            schema = self._writer.schema if self._writer is not None else None
+            table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+            self._writer = self._writer or pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_frame(df, path):
+    with FrameWriter(path) as writer:
+        writer.write(df)
+
+
+def run_rfm(args):
+    use_app("rfm")
+    import order_sources
+    import rfm_engine
+    import rfm_results
+
+    if args.workers:
+        import rfm_parallel
+        orders = order_sources.read_orders(args.input, args.table)
+        print(f"讀入訂單 {len(orders):,} 筆，以 {args.workers} 個 worker 分片聚合")
+        rfm = rfm_parallel.calculate_rfm(orders, snapshot_date=args.snapshot_date, workers=args.workers)
+    else:
+        options = {}
+        if args.input.endswith(SQLITE_SUFFIXES):
+            options["table"] = args.table
+        if args.chunksize:
+            parquet = not args.input.endswith(SQLITE_SUFFIXES + (".csv",))
+            options["batch_rows" if parquet else "chunk_rows"] = args.chunksize
+        rfm = rfm_engine.calculate_rfm(args.input, snapshot_date=args.snapshot_date, **options)
+
+    write_frame(rfm.reset_index(), args.output)
+    result = rfm_results.RFMResult(rfm)
+    print(f"客戶 {result.kpis['customers']:,} 位，總營收 ${result.kpis['total_revenue']:,.0f}，"
+          f"VIP 佔比 {result.kpis['vip_share'] * 100:.1f}%")
+    for segment, count in result.segment_counts.items():
+        print(f"  {segment}: {count:,}")
+
+
+def run_sentiment(args):
+    use_app("sentiment")
+    import review_stream
+
+    chunk_rows = args.chunksize or review_stream.DEFAULT_CHUNK_ROWS
+    if args.input.endswith(SQLITE_SUFFIXES):
+        chunks = review_stream.iter_sqlite(args.input, args.table, chunk_rows)
+    else:
+        chunks = review_stream.iter_csv(args.input, chunk_rows, keep_columns=True)
+    engine_options = {"backend": args.backend, "workers": args.workers}
+    # 摘要需要斷詞 (結巴)，只有指定 --summary 時才累加
+    aggregate = review_stream.ReviewAggregate() if args.summary else None
+
+    start = time.perf_counter()
+    with FrameWriter(args.output) as writer:
+        for chunk in chunks:
+            df = review_stream.analyze_chunk(chunk, **engine_options)
+            writer.write(df)
+            if aggregate is not None:
+                aggregate.update(df)
+            print(f"已評分 {writer.rows:,} 則 ({time.perf_counter() - start:.1f}s)")
+
+    if aggregate is not None:
+        summary = {
+            "rows": aggregate.rows,
+            "mean_score": aggregate.mean_score,
+            "positive_ratio": aggregate.positive_ratio,
+            "labels": dict(aggregate.label_counts),
+            "top_terms": aggregate.terms(top=args.top_terms).most_common(),
+        }
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+
+def run_prices(args):
+    use_app("prices")
+    import catalog
+    import price_alerts
+    import price_store
+
+    price_store.init_db(args.db)
+    catalog.seed_catalog(args.db)
+    if args.input:
+        batch_size = args.chunksize or price_store.DEFAULT_BATCH_SIZE
+        rows = price_store.read_price_file(args.input, args.table, batch_size)
+        # 批次匯入時不逐批重算警示與彙總，全部寫入後再重建彙總、對整個目錄算一次警示
+        stats = price_store.ingest_prices(rows, batch_size=batch_size, db_path=args.db, rebuild_rollups=True)
+        print(f"匯入 {stats['rows']:,} 筆價格 ({stats['batches']} 批，{stats['rows_per_sec']:,.0f} 筆/秒)")
+
+    alerts = price_alerts.evaluate_alerts(args.products, db_path=args.db)
+    write_frame(alerts, args.output)
+    print(f"警示 {len(alerts):,} 則")
+
+    if args.history:
+        import pandas as pd
+        frames = []
+        for product in args.products or catalog.list_products(args.db):
+            history = price_store.fetch_data(product, args.db)
+            if history.empty:
+                continue
+            chart = history.pivot(index="date", columns="platform", values="price").reset_index()
+            chart.insert(0, "product_name", product)
+            frames.append(chart)
+        history = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["product_name", "date"])
+        write_frame(history, args.history)
+        print(f"價格走勢 {len(frames)} 個商品，{len(history):,} 列")
+
+
+def output_path(value):
+    if not value.endswith(OUTPUT_FORMATS):
+        raise argparse.ArgumentTypeError(f"輸出檔必須是 {' / '.join(OUTPUT_FORMATS)}：{value}")
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="三個分析流程的批次命令列工具 (不啟動 Streamlit)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rfm = commands.add_parser("rfm", help="訂單 → RFM 分數與客群")
+    rfm.add_argument("--input", required=True, help="訂單檔：.csv、.parquet (檔案或資料夾) 或 .db / .sqlite")
+    rfm.add_argument("--table", default="orders", help="SQLite 訂單資料表")
+    rfm.add_argument("--output", required=True, type=output_path)
+    rfm.add_argument("--snapshot-date", help="計算 Recency 的基準日 (預設為最後一筆訂單的隔天)")
+    rfm.add_argument("--workers", type=int, help="分片平行聚合的 worker 數 (訂單會整批讀進記憶體)")
+    rfm.add_argument("--chunksize", type=int, help="逐塊聚合時每次讀取的列數")
+    rfm.set_defaults(run=run_rfm)
+
+    sentiment = commands.add_parser("sentiment", help="評論 → 情感分數與標籤")
+    sentiment.add_argument("--input", required=True, help="評論檔：.csv 或 .db / .sqlite (需有 text 欄位)")
+    sentiment.add_argument("--table", default="reviews", help="SQLite 評論資料表")
+    sentiment.add_argument("--output", required=True, type=output_path)
+    sentiment.add_argument("--backend", choices=["snownlp", "nb"], default="snownlp")
+    sentiment.add_argument("--workers", type=int, help="SnowNLP 評分的 worker 數 (預設為可用核心數)")
+    sentiment.add_argument("--chunksize", type=int, help="每次讀取並評分的列數")
+    sentiment.add_argument("--summary", help="另存摘要 JSON (平均分數、各標籤筆數、高頻詞)")
+    sentiment.add_argument("--top-terms", type=int, default=100, help="摘要中的高頻詞數")
+    sentiment.set_defaults(run=run_sentiment)
+
+    prices = commands.add_parser("prices", help="匯入價格 → 價差 / 降價警示")
+    prices.add_argument("--db", default=os.path.join(ROOT, APP_DIRS["prices"], "ecommerce_prices.db"))
+    prices.add_argument("--input", help="要匯入的價格檔：.csv、.parquet 或 .db / .sqlite "
+                                        "(欄位 date, platform, product_name, price)")
+    prices.add_argument("--table", default="prices", help="SQLite 價格資料表")
+    prices.add_argument("--output", required=True, type=output_path, help="警示輸出檔")
+    prices.add_argument("--history", type=output_path, help="另存各商品的價格走勢 (日期 × 平台)")
+    prices.add_argument("--products", nargs="+", help="只處理這些商品 (預設為整個商品目錄)")
+    prices.add_argument("--chunksize", type=int, help="每批讀取並寫入資料庫的列數")
+    prices.set_defaults(run=run_prices)
+
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    args.run(args)
+    print(f"完成 ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+# ---------------------------------------------------------
+# 各階段的效能量測 (三個儀表板共用)
+# - stage("名稱") context manager / @staged 裝飾器：記錄 wall time、CPU time、處理列數，
+#   以及行程的記憶體高水位 (ru_maxrss)；開啟「追蹤記憶體峰值」時另以 tracemalloc 記錄該階段的配置峰值
+# - 每次 rerun 由 begin_run() 建立一個 RunRecorder (存在目前執行緒，Streamlit 每個 session 的腳本各自獨立)，
+#   腳本最後呼叫 render_panel() 顯示側邊欄的「效能」面板，並把本次各階段附加寫入 JSON Lines 紀錄
+#   (路徑為環境變數 PERF_STAGES_LOG，預設 repo 根目錄的 perf_stages.jsonl；設為空字串則不寫入)
+# - 面板可選擇擷取單一次 rerun 的 cProfile (顯示累計時間前幾名並可下載 .prof)，
+#   系統有 py-spy 時也可用 py-spy 取樣 (輸出 speedscope JSON；py-spy 需要 ptrace 權限，取樣整個行程的所有執行緒)
+# 沒有呼叫 begin_run() (例如命令列或效能測試) 時 stage() 不記錄任何東西，只多一次 thread-local 查詢
+# 沒有開啟 tracemalloc 與 profiler 時，每個階段的額外成本只有幾次計時器與 getrusage 呼叫 (微秒等級)
+# ---------------------------------------------------------
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+LOG_PATH = os.environ.get("PERF_STAGES_LOG", os.path.join(ROOT, "perf_stages.jsonl"))
+PROFILE_TOP = 30                     # cProfile 報告顯示的函式數
+PROFILERS = ("cProfile", "py-spy")
+MB = 1024 * 1024
+# ru_maxrss 的單位：Linux 為 KB，macOS 為 bytes
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+_local = threading.local()
+
+
+def _max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT / MB
+
+
+class RunRecorder:
+    """一次 rerun 的各階段紀錄；trace_memory 時以 tracemalloc 量測每個階段的配置峰值"""
+
+    def __init__(self, app, trace_memory=False, profiler=None):
+        self.app = app
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.trace_memory = trace_memory
+        self.records = []
+        self.profile = None              # {"kind", "report", "data", "filename"}
+        self._stack = []
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._profiler = None
+        self._pyspy = None
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._run_peak = self._run_start_mem = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+        if profiler == "cProfile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif profiler == "py-spy":
+            self._start_pyspy()
+
+    def _start_pyspy(self):
+        path = os.path.join(tempfile.mkdtemp(prefix="perf_stages_"), f"{self.app}_{self.run_id}.speedscope.json")
+        command = [shutil.which("py-spy"), "record", "--pid", str(os.getpid()), "--output", path,
+                   "--format", "speedscope", "--rate", "200", "--nonblocking"]
+        self._pyspy = (subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE), path)
+        time.sleep(0.5)                  # 讓 py-spy 先附加到行程，取樣才涵蓋整次 rerun
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """量測一個階段；yield 的 dict 可在區塊內補上 rows (例如 record["rows"] = len(df))"""
+        record = {"stage": name, "rows": rows, "depth": len(self._stack)}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # 重設峰值前先把目前的峰值記到外層階段 (最外層記到整次 rerun)
+            self._propagate_peak(peak)
+            tracemalloc.reset_peak()
+            record["_start_mem"], record["_peak"] = current, current
+        self._stack.append(record)
+        self.records.append(record)     # 依開始順序排列 (外層階段在內層之前)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_ms"] = (time.perf_counter() - wall) * 1000
+            record["cpu_ms"] = (time.process_time() - cpu) * 1000
+            record["max_rss_mb"] = _max_rss_mb()
+            self._stack.pop()
+            if self.trace_memory:
+                peak = max(record.pop("_peak"), tracemalloc.get_traced_memory()[1])
+                record["peak_mb"] = (peak - record.pop("_start_mem")) / MB
+                self._propagate_peak(peak)
+
+    def _propagate_peak(self, peak):
+        if self._stack:
+            self._stack[-1]["_peak"] = max(self._stack[-1]["_peak"], peak)
+        else:
+            self._run_peak = max(self._run_peak, peak)
+
+    def finish(self):
+        """結束這次 rerun：停止 profiler / tracemalloc，加上整次 rerun 的總計並回傳所有紀錄"""
+        self.records.append({
+            "stage": "(整次 rerun)", "rows": None, "depth": 0,
+            "wall_ms": (time.perf_counter() - self._wall) * 1000,
+            "cpu_ms": (time.process_time() - self._cpu) * 1000, "max_rss_mb": _max_rss_mb(),
+        })
+        if self.trace_memory:
+            peak = max(self._run_peak, tracemalloc.get_traced_memory()[1])
+            self.records[-1]["peak_mb"] = (peak - self._run_start_mem) / MB
+            tracemalloc.stop()
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.profile = _cprofile_result(self._profiler, f"{self.app}_{self.run_id}.prof")
+            self._profiler = None
+        if self._pyspy is not None:
+            self.profile = _stop_pyspy(*self._pyspy)
+            self._pyspy = None
+        return self.records
+
+    def rows(self):
+        """JSON Lines 的每一列：一個階段"""
+        base = {"app": self.app, "run_id": self.run_id,
+                "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started))}
+        return [dict(base, **record) for record in self.records]
+
+
+def _cprofile_result(profiler, filename):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).strip_dirs().sort_stats("cumulative").print_stats(PROFILE_TOP)
+    with tempfile.NamedTemporaryFile(suffix=".prof", delete=False) as f:
+        path = f.name
+    try:
+        profiler.dump_stats(path)
+        with open(path, "rb") as f:
+            data = f.read()
+    finally:
+        os.remove(path)
+    return {"kind": "cProfile", "report": out.getvalue(), "data": data, "filename": filename}
+
+
+def _stop_pyspy(proc, path):
+    # py-spy 收到 SIGINT 後才寫出取樣結果
+    proc.send_signal(signal.SIGINT)
+    try:
+        _, stderr = proc.communicate(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        _, stderr = proc.communicate()
+    if not os.path.exists(path):
+        message = stderr.decode("utf-8", "replace").strip() or "py-spy 沒有產生輸出"
+        return {"kind": "py-spy", "report": f"py-spy 失敗：{message}", "data": None, "filename": None}
+    with open(path, "rb") as f:
+        data = f.read()
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    return {"kind": "py-spy", "report": "以 https://www.speedscope.app 開啟下載的檔案檢視火焰圖",
+            "data": data, "filename": os.path.basename(path)}
+
+
+def current():
+    """目前執行緒的 RunRecorder (沒有時為 None)"""
+    return getattr(_local, "recorder", None)
+
+
+@contextmanager
+def stage(name, rows=None):
+    """在目前的 rerun 中量測一個階段；沒有 RunRecorder 時不記錄"""
+    recorder = current()
+    if recorder is None:
+        yield {"stage": name, "rows": rows}
+        return
+    with recorder.stage(name, rows) as record:
+        yield record
+
+
+def staged(name=None, rows=None):
+    """
+    裝飾器版的 stage()：name 預設為函式名稱；rows 為「回傳值 → 列數」的函式 (例如 len)，
+    用於記錄該階段處理的資料量
+    """
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(label) as record:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    record["rows"] = rows(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def append_log(rows, path=LOG_PATH):
+    """把各階段附加寫入 JSON Lines 檔 (每列一個階段)"""
+    if not path or not rows:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def stage_summary(records):
+    """
+    面板用的彙總表：同一層、同名的階段 (例如串流模式每個區塊一次) 合併成一列，
+    時間與列數相加、記憶體取最大值，依第一次出現的順序排列
+    """
+    import pandas as pd  # 延遲載入：只有畫面板時需要
+    columns = ["depth", "stage", "wall_ms", "cpu_ms", "peak_mb", "max_rss_mb", "rows"]
+    table = pd.DataFrame(records).reindex(columns=columns)
+    table["rows"] = pd.to_numeric(table["rows"])
+    summary = table.groupby(["depth", "stage"], sort=False).agg(
+        calls=("stage", "size"), wall_ms=("wall_ms", "sum"), cpu_ms=("cpu_ms", "sum"),
+        peak_mb=("peak_mb", "max"), max_rss_mb=("max_rss_mb", "max"), rows=("rows", lambda r: r.sum(min_count=1)),
+    ).reset_index()
+    summary["stage"] = ["　" * depth + name for depth, name in zip(summary["depth"], summary["stage"])]
+    return summary.drop(columns="depth").set_index("stage")
+
+
+# --- Streamlit 面板 ---
+
+def begin_run(app):
+    """
+    每次 rerun 開始時呼叫 (在任何要量測的階段之前)：依面板的設定建立本次的 RunRecorder
+    面板的元件在 render_panel 才畫出，這裡只讀取 session_state (勾選或按下按鈕引發的 rerun 即已生效)
+    """
+    import streamlit as st  # 延遲載入：命令列與效能測試只用 stage()，不需要 streamlit
+    # 每次 rerun 不一定在同一個執行緒，上一次的 RunRecorder 另存在 session_state
+    stale = st.session_state.pop("perf_recorder", None)
+    if stale is not None:
+        # 上一次 rerun 被 st.stop() / st.rerun() 中斷、沒有走到 render_panel：停止它的 profiler 與 tracemalloc，
+        # 已量到的階段 (例如按鈕觸發的爬蟲) 照樣寫入紀錄
+        stale.finish()
+        _keep(stale.rows())
+    profiler = st.session_state.pop("perf_profile_armed", None)
+    recorder = RunRecorder(app, trace_memory=st.session_state.get("perf_trace_memory", False), profiler=profiler)
+    _local.recorder = st.session_state["perf_recorder"] = recorder
+    return recorder
+
+
+def _keep(rows):
+    """寫入 JSON Lines 並加到 session 的紀錄 (只保留最近的紀錄，避免 session 無限成長)"""
+    import streamlit as st
+    append_log(rows)
+    history = st.session_state.setdefault("perf_history", [])
+    history.extend(rows)
+    del history[:-2000]
+    return history
+
+
+def _arm_profile():
+    import streamlit as st
+    st.session_state["perf_profile_armed"] = st.session_state.get("perf_profiler", PROFILERS[0])
+
+
+def render_panel():
+    """腳本最後呼叫：結束本次量測、寫入 JSON Lines，並在側邊欄畫出可收合的效能面板"""
+    import streamlit as st
+
+    recorder = current()
+    if recorder is None:
+        return
+    _local.recorder = None
+    st.session_state.pop("perf_recorder", None)
+    recorder.finish()
+    history = _keep(recorder.rows())
+
+    with st.sidebar.expander("⏱️ 效能 (performance)"):
+        st.dataframe(stage_summary(recorder.records), width="stretch",
+                     column_config={"calls": st.column_config.NumberColumn("次數", format="%d"),
+                                    "wall_ms": st.column_config.NumberColumn("wall (ms)", format="%.1f"),
+                                    "cpu_ms": st.column_config.NumberColumn("CPU (ms)", format="%.1f"),
+                                    "peak_mb": st.column_config.NumberColumn("峰值 (MB)", format="%.1f"),
+                                    "max_rss_mb": st.column_config.NumberColumn("RSS 高水位 (MB)", format="%.0f"),
+                                    "rows": st.column_config.NumberColumn("列數", format="%d")})
+        st.checkbox("追蹤記憶體峰值 (tracemalloc，會變慢)", key="perf_trace_memory",
+                    help="之後的每次 rerun 以 tracemalloc 量測每個階段的配置峰值")
+        options = [p for p in PROFILERS if p != "py-spy" or shutil.which("py-spy")]
+        st.selectbox("Profiler", options, key="perf_profiler")
+        st.button("📸 擷取一次 rerun", on_click=_arm_profile, help="按下後重新執行的這一次 rerun 會完整記錄 profile")
+        if recorder.profile is not None:
+            st.session_state["perf_last_profile"] = recorder.profile
+        profile = st.session_state.get("perf_last_profile")
+        if profile is not None:
+            st.caption(f"最近一次 {profile['kind']} 擷取")
+            st.code(profile["report"])
+            if profile["data"] is not None:
+                st.download_button("下載 profile", profile["data"], file_name=profile["filename"])
+        st.download_button("下載本 session 的紀錄 (JSON Lines)",
+                           "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in history),
+                           file_name=f"{recorder.app}_perf.jsonl")
+        if LOG_PATH:
+            st.caption(f"每次 rerun 會附加寫入 {LOG_PATH}")
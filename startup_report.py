@@ -0,0 +1,156 @@
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+# ---------------------------------------------------------
+# [三個 Streamlit 應用的啟動時間報告]
+# 模擬自動擴展後的全新容器：每次量測都在新的 Python 行程、新的資料目錄中進行
+# - 套件 import：各重量級套件在全新行程中的 import 耗時 (參考用)
+# - 首次顯示：以 streamlit.testing 的 AppTest 完整執行一次應用 (cold)，同一行程再執行一次 (warm rerun)
+# - 標題出現：首次執行中呼叫 st.title 的時間點，即使用者看到頁面的時間 (延遲載入的效果主要在這裡)
+# - 首次顯示後載入了哪些重量級套件
+# 應用會先複製到暫存目錄 (不含 __pycache__ 與 .db / 歸檔等執行期檔案)，不影響工作目錄
+# --baseline 同時量測指定 git 版本 (git archive 取出)，列出前後差異
+# 執行: python startup_report.py --baseline HEAD~1 --repeat 3
+# ---------------------------------------------------------
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APPS = {
+    "01_Price_Tracker": "ecommerce_price_dashboard.py",
+    "02_Sentiment_Analysis": "sentiment_analysis_dashboard.py",
+    "03_RFM_Customer_Analysis": "rfm_analytics_app.py",
+}
+LIBRARIES = {
+    "streamlit": "import streamlit",
+    "pandas": "import pandas",
+    "matplotlib": "import matplotlib.pyplot",
+    "seaborn": "import seaborn",
+    "wordcloud": "import wordcloud",
+    "jieba (+詞典)": "import jieba; jieba.initialize()",
+    "snownlp": "import snownlp",
+    "scipy.sparse": "import scipy.sparse",
+    "pyarrow": "import pyarrow",
+}
+HEAVY_MODULES = ["matplotlib", "seaborn", "wordcloud", "jieba", "snownlp", "scipy", "pyarrow"]
+RUNTIME_FILES = shutil.ignore_patterns("__pycache__", "*.db", "*.db-*", "*_archive")
+
+# 在子行程內執行：量測 streamlit 測試框架載入、首次執行與 rerun 的時間
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import streamlit
+from streamlit.testing.v1 import AppTest
+loaded = time.perf_counter()
+paint = []
+title = streamlit.title
+def timed_title(*args, **kwargs):
+    paint.append(time.perf_counter())
+    return title(*args, **kwargs)
+streamlit.title = timed_title
+at = AppTest.from_file(sys.argv[1], default_timeout=600)
+at.run()
+first = time.perf_counter()
+at.run()
+rerun = time.perf_counter()
+print(json.dumps({
+    "streamlit_import": loaded - start,
+    "first_paint": paint[0] - loaded if paint else first - loaded,
+    "first_render": first - loaded,
+    "rerun": rerun - first,
+    "exceptions": [str(e.value) for e in at.exception],
+    "heavy": [m for m in json.loads(sys.argv[2]) if m in sys.modules],
+}))
+"""
+
+
+def time_import(statement):
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def checkout(revision, folder, dest):
+    """以 git archive 取出指定版本的應用目錄"""
+    archive = subprocess.run(["git", "-C", ROOT, "archive", "--format=tar", revision, folder],
+                             capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(dest)
+    return os.path.join(dest, folder)
+
+
+def measure_app(app_dir, script):
+    """在全新行程中執行一次應用，回傳各階段秒數"""
+    out = subprocess.run([sys.executable, "-c", CHILD, os.path.join(app_dir, script), json.dumps(HEAVY_MODULES)],
+                         cwd=app_dir, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"{script} 執行失敗:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_tree(source, repeat):
+    """source 為 None 表示目前的工作目錄，否則為 git 版本；每個應用量測 repeat 次取中位數"""
+    results = {}
+    for folder, script in APPS.items():
+        runs = []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as tmp:
+                if source is None:
+                    app_dir = os.path.join(tmp, folder)
+                    shutil.copytree(os.path.join(ROOT, folder), app_dir, ignore=RUNTIME_FILES)
+                else:
+                    app_dir = checkout(source, folder, tmp)
+                runs.append(measure_app(app_dir, script))
+        results[folder] = {key: statistics.median(run[key] for run in runs)
+                           for key in ("streamlit_import", "first_paint", "first_render", "rerun")}
+        results[folder]["heavy"] = runs[-1]["heavy"]
+        results[folder]["exceptions"] = runs[-1]["exceptions"]
+    return results
+
+
+def print_results(title, results):
+    print(f"\n{title}")
+    print(f"{'應用':<28}{'streamlit':>10}{'標題出現':>10}{'首次顯示':>10}{'rerun':>8}  首次顯示後已載入")
+    for folder, r in results.items():
+        print(f"{folder:<28}{r['streamlit_import']:>9.2f}s{r['first_paint']:>9.2f}s{r['first_render']:>9.2f}s"
+              f"{r['rerun']:>7.2f}s  {', '.join(r['heavy']) or '-'}")
+        for error in r["exceptions"]:
+            print(f"  ⚠️ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="三個 Streamlit 應用的啟動時間報告")
+    parser.add_argument("--baseline", help="比較用的 git 版本 (例如 HEAD~1)")
+    parser.add_argument("--repeat", type=int, default=1, help="每個應用量測次數 (取中位數)")
+    parser.add_argument("--json", help="將結果另存為 JSON 檔")
+    args = parser.parse_args()
+
+    print("套件 import (全新行程)：")
+    imports = {name: time_import(statement) for name, statement in LIBRARIES.items()}
+    for name, seconds in imports.items():
+        print(f"  {name:<16}{seconds:>6.2f}s")
+
+    report = {"imports": imports, "current": measure_tree(None, args.repeat)}
+    print_results("目前版本", report["current"])
+    if args.baseline:
+        report["baseline"] = measure_tree(args.baseline, args.repeat)
+        print_results(f"基準版本 ({args.baseline})", report["baseline"])
+        for key, label in (("first_paint", "標題出現"), ("first_render", "首次顯示")):
+            print(f"\n{label:<28}{'基準':>8}{'目前':>8}{'差異':>8}")
+            for folder in APPS:
+                before, after = report["baseline"][folder][key], report["current"][folder][key]
+                print(f"{folder:<28}{before:>7.2f}s{after:>7.2f}s{after - before:>+7.2f}s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()